@@ -1,24 +1,44 @@
-from rest_framework import viewsets, permissions, filters, views, response, exceptions, parsers, status
-from drivers.models import Driver
-from drivers.serializers import DriverSerializer
-from tenants.mixins import MunicipalityQuerysetMixin
+from django.db.models import Exists, OuterRef
+from django.utils import timezone
+from rest_framework import decorators, exceptions, parsers, permissions, response, status, views, viewsets
+
 from accounts.permissions import IsMunicipalityAdminOrReadOnly
+from drivers.models import Driver
 from drivers.portal import generate_portal_token, resolve_portal_token
+from drivers.serializers import DriverSerializer
 from fleet.models import FuelLog
 from fleet.serializers import FuelLogSerializer
+from fleet.storage import with_receipt_links
+from municipal_fleet.filters import request_timezone
+from search.filters import IndexedSearchFilter
+from tenants.mixins import MunicipalityQuerysetMixin
+from trips.models import Trip
+from trips.scheduling import parse_window
 
 
 class DriverViewSet(MunicipalityQuerysetMixin, viewsets.ModelViewSet):
     queryset = Driver.objects.select_related("municipality")
     serializer_class = DriverSerializer
     permission_classes = [permissions.IsAuthenticated, IsMunicipalityAdminOrReadOnly]
-    filter_backends = [filters.SearchFilter]
+    filter_backends = [IndexedSearchFilter]
     search_fields = ["name", "cpf", "phone"]
 
     def perform_create(self, serializer):
         user = self.request.user
         serializer.save(municipality=user.municipality if user.role != "SUPERADMIN" else serializer.validated_data.get("municipality"))
 
+    @decorators.action(detail=False, methods=["get"])
+    def availability(self, request):
+        start, end = parse_window(request.query_params)
+        busy = Trip.objects.active().overlapping(start, end).filter(driver=OuterRef("pk"))
+        drivers = (
+            self.get_queryset()
+            .filter(status=Driver.Status.ACTIVE, cnh_expiration_date__gte=timezone.localdate(end, request_timezone(request)))
+            .filter(~Exists(busy))
+            .values("id", "name", "phone", "cnh_category", "municipality_id")
+        )
+        return response.Response({"start": start, "end": end, "available": list(drivers)})
+
 
 class DriverPortalAuthMixin:
     def get_portal_driver(self, request):
@@ -103,7 +123,7 @@ class DriverPortalFuelLogView(DriverPortalAuthMixin, views.APIView):
                 "vehicle__license_plate",
             )
         )
-        return response.Response({"logs": list(logs)})
+        return response.Response({"logs": with_receipt_links(request, list(logs))})
 
     def post(self, request):
         driver = self.get_portal_driver(request)
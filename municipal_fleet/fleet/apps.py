@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class FleetConfig(AppConfig):
     name = "fleet"
     default_auto_field = "django.db.models.BigAutoField"
+
+    def ready(self):
+        from fleet import receipts  # noqa: F401
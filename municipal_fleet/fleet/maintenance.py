@@ -0,0 +1,144 @@
+from datetime import timedelta
+from zoneinfo import ZoneInfo
+
+from django.apps import apps as global_apps
+from django.conf import settings
+from django.db import transaction
+from django.db.models import OuterRef, Subquery, Sum
+from django.utils import timezone
+
+from fleet.models import MaintenanceForecast, Vehicle
+from reports.cache import bump_data_version
+
+# VehicleMaintenance has no type: oil changes are the records whose description mentions it.
+OIL_CHANGE_PATTERN = r"[óo]leo"
+
+
+def _intervals():
+    return {
+        MaintenanceForecast.Kind.SERVICE: (
+            settings.MAINTENANCE_SERVICE_INTERVAL_KM,
+            settings.MAINTENANCE_SERVICE_INTERVAL_DAYS,
+        ),
+        MaintenanceForecast.Kind.OIL_CHANGE: (settings.OIL_CHANGE_INTERVAL_KM, settings.OIL_CHANGE_INTERVAL_DAYS),
+    }
+
+
+def _latest(records, field):
+    return Subquery(records.filter(vehicle=OuterRef("pk")).order_by("-date", "-id").values(field)[:1])
+
+
+def _daily_km(monthly_odometer, vehicle_ids, today):
+    """km/day per vehicle over the months covering the last MAINTENANCE_FORECAST_WINDOW_DAYS (MonthlyOdometer)."""
+    since = (today - timedelta(days=settings.MAINTENANCE_FORECAST_WINDOW_DAYS)).replace(day=1)
+    rows = (
+        monthly_odometer.objects.filter(vehicle_id__in=vehicle_ids, year__gte=since.year)
+        .exclude(year=since.year, month__lt=since.month)
+        .values("vehicle_id")
+        .annotate(km=Sum("kilometers"))
+        .values_list("vehicle_id", "km")
+    )
+    days = (today - since).days + 1
+    return {vehicle_id: (km or 0) / days for vehicle_id, km in rows}
+
+
+def project(vehicle, kind, base_date, base_km, daily_km, today):
+    """
+    (due_date, due_mileage, basis) of one maintenance kind: the earliest of the km interval
+    reached at the current pace, the time interval since the last one and the hand-entered date.
+    """
+    interval_km, interval_days = _intervals()[kind]
+    due_mileage = base_km + interval_km
+    candidates = []
+    remaining = due_mileage - vehicle.odometer_current
+    if remaining <= 0:
+        candidates.append((today, MaintenanceForecast.Basis.MILEAGE))
+    elif daily_km > 0:
+        candidates.append((today + timedelta(days=int(remaining / daily_km)), MaintenanceForecast.Basis.MILEAGE))
+    if base_date:
+        candidates.append((base_date + timedelta(days=interval_days), MaintenanceForecast.Basis.TIME))
+    manual = vehicle.next_service_date if kind == MaintenanceForecast.Kind.SERVICE else vehicle.next_oil_change_date
+    if manual:
+        candidates.append((manual, MaintenanceForecast.Basis.MANUAL))
+    if not candidates:
+        return None, due_mileage, ""
+    due_date, basis = min(candidates, key=lambda candidate: candidate[0])
+    return due_date, due_mileage, basis
+
+
+def forecast_maintenance(municipality=None, vehicle_ids=None, apps=global_apps):
+    """
+    Recompute the MaintenanceForecast rows of the fleet (or of one municipality / some vehicles).
+
+    The last service is the latest VehicleMaintenance (the latest one mentioning oil for oil
+    changes), or the vehicle's last_*_date with its initial odometer when there is none.
+    Inactive vehicles have no forecast. Returns the number of rows written. `apps` is the model
+    registry; a data migration passes its historical one and bumps the report versions itself.
+    """
+    vehicle_model = apps.get_model("fleet", "Vehicle")
+    maintenance_model = apps.get_model("fleet", "VehicleMaintenance")
+    forecast_model = apps.get_model("fleet", "MaintenanceForecast")
+    vehicles = vehicle_model.objects.select_related("municipality")
+    if municipality is not None:
+        vehicles = vehicles.filter(municipality=municipality)
+    if vehicle_ids is not None:
+        vehicles = vehicles.filter(pk__in=vehicle_ids)
+    oil_changes = maintenance_model.objects.filter(description__iregex=OIL_CHANGE_PATTERN)
+    vehicles = list(
+        vehicles.exclude(status=Vehicle.Status.INACTIVE).annotate(
+            service_date=_latest(maintenance_model.objects, "date"),
+            service_km=_latest(maintenance_model.objects, "mileage"),
+            oil_date=_latest(oil_changes, "date"),
+            oil_km=_latest(oil_changes, "mileage"),
+        )
+    )
+    today = timezone.localdate()
+    pace = _daily_km(apps.get_model("trips", "MonthlyOdometer"), [vehicle.pk for vehicle in vehicles], today)
+
+    rows = []
+    for vehicle in vehicles:
+        local_today = timezone.localdate(timezone=ZoneInfo(vehicle.municipality.timezone))
+        fallback = vehicle.created_at.date() if vehicle.created_at else local_today
+        bases = {
+            MaintenanceForecast.Kind.SERVICE: (
+                max(filter(None, (vehicle.service_date, vehicle.last_service_date)), default=fallback),
+                vehicle.service_km if vehicle.service_km is not None else vehicle.odometer_initial,
+            ),
+            MaintenanceForecast.Kind.OIL_CHANGE: (
+                max(filter(None, (vehicle.oil_date, vehicle.last_oil_change_date)), default=fallback),
+                vehicle.oil_km if vehicle.oil_km is not None else vehicle.odometer_initial,
+            ),
+        }
+        daily_km = pace.get(vehicle.pk, 0)
+        for kind, (base_date, base_km) in bases.items():
+            due_date, due_mileage, basis = project(vehicle, kind, base_date, base_km, daily_km, local_today)
+            rows.append(
+                forecast_model(
+                    municipality_id=vehicle.municipality_id,
+                    vehicle=vehicle,
+                    kind=kind,
+                    due_date=due_date,
+                    due_mileage=due_mileage,
+                    daily_km=round(daily_km, 2),
+                    basis=basis,
+                )
+            )
+
+    stale = forecast_model.objects.filter(vehicle__status=Vehicle.Status.INACTIVE)
+    if municipality is not None:
+        stale = stale.filter(municipality=municipality)
+    if vehicle_ids is not None:
+        stale = stale.filter(vehicle_id__in=vehicle_ids)
+    touched = {row.municipality_id for row in rows}
+    with transaction.atomic():
+        forecast_model.objects.bulk_create(
+            rows,
+            update_conflicts=True,
+            unique_fields=["vehicle", "kind"],
+            update_fields=["municipality", "due_date", "due_mileage", "daily_km", "basis", "computed_at"],
+        )
+        if apps is global_apps:
+            for municipality_id in touched | set(stale.values_list("municipality_id", flat=True)):
+                bump_data_version(municipality_id)
+        stale.delete()
+    return len(rows)
@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+
+from fleet.maintenance import forecast_maintenance
+from tenants.models import Municipality
+
+
+class Command(BaseCommand):
+    help = (
+        "Projeta a próxima revisão e troca de óleo de cada veículo a partir do ritmo de quilometragem "
+        "e da última manutenção. Rode diariamente (cron)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--municipality", type=int, help="Restringe a uma prefeitura (id).")
+
+    def handle(self, *args, **options):
+        municipality = None
+        if options["municipality"]:
+            municipality = Municipality.objects.get(pk=options["municipality"])
+        total = forecast_maintenance(municipality)
+        self.stdout.write(self.style.SUCCESS(f"Previsões de manutenção atualizadas: {total}"))
@@ -0,0 +1,32 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from fleet.receipts import collect_garbage, recount_blobs
+
+
+class Command(BaseCommand):
+    help = (
+        "Remove comprovantes de abastecimento que nenhum registro referencia mais (armazenamento por "
+        "conteúdo, com contagem de referências). Rode diariamente (cron)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--grace-hours",
+            type=float,
+            default=settings.RECEIPT_GC_GRACE_HOURS,
+            help="Só remove arquivos sem alteração há mais que isso (padrão RECEIPT_GC_GRACE_HOURS).",
+        )
+        parser.add_argument(
+            "--recount", action="store_true", help="Recalcula as referências a partir dos abastecimentos antes."
+        )
+        parser.add_argument("--dry-run", action="store_true", help="Só lista o que seria removido.")
+
+    def handle(self, *args, **options):
+        if options["recount"]:
+            self.stdout.write(f"Comprovantes referenciados: {recount_blobs()}")
+        purged = collect_garbage(options["grace_hours"] * 3600, dry_run=options["dry_run"])
+        for name in purged:
+            self.stdout.write(name)
+        verb = "seriam removidos" if options["dry_run"] else "removidos"
+        self.stdout.write(self.style.SUCCESS(f"Arquivos {verb}: {len(purged)}"))
@@ -0,0 +1,19 @@
+# Generated by Django 5.2.18 on 2026-10-18 05:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('drivers', '0002_driver_access_code'),
+        ('fleet', '0002_fuellog'),
+        ('tenants', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='fuellog',
+            index=models.Index(fields=['municipality', '-filled_at', '-created_at', '-id'], name='fuellog_muni_filled_idx'),
+        ),
+    ]
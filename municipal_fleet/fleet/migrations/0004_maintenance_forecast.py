@@ -0,0 +1,34 @@
+# Generated by Django 5.2.18 on 2026-10-18 05:54
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('fleet', '0003_keyset_pagination_index'),
+        ('tenants', '0002_municipality_timezone'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MaintenanceForecast',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('SERVICE', 'Revisao'), ('OIL_CHANGE', 'Troca de oleo')], max_length=20)),
+                ('due_date', models.DateField(blank=True, null=True)),
+                ('due_mileage', models.PositiveIntegerField(blank=True, null=True)),
+                ('daily_km', models.FloatField(default=0)),
+                ('basis', models.CharField(blank=True, choices=[('MILEAGE', 'Quilometragem'), ('TIME', 'Prazo'), ('MANUAL', 'Data informada')], max_length=20)),
+                ('computed_at', models.DateTimeField(auto_now=True)),
+                ('municipality', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='tenants.municipality')),
+                ('vehicle', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='maintenance_forecasts', to='fleet.vehicle')),
+            ],
+            options={
+                'ordering': ['due_date', 'vehicle_id'],
+                'indexes': [models.Index(fields=['municipality', 'due_date'], name='maintenance_forecast_due_idx')],
+                'constraints': [models.UniqueConstraint(fields=('vehicle', 'kind'), name='maintenance_forecast_unique')],
+            },
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 5.2.18 on 2026-10-18 06:00
+
+from django.db import migrations, models
+
+import fleet.storage
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('fleet', '0004_maintenance_forecast'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ReceiptBlob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=255, unique=True)),
+                ('total', models.IntegerField(default=0)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+        migrations.AlterField(
+            model_name='fuellog',
+            name='receipt_image',
+            field=models.FileField(blank=True, null=True, storage=fleet.storage.receipt_storage, upload_to='fuel_receipts/'),
+        ),
+    ]
@@ -0,0 +1,23 @@
+from django.db import migrations
+from django.db.models import F
+
+from fleet.maintenance import forecast_maintenance
+
+
+def backfill_forecasts(apps, schema_editor):
+    """Project every vehicle once, so the dashboard alerts do not wait for the first nightly run."""
+    if forecast_maintenance(apps=apps):
+        version = apps.get_model("reports", "ReportDataVersion")
+        version.objects.update(version=F("version") + 1)
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("fleet", "0005_receipt_blobs"),
+        ("reports", "0002_report_data_version"),
+        ("trips", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_forecasts, migrations.RunPython.noop),
+    ]
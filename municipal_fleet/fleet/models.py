@@ -1,5 +1,7 @@
 from django.db import models
 
+from fleet.storage import receipt_storage
+
 
 class Vehicle(models.Model):
     class Status(models.TextChoices):
@@ -47,6 +49,43 @@ class VehicleMaintenance(models.Model):
         return f"{self.vehicle.license_plate} - {self.description}"
 
 
+class MaintenanceForecast(models.Model):
+    """
+    Projected next service / oil change of a vehicle, written by `forecast_maintenance`
+    (fleet.maintenance) so alerts are read from one indexed table instead of computed per request.
+    """
+
+    class Kind(models.TextChoices):
+        SERVICE = "SERVICE", "Revisao"
+        OIL_CHANGE = "OIL_CHANGE", "Troca de oleo"
+
+    class Basis(models.TextChoices):
+        MILEAGE = "MILEAGE", "Quilometragem"
+        TIME = "TIME", "Prazo"
+        MANUAL = "MANUAL", "Data informada"
+
+    municipality = models.ForeignKey("tenants.Municipality", on_delete=models.CASCADE, related_name="+")
+    vehicle = models.ForeignKey(Vehicle, on_delete=models.CASCADE, related_name="maintenance_forecasts")
+    kind = models.CharField(max_length=20, choices=Kind.choices)
+    due_date = models.DateField(null=True, blank=True)
+    due_mileage = models.PositiveIntegerField(null=True, blank=True)
+    daily_km = models.FloatField(default=0)
+    # Which limit produced due_date: the km interval at the current pace, the time interval or
+    # the hand-entered next_*_date of the vehicle.
+    basis = models.CharField(max_length=20, choices=Basis.choices, blank=True)
+    computed_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ["due_date", "vehicle_id"]
+        constraints = [
+            models.UniqueConstraint(fields=["vehicle", "kind"], name="maintenance_forecast_unique"),
+        ]
+        indexes = [models.Index(fields=["municipality", "due_date"], name="maintenance_forecast_due_idx")]
+
+    def __str__(self):
+        return f"{self.vehicle_id} - {self.kind} em {self.due_date}"
+
+
 class FuelLog(models.Model):
     municipality = models.ForeignKey("tenants.Municipality", on_delete=models.CASCADE, related_name="fuel_logs")
     vehicle = models.ForeignKey(Vehicle, on_delete=models.PROTECT, related_name="fuel_logs")
@@ -54,12 +93,28 @@ class FuelLog(models.Model):
     filled_at = models.DateField()
     liters = models.DecimalField(max_digits=8, decimal_places=2)
     fuel_station = models.CharField(max_length=255)
-    receipt_image = models.FileField(upload_to="fuel_receipts/", null=True, blank=True)
+    # Content-addressed: identical uploads share one file (fleet.storage, fleet.receipts).
+    receipt_image = models.FileField(upload_to="fuel_receipts/", storage=receipt_storage, null=True, blank=True)
     notes = models.TextField(blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
 
     class Meta:
         ordering = ["-filled_at", "-created_at"]
+        indexes = [
+            # Keyset pagination order of FuelLogViewSet/FuelReportView.
+            models.Index(fields=["municipality", "-filled_at", "-created_at", "-id"], name="fuellog_muni_filled_idx"),
+        ]
 
     def __str__(self):
         return f"{self.vehicle.license_plate} - {self.liters} L em {self.fuel_station}"
+
+
+class ReceiptBlob(models.Model):
+    """Number of FuelLog rows referencing a content-addressed receipt file (fleet.receipts)."""
+
+    name = models.CharField(max_length=255, unique=True)
+    total = models.IntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"{self.name} ({self.total})"
@@ -0,0 +1,114 @@
+import os
+import posixpath
+import time
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F
+from django.db.models.signals import post_delete, post_init, post_save
+from django.dispatch import receiver
+
+from fleet.models import FuelLog, ReceiptBlob
+from fleet.storage import INCOMING_DIR, is_blob, receipt_storage
+
+# Reference counts of the receipt blobs follow every FuelLog write, like the report rollups: the
+# file name a row was loaded with is kept on the instance so a replaced receipt loses one ref.
+
+
+def count_blob(name, delta):
+    """`total = total + delta` for a blob name, created on first use (UPDATE, then INSERT and retry)."""
+    if not isinstance(name, str) or not is_blob(name):
+        return
+    rows = ReceiptBlob.objects.filter(name=name)
+    if rows.update(total=F("total") + delta):
+        return
+    try:
+        with transaction.atomic():
+            ReceiptBlob.objects.create(name=name, total=delta)
+    except IntegrityError:
+        rows.update(total=F("total") + delta)
+
+
+# Deferred field: what the row referenced is unknown, so its save cannot move a reference.
+_UNKNOWN = object()
+
+
+def _receipt_name(instance):
+    if "receipt_image" not in instance.__dict__:
+        return _UNKNOWN
+    value = instance.__dict__["receipt_image"]
+    return getattr(value, "name", value) or None
+
+
+@receiver(post_init, sender=FuelLog)
+def remember_receipt(sender, instance, **kwargs):
+    instance._receipt_name = _receipt_name(instance)
+
+
+@receiver(post_save, sender=FuelLog)
+def count_receipt(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    current = _receipt_name(instance)
+    previous = None if created else instance._receipt_name
+    if previous is not _UNKNOWN and previous != current:
+        count_blob(previous, -1)
+        count_blob(current, 1)
+    instance._receipt_name = current
+
+
+@receiver(post_delete, sender=FuelLog)
+def release_receipt(sender, instance, **kwargs):
+    if instance._receipt_name is not _UNKNOWN:
+        count_blob(instance._receipt_name, -1)
+
+
+def recount_blobs():
+    """Rebuild ReceiptBlob from the FuelLog rows (repairs counts after raw SQL or .update() writes)."""
+    counts = {
+        name: total
+        for name, total in FuelLog.objects.exclude(receipt_image="")
+        .exclude(receipt_image__isnull=True)
+        .values("receipt_image")
+        .annotate(total=Count("id"))
+        .values_list("receipt_image", "total")
+        .order_by()
+        if is_blob(name)
+    }
+    with transaction.atomic():
+        ReceiptBlob.objects.exclude(name__in=counts).update(total=0)
+        for name, total in counts.items():
+            ReceiptBlob.objects.update_or_create(name=name, defaults={"total": total})
+    return len(counts)
+
+
+def _files(storage, directory):
+    try:
+        subdirs, files = storage.listdir(directory)
+    except FileNotFoundError:
+        return
+    for filename in files:
+        yield posixpath.join(directory, filename)
+    for subdir in subdirs:
+        yield from _files(storage, posixpath.join(directory, subdir))
+
+
+def collect_garbage(grace_seconds, dry_run=False):
+    """
+    Purge receipt blobs no FuelLog references (no ReceiptBlob with total > 0) and leftover partial
+    uploads, both only once untouched for `grace_seconds`: a file is stored before the row that
+    references it is saved. Returns the purged names.
+    """
+    storage = receipt_storage()
+    root = FuelLog._meta.get_field("receipt_image").upload_to.rstrip("/")
+    live = set(ReceiptBlob.objects.filter(total__gt=0).values_list("name", flat=True))
+    cutoff = time.time() - grace_seconds
+    purged = []
+    for name in [*_files(storage, root), *_files(storage, INCOMING_DIR)]:
+        garbage = name.startswith(f"{INCOMING_DIR}/") or (is_blob(name) and name not in live)
+        if garbage and os.path.getmtime(storage.path(name)) < cutoff:
+            purged.append(name)
+            if not dry_run:
+                storage.purge(name)
+    if not dry_run:
+        ReceiptBlob.objects.filter(total__lte=0, name__in=purged).delete()
+    return purged
@@ -0,0 +1,145 @@
+import hashlib
+import os
+import posixpath
+import re
+import tempfile
+
+from django.conf import settings
+from django.core import signing
+from django.core.files.storage import FileSystemStorage
+
+# <upload_to>/<first 2 hex digits>/<sha256><ext>
+BLOB_NAME = re.compile(r"(?:^|/)[0-9a-f]{2}/([0-9a-f]{64})(\.[a-z0-9]+)?$")
+# Receipts are served by fleet.views.FuelReceiptView (access-checked), not from public /media/.
+RECEIPT_URL = "/api/vehicles/receipts/"
+# Uploads being written, renamed into place once their hash is known.
+INCOMING_DIR = ".incoming"
+# Query parameter of the signed, expiring token that lets a plain link open a receipt.
+RECEIPT_TOKEN_PARAM = "token"
+RECEIPT_TOKEN_SALT = "fleet.receipt"
+
+
+def is_blob(name):
+    return bool(name and BLOB_NAME.search(name))
+
+
+class ContentAddressedStorage(FileSystemStorage):
+    """
+    File storage that keeps each distinct content once, named by its SHA-256: saving bytes that
+    are already stored returns the existing name without writing anything, so re-sent uploads
+    (portal retries on bad connections) cost one read.
+
+    Blobs are shared between rows, so `delete()` leaves them alone; references are counted in
+    ReceiptBlob (fleet.receipts) and `gc_receipt_blobs` purges the unreferenced ones.
+    """
+
+    chunk_size = 64 * 1024
+
+    def get_available_name(self, name, max_length=None):
+        # The final name comes from the content in _save; equal names are equal files.
+        return name
+
+    def blob_name(self, name, digest):
+        directory, filename = posixpath.split(name)
+        extension = os.path.splitext(filename)[1].lower()
+        if not re.fullmatch(r"\.[a-z0-9]+", extension):
+            extension = ""
+        return posixpath.join(directory, digest[:2], f"{digest}{extension}")
+
+    def _save(self, name, content):
+        seekable = hasattr(content, "seek") and (not hasattr(content, "seekable") or content.seekable())
+        if seekable:
+            # Hash first: a duplicate is recognised before a single byte is written.
+            content.seek(0)
+            digest = hashlib.sha256()
+            for chunk in content.chunks(self.chunk_size):
+                digest.update(chunk)
+            final = self.blob_name(name, digest.hexdigest())
+            if self._reuse(final):
+                return final
+            content.seek(0)
+        tmp_path, digest = self._write_incoming(content)
+        final = self.blob_name(name, digest)
+        if self._reuse(final):
+            os.unlink(tmp_path)
+            return final
+        full_path = self.path(final)
+        os.makedirs(os.path.dirname(full_path), exist_ok=True)
+        # Atomic: a concurrent upload of the same content replaces it with identical bytes.
+        os.replace(tmp_path, full_path)
+        if self.file_permissions_mode is not None:
+            os.chmod(full_path, self.file_permissions_mode)
+        return final
+
+    def _reuse(self, name):
+        if not self.exists(name):
+            return False
+        # Fresh mtime keeps a blob that was orphaned but is now referenced again out of the GC's grace window.
+        os.utime(self.path(name))
+        return True
+
+    def _write_incoming(self, content):
+        """Stream `content` into a temporary file next to the blobs, hashing it on the way."""
+        incoming = self.path(INCOMING_DIR)
+        os.makedirs(incoming, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=incoming)
+        digest = hashlib.sha256()
+        try:
+            with os.fdopen(fd, "wb") as tmp:
+                for chunk in content.chunks(self.chunk_size):
+                    digest.update(chunk)
+                    tmp.write(chunk)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+        return tmp_path, digest.hexdigest()
+
+    def delete(self, name):
+        if not is_blob(name):
+            super().delete(name)
+
+    def purge(self, name):
+        """Really remove a blob (gc_receipt_blobs only)."""
+        super().delete(name)
+
+
+def receipt_token(name):
+    """Signed timestamp for `name` (the name itself is not repeated in the token)."""
+    return signing.TimestampSigner(salt=RECEIPT_TOKEN_SALT).sign(name)[len(name) + 1 :]
+
+
+def check_receipt_token(name, token):
+    """True if `token` was issued for `name` less than RECEIPT_LINK_MAX_AGE seconds ago."""
+    try:
+        signing.TimestampSigner(salt=RECEIPT_TOKEN_SALT).unsign(
+            f"{name}:{token}", max_age=settings.RECEIPT_LINK_MAX_AGE
+        )
+    except signing.BadSignature:
+        return False
+    return True
+
+
+class ReceiptStorage(ContentAddressedStorage):
+    """
+    Receipt blobs. URLs point at FuelReceiptView and carry a signed, expiring token, so the links
+    the API returns open from a plain `<a href>` (which cannot send the JWT or portal header).
+    """
+
+    def url(self, name):
+        return f"{super().url(name)}?{RECEIPT_TOKEN_PARAM}={receipt_token(name)}"
+
+
+_receipt_storage = ReceiptStorage(base_url=RECEIPT_URL)
+
+
+def receipt_storage():
+    # Callable so migrations reference the function instead of serialising the instance.
+    return _receipt_storage
+
+
+def with_receipt_links(request, rows):
+    """Swap each row's stored `receipt_image` name for its signed, absolute link (None if absent)."""
+    for row in rows:
+        name = row["receipt_image"]
+        row["receipt_image"] = request.build_absolute_uri(_receipt_storage.url(name)) if name else None
+    return rows
@@ -1,9 +1,15 @@
+from django.urls import path
 from rest_framework.routers import DefaultRouter
-from fleet.views import VehicleViewSet, VehicleMaintenanceViewSet, FuelLogViewSet
+
+from fleet.views import FuelLogViewSet, FuelReceiptView, VehicleMaintenanceViewSet, VehicleViewSet
 
 router = DefaultRouter()
 router.register(r"maintenance", VehicleMaintenanceViewSet, basename="vehicle-maintenance")
 router.register(r"fuel_logs", FuelLogViewSet, basename="fuel-log")
 router.register(r"", VehicleViewSet, basename="vehicle")
 
-urlpatterns = router.urls
+urlpatterns = [
+    # Also the base URL of the receipt storage (fleet.storage.RECEIPT_URL).
+    path("receipts/<path:name>", FuelReceiptView.as_view(), name="fuel-receipt"),
+]
+urlpatterns += router.urls
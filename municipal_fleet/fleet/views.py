@@ -1,27 +1,105 @@
-from rest_framework import viewsets, permissions, filters
-from rest_framework import parsers
-from fleet.models import Vehicle, VehicleMaintenance, FuelLog
-from fleet.serializers import VehicleSerializer, VehicleMaintenanceSerializer, FuelLogSerializer
-from tenants.mixins import MunicipalityQuerysetMixin
+import mimetypes
+import posixpath
+from datetime import timedelta
+from urllib.parse import quote
+
+from django.conf import settings
+from django.db.models import Exists, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+from django.http import FileResponse, Http404, HttpResponse
+from django.utils import timezone
+from rest_framework import decorators, exceptions, filters, parsers, permissions, response, status, views, viewsets
+
 from accounts.permissions import IsMunicipalityAdminOrReadOnly
+from drivers.views import DriverPortalAuthMixin
+from fleet.maintenance import forecast_maintenance
+from fleet.models import FuelLog, MaintenanceForecast, Vehicle, VehicleMaintenance
+from fleet.serializers import FuelLogSerializer, VehicleMaintenanceSerializer, VehicleSerializer
+from fleet.storage import RECEIPT_TOKEN_PARAM, check_receipt_token, receipt_storage
+from municipal_fleet.filters import DateRangeFilterBackend, request_timezone
+from municipal_fleet.pagination import KeysetOrPageNumberPagination
+from search.filters import IndexedSearchFilter
+from tenants.mixins import MunicipalityQuerysetMixin
+from trips.models import MonthlyOdometer, Trip
+from trips.scheduling import parse_window
 
 
 class VehicleViewSet(MunicipalityQuerysetMixin, viewsets.ModelViewSet):
     queryset = Vehicle.objects.all()
     serializer_class = VehicleSerializer
     permission_classes = [permissions.IsAuthenticated, IsMunicipalityAdminOrReadOnly]
-    filter_backends = [filters.SearchFilter]
+    filter_backends = [IndexedSearchFilter]
     search_fields = ["license_plate", "brand", "model"]
 
     def perform_create(self, serializer):
         user = self.request.user
         if not IsMunicipalityAdminOrReadOnly().has_permission(self.request, self):
             self.permission_denied(self.request, message="Apenas admins podem criar veículos.")
-        serializer.save(
+        vehicle = serializer.save(
             municipality=user.municipality
             if user.role != "SUPERADMIN"
             else serializer.validated_data.get("municipality")
         )
+        forecast_maintenance(vehicle_ids=[vehicle.pk])
+
+    # next_service_date, next_oil_change_date and status feed the forecast: refresh it right away.
+    def perform_update(self, serializer):
+        forecast_maintenance(vehicle_ids=[serializer.save().pk])
+
+    @decorators.action(detail=False, methods=["get"])
+    def available(self, request):
+        """
+        Vehicles free for [`start`, `end`) seating at least `?passengers=`: one anti-join against
+        active trips (trip_vehicle_schedule_idx), best fit first — smallest sufficient capacity,
+        then fewest km this month (MonthlyOdometer).
+        """
+        start, end = parse_window(request.query_params)
+        passengers = request.query_params.get("passengers", "0")
+        if not passengers.isdigit():
+            return response.Response(
+                {"passengers": "Informe o número de passageiros."}, status=status.HTTP_400_BAD_REQUEST
+            )
+        today = timezone.localdate(timezone=request_timezone(request))
+        busy = Trip.objects.active().overlapping(start, end).filter(vehicle=OuterRef("pk"))
+        month_km = MonthlyOdometer.objects.filter(vehicle=OuterRef("pk"), year=today.year, month=today.month)
+        vehicles = (
+            self.get_queryset()
+            .filter(max_passengers__gte=int(passengers))
+            .exclude(status__in=[Vehicle.Status.MAINTENANCE, Vehicle.Status.INACTIVE])
+            .filter(~Exists(busy))
+            .annotate(month_km=Coalesce(Subquery(month_km.values("kilometers")[:1]), 0))
+            .order_by("max_passengers", "month_km", "license_plate")
+            .values("id", "license_plate", "model", "brand", "max_passengers", "status", "month_km", "municipality_id")
+        )
+        return response.Response({"start": start, "end": end, "available": list(vehicles)})
+
+    @decorators.action(detail=False, methods=["get"])
+    def maintenance_forecast(self, request):
+        """
+        Projected services/oil changes due within `?days=` (default MAINTENANCE_FORECAST_ALERT_DAYS),
+        soonest first, as last computed by `forecast_maintenance`; `?kind=` and `?vehicle_id=` filter.
+        """
+        days = request.query_params.get("days", str(settings.MAINTENANCE_FORECAST_ALERT_DAYS))
+        if not days.isdigit():
+            return response.Response({"days": "Informe um número de dias."}, status=status.HTTP_400_BAD_REQUEST)
+        qs = MaintenanceForecast.objects.filter(vehicle__in=self.get_queryset())
+        today = timezone.localdate(timezone=request_timezone(request))
+        qs = qs.filter(due_date__lte=today + timedelta(days=int(days)))
+        for name in ("kind", "vehicle_id"):
+            if request.query_params.get(name):
+                qs = qs.filter(**{name: request.query_params[name]})
+        rows = qs.order_by("due_date", "vehicle__license_plate", "kind").values(
+            "vehicle_id",
+            "vehicle__license_plate",
+            "kind",
+            "due_date",
+            "due_mileage",
+            "daily_km",
+            "basis",
+            "vehicle__odometer_current",
+            "computed_at",
+        )
+        return response.Response(list(rows))
 
 
 class VehicleMaintenanceViewSet(MunicipalityQuerysetMixin, viewsets.ModelViewSet):
@@ -32,29 +110,38 @@ class VehicleMaintenanceViewSet(MunicipalityQuerysetMixin, viewsets.ModelViewSet
     filter_backends = [filters.SearchFilter]
     search_fields = ["vehicle__license_plate", "description"]
 
+    # A new record moves the vehicle's forecast right away instead of at the next nightly run.
+    def perform_create(self, serializer):
+        forecast_maintenance(vehicle_ids=[serializer.save().vehicle_id])
+
+    def perform_update(self, serializer):
+        previous = serializer.instance.vehicle_id
+        forecast_maintenance(vehicle_ids={previous, serializer.save().vehicle_id})
+
+    def perform_destroy(self, instance):
+        instance.delete()
+        forecast_maintenance(vehicle_ids=[instance.vehicle_id])
+
 
 class FuelLogViewSet(MunicipalityQuerysetMixin, viewsets.ModelViewSet):
-    queryset = FuelLog.objects.select_related("vehicle", "driver", "municipality")
+    queryset = FuelLog.objects.select_related("vehicle", "driver", "municipality").order_by("-filled_at", "-created_at", "-id")
     serializer_class = FuelLogSerializer
     permission_classes = [permissions.IsAuthenticated, IsMunicipalityAdminOrReadOnly]
-    filter_backends = [filters.SearchFilter]
+    pagination_class = KeysetOrPageNumberPagination
+    keyset_ordering = ("-filled_at", "-created_at", "-id")
+    filter_backends = [IndexedSearchFilter, DateRangeFilterBackend]
     parser_classes = [parsers.MultiPartParser, parsers.FormParser, parsers.JSONParser]
     search_fields = ["fuel_station", "driver__name", "vehicle__license_plate"]
+    date_range_field = "filled_at"
 
     def get_queryset(self):
         qs = super().get_queryset()
         driver_id = self.request.query_params.get("driver_id")
         vehicle_id = self.request.query_params.get("vehicle_id")
-        start_date = self.request.query_params.get("start_date")
-        end_date = self.request.query_params.get("end_date")
         if driver_id:
             qs = qs.filter(driver_id=driver_id)
         if vehicle_id:
             qs = qs.filter(vehicle_id=vehicle_id)
-        if start_date:
-            qs = qs.filter(filled_at__gte=start_date)
-        if end_date:
-            qs = qs.filter(filled_at__lte=end_date)
         return qs
 
     def perform_create(self, serializer):
@@ -67,3 +154,43 @@ class FuelLogViewSet(MunicipalityQuerysetMixin, viewsets.ModelViewSet):
                 or getattr(serializer.validated_data.get("driver"), "municipality", None)
             )
         serializer.save(municipality=municipality)
+
+
+class FuelReceiptView(DriverPortalAuthMixin, views.APIView):
+    """
+    Receipt file of a fuel log, for staff of the log's municipality (JWT) or the driver who logged
+    it (portal token, `X-Driver-Token` or `?driver_token=`). Behind nginx the bytes are sent by
+    nginx itself through `X-Accel-Redirect` (RECEIPT_ACCEL_REDIRECT_PREFIX, an `internal` location);
+    without it Django streams the file.
+    """
+
+    permission_classes = [permissions.AllowAny]
+
+    def get(self, request, name):
+        logs = FuelLog.objects.filter(receipt_image=name)
+        user = request.user
+        token = request.query_params.get(RECEIPT_TOKEN_PARAM)
+        if token:
+            # Links built by receipt_storage().url() were only handed to callers allowed to see the log.
+            if not check_receipt_token(name, token):
+                raise exceptions.PermissionDenied("Link do comprovante inválido ou expirado.")
+        elif user.is_authenticated:
+            if user.role != "SUPERADMIN":
+                logs = logs.filter(municipality=user.municipality)
+        else:
+            logs = logs.filter(driver=self.get_portal_driver(request))
+        storage = receipt_storage()
+        if not logs.exists() or not storage.exists(name):
+            raise Http404
+        filename = posixpath.basename(name)
+        content_type = mimetypes.guess_type(filename)[0] or "application/octet-stream"
+        prefix = settings.RECEIPT_ACCEL_REDIRECT_PREFIX
+        if prefix:
+            result = HttpResponse(content_type=content_type)
+            result["X-Accel-Redirect"] = prefix.rstrip("/") + "/" + quote(name)
+        else:
+            result = FileResponse(storage.open(name, "rb"), content_type=content_type)
+        result["Content-Disposition"] = f'inline; filename="{filename}"'
+        # Content-addressed names never change content; only the access check must be repeated.
+        result["Cache-Control"] = "private, max-age=86400"
+        return result
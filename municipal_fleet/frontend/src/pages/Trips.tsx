@@ -208,7 +208,9 @@ export const TripsPage = () => {
     setMessage(data.wa_link);
   };
 
-  const handleEdit = (trip: Trip) => {
+  const handleEdit = async (row: Trip) => {
+    // List rows are slim (no passengers, notes or cargo); the form needs the full trip.
+    const { data: trip } = await api.get<Trip>(`/trips/${row.id}/`);
     setEditingId(trip.id);
     setUsePassengerList(Boolean(trip.passengers_details?.length) && trip.category !== "OBJECT");
     setForm({
@@ -0,0 +1,75 @@
+from django.db import models
+from rest_framework import serializers
+
+
+def parse_field_list(request, param):
+    raw = request.query_params.get(param, "") if request is not None else ""
+    return [name for name in (part.strip() for part in raw.split(",")) if name]
+
+
+def requested_fields(request, default, allowed):
+    """
+    Fields to render for `?fields=a,b` / `?omit=c`: `fields` replaces `default`, `omit` removes from
+    the result. Unknown names are a 400 rather than being silently ignored.
+    """
+    fields = parse_field_list(request, "fields")
+    omit = parse_field_list(request, "omit")
+    unknown = sorted(set(fields + omit) - set(allowed))
+    if unknown:
+        raise serializers.ValidationError({"fields": f"Campos desconhecidos: {', '.join(unknown)}."})
+    return [name for name in (fields or default) if name not in omit]
+
+
+class SparseFieldsetMixin:
+    """Honour `?fields=`/`?omit=` on GET requests by dropping serializer fields before rendering."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        request = self.context.get("request")
+        if request is None or request.method != "GET":
+            return
+        keep = requested_fields(request, list(self.fields), list(self.fields))
+        for name in set(self.fields) - set(keep):
+            self.fields.pop(name)
+
+
+class ValuesRepresentation:
+    """
+    Render `.values()` rows the way a ModelSerializer would, without per-field serializer objects.
+
+    Only columns whose JSON form differs from the Python value need converting: datetimes (local
+    timezone, DRF's ISO format), dates/times and decimals. Foreign keys come out of `.values()` as
+    ids under the field name, matching PrimaryKeyRelatedField.
+    """
+
+    CONVERTERS = {
+        models.DateTimeField: serializers.DateTimeField,
+        models.DateField: serializers.DateField,
+        models.TimeField: serializers.TimeField,
+        models.DecimalField: serializers.DecimalField,
+    }
+
+    def __init__(self, model, fields):
+        self.fields = list(fields)
+        self.converters = {}
+        for name in self.fields:
+            model_field = model._meta.get_field(name)
+            for model_class, serializer_class in self.CONVERTERS.items():
+                if isinstance(model_field, model_class):
+                    if serializer_class is serializers.DecimalField:
+                        field = serializer_class(max_digits=model_field.max_digits, decimal_places=model_field.decimal_places)
+                    else:
+                        field = serializer_class()
+                    self.converters[name] = field.to_representation
+                    break
+
+    def render(self, rows):
+        fields, converters = self.fields, self.converters.items()
+        result = []
+        for row in rows:
+            item = {name: row[name] for name in fields}
+            for name, convert in converters:
+                if item[name] is not None:
+                    item[name] = convert(item[name])
+            result.append(item)
+        return result
@@ -0,0 +1,89 @@
+from datetime import date, datetime, time, timedelta
+
+from django.db import models
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+from rest_framework import filters, serializers
+
+
+def request_timezone(request):
+    """Timezone of the caller's municipality; superadmins (no municipality) use settings.TIME_ZONE."""
+    municipality = getattr(getattr(request, "user", None), "municipality", None)
+    return municipality.tzinfo if municipality else timezone.get_default_timezone()
+
+
+def parse_date_param(params, name):
+    raw = params.get(name)
+    if not raw:
+        return None
+    try:
+        value = parse_date(raw)
+    except ValueError:
+        value = None
+    if value is None:
+        raise serializers.ValidationError({name: "Data inválida. Use o formato AAAA-MM-DD."})
+    return value
+
+
+def parse_date_range(params, start_param="start_date", end_param="end_date"):
+    start = parse_date_param(params, start_param)
+    end = parse_date_param(params, end_param)
+    if start and end and end < start:
+        raise serializers.ValidationError({end_param: "Data final deve ser igual ou posterior à inicial."})
+    return start, end
+
+
+def local_day_start(day: date, tz):
+    return datetime.combine(day, time.min, tzinfo=tz)
+
+
+def day_bounds(start: date | None, end: date | None, tz):
+    """Inclusive local dates -> half-open [start 00:00, day after end 00:00) aware datetimes."""
+    return (
+        local_day_start(start, tz) if start else None,
+        local_day_start(end + timedelta(days=1), tz) if end else None,
+    )
+
+
+def month_bounds(year: int, month: int, tz):
+    next_year, next_month = (year + 1, 1) if month == 12 else (year, month + 1)
+    return local_day_start(date(year, month, 1), tz), local_day_start(date(next_year, next_month, 1), tz)
+
+
+def filter_date_range(queryset, request, field, start_param="start_date", end_param="end_date"):
+    """
+    Apply `?start_date=&end_date=` (inclusive local dates) to `field`.
+
+    Datetime columns are compared against plain timestamps (`field >= a AND field < b`) instead of
+    `field__date`, which would wrap the column in a timezone cast and rule out the btree index.
+    """
+    return filter_date_params(queryset, request.query_params, request_timezone(request), field, start_param, end_param)
+
+
+def filter_date_params(queryset, params, tz, field, start_param="start_date", end_param="end_date"):
+    """filter_date_range for callers without a request (background jobs): explicit params and timezone."""
+    start, end = parse_date_range(params, start_param, end_param)
+    if not start and not end:
+        return queryset
+    if isinstance(queryset.model._meta.get_field(field), models.DateTimeField):
+        lower, upper = day_bounds(start, end, tz)
+        if lower:
+            queryset = queryset.filter(**{f"{field}__gte": lower})
+        if upper:
+            queryset = queryset.filter(**{f"{field}__lt": upper})
+        return queryset
+    if start:
+        queryset = queryset.filter(**{f"{field}__gte": start})
+    if end:
+        queryset = queryset.filter(**{f"{field}__lte": end})
+    return queryset
+
+
+class DateRangeFilterBackend(filters.BaseFilterBackend):
+    """Filters on the view's `date_range_field` using `?start_date=&end_date=`."""
+
+    def filter_queryset(self, request, queryset, view):
+        field = getattr(view, "date_range_field", None)
+        if not field:
+            return queryset
+        return filter_date_range(queryset, request, field)
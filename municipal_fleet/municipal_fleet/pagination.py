@@ -0,0 +1,151 @@
+import base64
+import binascii
+import json
+
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.db import connections
+from django.db.models import BooleanField, F, Func, Q, Value
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+# Databases that compare row values lexicographically: `(a, b) < (x, y)`.
+ROW_VALUE_VENDORS = ("postgresql", "sqlite", "mysql")
+
+
+class KeysetOrPageNumberPagination(PageNumberPagination):
+    """
+    Page-number pagination by default (what the frontend Pagination component expects); any request
+    carrying `?cursor=` switches to keyset pagination over the view's `keyset_ordering`.
+
+    Keyset pages seek with a row-value comparison on the ordering columns (`(a, b) < (x, y)`), so
+    page N costs the same as page 1 and no COUNT(*) is issued. `keyset_ordering` must end with a
+    unique column (the pk) to keep the order total, and should match a composite index.
+    """
+
+    page_size_query_param = "page_size"
+    max_page_size = 100
+    cursor_query_param = "cursor"
+    invalid_cursor_message = "Cursor inválido."
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.keyset = self.cursor_query_param in request.query_params
+        if not self.keyset:
+            return super().paginate_queryset(queryset, request, view)
+        return self.paginate_keyset(queryset, request, view.keyset_ordering)
+
+    def paginate_keyset(self, queryset, request, ordering):
+        self.request = request
+        self.ordering = tuple(ordering)
+        self.base_url = request.build_absolute_uri()
+        page_size = self.get_page_size(request)
+        position, reverse = self.decode_cursor(request, queryset.model)
+
+        order = [self._flip(field) for field in self.ordering] if reverse else list(self.ordering)
+        qs = queryset.order_by(*order)
+        if position is not None:
+            qs = qs.filter(self._seek_filter(qs, order, position))
+        rows = list(qs[: page_size + 1])
+        has_more = len(rows) > page_size
+        rows = rows[:page_size]
+        if reverse:
+            rows.reverse()
+
+        self.next_position = self.previous_position = None
+        if rows:
+            more_after = has_more if not reverse else position is not None
+            more_before = position is not None if not reverse else has_more
+            if more_after:
+                self.next_position = self._position(rows[-1])
+            if more_before:
+                self.previous_position = self._position(rows[0])
+        return rows
+
+    def get_paginated_response(self, data):
+        if not self.keyset:
+            return super().get_paginated_response(data)
+        return Response(self.get_keyset_links() | {"results": data})
+
+    def get_keyset_links(self):
+        return {
+            "next": self.encode_cursor(self.next_position, reverse=False),
+            "previous": self.encode_cursor(self.previous_position, reverse=True),
+        }
+
+    def encode_cursor(self, position, reverse):
+        if position is None:
+            return None
+        payload = json.dumps({"p": position, "r": reverse}, separators=(",", ":")).encode()
+        token = base64.urlsafe_b64encode(payload).decode().rstrip("=")
+        url = remove_query_param(self.base_url, self.page_query_param)
+        return replace_query_param(url, self.cursor_query_param, token)
+
+    def decode_cursor(self, request, model):
+        token = request.query_params.get(self.cursor_query_param)
+        if not token:
+            return None, False
+        try:
+            payload = json.loads(base64.urlsafe_b64decode(token + "=" * (-len(token) % 4)))
+            raw_position, reverse = payload["p"], bool(payload["r"])
+            if len(raw_position) != len(self.ordering):
+                raise ValueError
+            position = [
+                model._meta.get_field(field.lstrip("-")).to_python(value)
+                for field, value in zip(self.ordering, raw_position)
+            ]
+        except (TypeError, ValueError, KeyError, binascii.Error, DjangoValidationError):
+            raise NotFound(self.invalid_cursor_message)
+        return position, reverse
+
+    def _position(self, row):
+        values = []
+        for field in self.ordering:
+            name = field.lstrip("-")
+            value = row[name] if isinstance(row, dict) else getattr(row, name)
+            values.append(value.isoformat() if hasattr(value, "isoformat") else value)
+        return values
+
+    @staticmethod
+    def _flip(field):
+        return field[1:] if field.startswith("-") else f"-{field}"
+
+    @staticmethod
+    def _seek_filter(queryset, order, position):
+        """Rows strictly after `position` in `order`."""
+        fields = [field.lstrip("-") for field in order]
+        descending = {field.startswith("-") for field in order}
+        if len(descending) == 1 and connections[queryset.db].vendor in ROW_VALUE_VENDORS:
+            return RowComparison(queryset.model, fields, position, "<" if descending.pop() else ">")
+        # Mixed directions (or no row values): (a, b, c) after (x, y, z)  ==
+        # a > x OR (a = x AND b > y) OR (a = x AND b = y AND c > z), with a redundant a >= x up
+        # front so the planner still gets a range on the leading index column.
+        lookups = ["lt" if field.startswith("-") else "gt" for field in order]
+        seek = Q()
+        for idx, name in enumerate(fields):
+            clause = Q(**{f"{name}__{lookups[idx]}": position[idx]})
+            for prev_name, prev_value in zip(fields[:idx], position[:idx]):
+                clause &= Q(**{prev_name: prev_value})
+            seek |= clause
+        return Q(**{f"{fields[0]}__{lookups[0]}e": position[0]}) & seek
+
+
+class RowComparison(Func):
+    """`(field, ...) <op> (value, ...)`, usable as a filter condition; values are adapted by their model field."""
+
+    output_field = BooleanField()
+
+    def __init__(self, model, fields, values, operator):
+        self.operator = operator
+        self.width = len(fields)
+        values = [Value(value, output_field=model._meta.get_field(name)) for name, value in zip(fields, values)]
+        super().__init__(*(F(name) for name in fields), *values)
+
+    def as_sql(self, compiler, connection, **extra_context):
+        columns, params = [], []
+        for expression in self.get_source_expressions():
+            sql, expression_params = compiler.compile(expression)
+            columns.append(sql)
+            params.extend(expression_params)
+        left, right = ", ".join(columns[: self.width]), ", ".join(columns[self.width :])
+        return f"({left}) {self.operator} ({right})", params
@@ -33,6 +33,7 @@ INSTALLED_APPS = [
     "drivers.apps.DriversConfig",
     "trips.apps.TripsConfig",
     "reports.apps.ReportsConfig",
+    "search.apps.SearchConfig",
 ]
 
 MIDDLEWARE = [
@@ -139,6 +140,60 @@ SIMPLE_JWT = {
 CORS_ALLOW_ALL_ORIGINS = env_bool("CORS_ALLOW_ALL", True)
 CORS_ALLOWED_ORIGINS = os.environ.get("CORS_ALLOWED_ORIGINS", "").split(",") if not CORS_ALLOW_ALL_ORIGINS else []
 
+# How far ahead recurring trips are expanded into concrete Trip rows.
+TRIP_RECURRENCE_HORIZON_DAYS = int(os.environ.get("TRIP_RECURRENCE_HORIZON_DAYS", 30))
+TRIP_RECURRENCE_MAX_DAYS = int(os.environ.get("TRIP_RECURRENCE_MAX_DAYS", 180))
+
+# The trip event log is an audit trail: rollups, occupancy and the report version are still kept
+# by the synchronous signals in reports.signals, and no consumer ships by default. Handlers listed
+# here ({name: "dotted.path.to.handler"}) are run by `process_trip_events`; events younger than
+# TRIP_EVENT_SETTLE_SECONDS are held back from them (see trips.events.settled_events).
+TRIP_EVENT_CONSUMERS = {}
+TRIP_EVENT_SETTLE_SECONDS = int(os.environ.get("TRIP_EVENT_SETTLE_SECONDS", 5))
+
+# Any Django cache backend works (locmem per process, file or database shared between workers); report
+# invalidation relies on a version counter in the database, not on the cache. For the database
+# backend run `python manage.py createcachetable`.
+CACHES = {
+    "default": {
+        "BACKEND": os.environ.get("CACHE_BACKEND", "django.core.cache.backends.locmem.LocMemCache"),
+        "LOCATION": os.environ.get("CACHE_LOCATION", "municipal-fleet"),
+    }
+}
+REPORT_CACHE_SECONDS = int(os.environ.get("REPORT_CACHE_SECONDS", 600))
+# km/L report: flag vehicles/drivers deviating more than this fraction from the month's fleet average.
+FUEL_EFFICIENCY_OUTLIER_RATIO = float(os.environ.get("FUEL_EFFICIENCY_OUTLIER_RATIO", 0.3))
+# Background report jobs (run_report_jobs worker): queue polling interval and how long a job may
+# stay RUNNING before it is considered abandoned and requeued.
+REPORT_JOB_POLL_SECONDS = float(os.environ.get("REPORT_JOB_POLL_SECONDS", 5))
+REPORT_JOB_TIMEOUT_SECONDS = int(os.environ.get("REPORT_JOB_TIMEOUT_SECONDS", 3600))
+# Maintenance forecast (forecast_maintenance): km and day intervals between services and oil changes,
+# the window the km/day pace is measured over, and the default horizon of the forecast endpoint.
+MAINTENANCE_SERVICE_INTERVAL_KM = int(os.environ.get("MAINTENANCE_SERVICE_INTERVAL_KM", 10000))
+MAINTENANCE_SERVICE_INTERVAL_DAYS = int(os.environ.get("MAINTENANCE_SERVICE_INTERVAL_DAYS", 180))
+OIL_CHANGE_INTERVAL_KM = int(os.environ.get("OIL_CHANGE_INTERVAL_KM", 5000))
+OIL_CHANGE_INTERVAL_DAYS = int(os.environ.get("OIL_CHANGE_INTERVAL_DAYS", 180))
+MAINTENANCE_FORECAST_WINDOW_DAYS = int(os.environ.get("MAINTENANCE_FORECAST_WINDOW_DAYS", 90))
+MAINTENANCE_FORECAST_ALERT_DAYS = int(os.environ.get("MAINTENANCE_FORECAST_ALERT_DAYS", 30))
+# Internal nginx location receipts are handed to via X-Accel-Redirect (e.g. /protected-media/);
+# empty (dev) streams them from Django with FileResponse.
+RECEIPT_ACCEL_REDIRECT_PREFIX = os.environ.get("RECEIPT_ACCEL_REDIRECT_PREFIX", "")
+# Lifetime (seconds) of the signed receipt links in API responses. Cached report bodies can be
+# reused by clients (ETag) until the local date changes, so keep it at least a day.
+RECEIPT_LINK_MAX_AGE = int(os.environ.get("RECEIPT_LINK_MAX_AGE", 86400))
+# gc_receipt_blobs leaves unreferenced receipt files alone for this long (uploads are stored
+# before the fuel log that references them is saved).
+RECEIPT_GC_GRACE_HOURS = float(os.environ.get("RECEIPT_GC_GRACE_HOURS", 24))
+# Utilization report: business hours (local, [open, close) whole hours) the vehicle occupancy is
+# measured against. Changing them requires `refresh_vehicle_occupancy --since` over the history.
+UTILIZATION_BUSINESS_HOURS = (
+    int(os.environ.get("UTILIZATION_OPENS_AT", 6)),
+    int(os.environ.get("UTILIZATION_CLOSES_AT", 22)),
+)
+
+# Safety TTL of the cached daily WhatsApp sheet (the cache key already changes with every trip edit).
+WHATSAPP_BATCH_CACHE_SECONDS = int(os.environ.get("WHATSAPP_BATCH_CACHE_SECONDS", 300))
+
 SPECTACULAR_SETTINGS = {
     "TITLE": "Municipal Fleet API",
     "DESCRIPTION": "API REST para gestão de frotas multi-prefeitura.",
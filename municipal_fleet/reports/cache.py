@@ -0,0 +1,88 @@
+import hashlib
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from django.utils import timezone
+from django.utils.http import parse_etags
+from rest_framework import response, status
+
+from municipal_fleet.filters import request_timezone
+from reports.exports import wants_export
+from reports.models import ReportDataVersion
+
+
+def bump_data_version(municipality_id):
+    """
+    Invalidate the municipality's cached reports once the writer's transaction commits.
+
+    The increment runs after commit, on its own, so concurrent writers of a municipality do not
+    queue on the shared version row for the length of their transactions. Between the commit and
+    the bump a reader may still be answered from the previous version; a rolled back write bumps
+    nothing.
+    """
+    if municipality_id:
+        transaction.on_commit(lambda: _increment_version(municipality_id))
+
+
+def _increment_version(municipality_id):
+    rows = ReportDataVersion.objects.filter(municipality_id=municipality_id)
+    if rows.update(version=F("version") + 1):
+        return
+    try:
+        with transaction.atomic():
+            ReportDataVersion.objects.create(municipality_id=municipality_id, version=1)
+    except IntegrityError:
+        rows.update(version=F("version") + 1)
+
+
+def data_version(municipality_id):
+    version = ReportDataVersion.objects.filter(municipality_id=municipality_id).values_list("version", flat=True)
+    return version.first() or 0
+
+
+def report_cache_key(endpoint, municipality_id, request):
+    """
+    Key of one report response: endpoint, data version, the caller's local date (reports such as
+    the dashboard depend on "today") and the normalized query string.
+    """
+    params = "&".join(f"{name}={value}" for name, value in sorted(request.query_params.items()))
+    today = timezone.localdate(timezone=request_timezone(request))
+    raw = f"{endpoint}|{municipality_id}|{data_version(municipality_id)}|{today.isoformat()}|{params}"
+    return f"reports:{municipality_id}:{hashlib.sha1(raw.encode()).hexdigest()}"
+
+
+def cached_report(endpoint):
+    """
+    Cache a report view's `get` per municipality and answer `If-None-Match` with 304.
+
+    The ETag is derived from the cache key, so a matching client is answered after a single
+    version lookup, without touching the cache or the report tables. Superadmins (cross-tenant
+    data) and file exports (streamed) bypass the cache.
+    """
+
+    def decorator(get):
+        @wraps(get)
+        def wrapper(view, request, *args, **kwargs):
+            user = request.user
+            if user.role == "SUPERADMIN" or not user.municipality_id or wants_export(request):
+                return get(view, request, *args, **kwargs)
+            key = report_cache_key(endpoint, user.municipality_id, request)
+            etag = f'W/"{key.rsplit(":", 1)[-1]}"'
+            headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+            if etag in parse_etags(request.headers.get("If-None-Match", "")):
+                return response.Response(status=status.HTTP_304_NOT_MODIFIED, headers=headers)
+            data = cache.get(key)
+            if data is None:
+                result = get(view, request, *args, **kwargs)
+                if result.status_code != status.HTTP_200_OK:
+                    return result
+                data = result.data
+                cache.set(key, data, settings.REPORT_CACHE_SECONDS)
+            return response.Response(data, headers=headers)
+
+        return wrapper
+
+    return decorator
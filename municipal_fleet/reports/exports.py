@@ -0,0 +1,245 @@
+import csv
+import json
+import zipfile
+from datetime import date, datetime
+from decimal import Decimal
+from xml.sax.saxutils import escape
+
+from django.http import StreamingHttpResponse
+from django.utils import timezone
+from rest_framework.renderers import BaseRenderer, JSONRenderer
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+
+from municipal_fleet.filters import request_timezone
+from reports.queries import EXPORTS, export_rows
+
+EXPORT_CHUNK_SIZE = 2000
+
+
+class CSVRenderer(BaseRenderer):
+    """
+    `?format=csv`. Report exports are streamed by the view (export_response); any other response
+    that reaches this renderer is written as a table with the same layout.
+    """
+
+    media_type = "text/csv"
+    format = "csv"
+    charset = "utf-8"
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        rows, columns = _table(data)
+        tz = request_timezone((renderer_context or {}).get("request"))
+        return "".join(csv_stream(rows, columns, {}, tz)).encode("utf-8")
+
+
+class XLSXRenderer(CSVRenderer):
+    media_type = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+    format = "xlsx"
+    charset = None
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        rows, columns = _table(data)
+        tz = request_timezone((renderer_context or {}).get("request"))
+        return b"".join(xlsx_stream(rows, columns, {}, tz))
+
+
+def _table(data):
+    """(rows, columns) of a response body: a list of objects, a page of them or a single object."""
+    if isinstance(data, dict) and isinstance(data.get("results"), list):
+        data = data["results"]
+    items = data if isinstance(data, list) else [] if data is None else [data]
+    items = [item if isinstance(item, dict) else {"value": item} for item in items]
+    keys = list(dict.fromkeys(key for item in items for key in item))
+    rows = [
+        {
+            key: json.dumps(value, ensure_ascii=False, default=str) if isinstance(value, (dict, list)) else value
+            for key, value in ((key, item.get(key)) for key in keys)
+        }
+        for item in items
+    ]
+    return rows, [(key, str(key)) for key in keys]
+
+
+EXPORT_FORMATS = (CSVRenderer.format, XLSXRenderer.format)
+
+
+def wants_export(request):
+    renderer = getattr(request, "accepted_renderer", None)
+    return renderer is not None and renderer.format in EXPORT_FORMATS
+
+
+class ExportableReportMixin:
+    """Report view that also answers `?format=csv` / `?format=xlsx` with a streamed file."""
+
+    renderer_classes = (*api_settings.DEFAULT_RENDERER_CLASSES, CSVRenderer, XLSXRenderer)
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        # Errors (invalid filters, permissions) stay JSON even when a file was requested.
+        if isinstance(response, Response) and wants_export(request):
+            request.accepted_renderer = JSONRenderer()
+            request.accepted_media_type = JSONRenderer.media_type
+        return super().finalize_response(request, response, *args, **kwargs)
+
+
+class _Echo:
+    """csv.writer target that hands each formatted line back instead of buffering it."""
+
+    def write(self, value):
+        return value
+
+
+class _Sink:
+    """Write-only, unseekable file for ZipFile: collects compressed bytes until the next yield."""
+
+    def __init__(self):
+        self.parts = []
+
+    def write(self, data):
+        self.parts.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def take(self):
+        data = b"".join(self.parts)
+        self.parts = []
+        return data
+
+
+def _cell_text(value, tz):
+    if value is None:
+        return ""
+    if isinstance(value, datetime):
+        return timezone.localtime(value, tz).strftime("%d/%m/%Y %H:%M")
+    if isinstance(value, date):
+        return value.strftime("%d/%m/%Y")
+    if isinstance(value, Decimal):
+        return str(value).replace(".", ",")
+    return str(value)
+
+
+def _chunks(rows, columns, converters):
+    """
+    Rows as value lists in column order. Querysets are fetched in chunks (server-side cursor on
+    PostgreSQL); small precomputed reports arrive as lists.
+    """
+    for row in rows.iterator(chunk_size=EXPORT_CHUNK_SIZE) if hasattr(rows, "iterator") else rows:
+        yield [converters[key](row[key]) if key in converters else row[key] for key, _label in columns]
+
+
+def csv_stream(rows, columns, converters, tz):
+    # `;` and a BOM so spreadsheet software in pt-BR opens the file with the right columns and accents.
+    writer = csv.writer(_Echo(), delimiter=";")
+    yield "\ufeff" + writer.writerow([label for _key, label in columns])
+    buffer = []
+    for values in _chunks(rows, columns, converters):
+        buffer.append(writer.writerow([_cell_text(value, tz) for value in values]))
+        if len(buffer) == EXPORT_CHUNK_SIZE:
+            yield "".join(buffer)
+            buffer = []
+    yield "".join(buffer)
+
+
+XLSX_STATIC_PARTS = {
+    "[Content_Types].xml": (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+        '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+        '<Default Extension="xml" ContentType="application/xml"/>'
+        '<Override PartName="/xl/workbook.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+        '<Override PartName="/xl/worksheets/sheet1.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+        "</Types>"
+    ),
+    "_rels/.rels": (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" Target="xl/workbook.xml" '
+        'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument"/>'
+        "</Relationships>"
+    ),
+    "xl/workbook.xml": (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+        'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+        '<sheets><sheet name="Relatorio" sheetId="1" r:id="rId1"/></sheets>'
+        "</workbook>"
+    ),
+    "xl/_rels/workbook.xml.rels": (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" Target="worksheets/sheet1.xml" '
+        'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet"/>'
+        "</Relationships>"
+    ),
+}
+
+
+def _xlsx_row(values, tz):
+    cells = []
+    for value in values:
+        if isinstance(value, (int, float, Decimal)) and not isinstance(value, bool):
+            cells.append(f"<c><v>{value}</v></c>")
+        elif value not in (None, ""):
+            cells.append(f'<c t="inlineStr"><is><t>{escape(_cell_text(value, tz))}</t></is></c>')
+        else:
+            cells.append("<c/>")
+    return f"<row>{''.join(cells)}</row>"
+
+
+def xlsx_stream(rows, columns, converters, tz):
+    """
+    Single-sheet workbook written row by row into a zip stream: numbers stay numeric, everything
+    else is an inline string, so no shared-strings table has to be held in memory.
+    """
+    sink = _Sink()
+    with zipfile.ZipFile(sink, "w", zipfile.ZIP_DEFLATED) as archive:
+        for name, content in XLSX_STATIC_PARTS.items():
+            archive.writestr(name, content)
+        with archive.open("xl/worksheets/sheet1.xml", "w", force_zip64=True) as sheet:
+            sheet.write(
+                b'<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+                b'<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main"><sheetData>'
+            )
+            sheet.write(_xlsx_row([label for _key, label in columns], tz).encode())
+            for count, values in enumerate(_chunks(rows, columns, converters), start=1):
+                sheet.write(_xlsx_row(values, tz).encode())
+                if count % EXPORT_CHUNK_SIZE == 0:
+                    yield sink.take()
+            sheet.write(b"</sheetData></worksheet>")
+    yield sink.take()
+
+
+STREAMS = {CSVRenderer.format: csv_stream, XLSXRenderer.format: xlsx_stream}
+
+
+def export_stream(kind, file_format, municipality, params, tz, build_url=str):
+    """
+    Chunks of report `kind` (see reports.queries.EXPORTS) as a CSV or XLSX file; CSV chunks are
+    text, XLSX chunks bytes. Rows are read with a chunked iterator, so memory stays constant
+    whatever the row count.
+    """
+    spec = EXPORTS[kind]
+    rows = export_rows(kind, municipality, params, tz)
+    return STREAMS[file_format](rows, spec["columns"], spec["converters"](build_url), tz)
+
+
+def export_response(request, kind):
+    """Stream report `kind` for the caller in the format negotiated from `?format=`."""
+    user = request.user
+    tz = request_timezone(request)
+    file_format = request.accepted_renderer.format
+    municipality = None if user.role == "SUPERADMIN" else user.municipality
+    content_type = request.accepted_renderer.media_type
+    if file_format == CSVRenderer.format:
+        content_type += "; charset=utf-8"
+    result = StreamingHttpResponse(
+        export_stream(kind, file_format, municipality, request.query_params, tz, request.build_absolute_uri),
+        content_type=content_type,
+    )
+    stamp = timezone.localdate(timezone=tz).isoformat()
+    result["Content-Disposition"] = f'attachment; filename="{EXPORTS[kind]["filename"]}-{stamp}.{file_format}"'
+    return result
@@ -0,0 +1,109 @@
+import hashlib
+import json
+import logging
+import tempfile
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.files import File
+from django.core.files.storage import default_storage
+from django.db.models import Sum
+from django.utils import timezone
+
+from reports.cache import data_version
+from reports.exports import export_stream
+from reports.models import ReportDataVersion, ReportJob
+
+logger = logging.getLogger(__name__)
+
+JOB_PARAMS = ("start_date", "end_date", "vehicle_id", "driver_id")
+
+
+def scope_data_version(municipality_id):
+    """Report data version of one municipality, or of all of them (the sum only grows) for superadmins."""
+    if municipality_id:
+        return data_version(municipality_id)
+    return ReportDataVersion.objects.aggregate(total=Sum("version"))["total"] or 0
+
+
+def job_fingerprint(kind, file_format, municipality_id, params):
+    raw = json.dumps(
+        [kind, file_format, municipality_id, sorted(params.items()), scope_data_version(municipality_id)]
+    )
+    return hashlib.sha256(raw.encode()).hexdigest()
+
+
+def submit_job(user, kind, file_format, params):
+    """
+    Queue a report job, or return the job that already covers it: a queued/running one with the
+    same fingerprint, or a finished one whose file is still in storage. Returns (job, created).
+    """
+    municipality = None if user.role == "SUPERADMIN" else user.municipality
+    fingerprint = job_fingerprint(kind, file_format, getattr(municipality, "pk", None), params)
+    existing = ReportJob.objects.filter(fingerprint=fingerprint).exclude(status=ReportJob.Status.FAILED).first()
+    if existing and (existing.status != ReportJob.Status.DONE or default_storage.exists(existing.result.name)):
+        return existing, False
+    job = ReportJob.objects.create(
+        municipality=municipality,
+        requested_by=user,
+        kind=kind,
+        file_format=file_format,
+        params=params,
+        fingerprint=fingerprint,
+    )
+    return job, True
+
+
+def requeue_stale_jobs():
+    """Put back jobs whose worker died mid-run (running for longer than REPORT_JOB_TIMEOUT_SECONDS)."""
+    limit = timezone.now() - timedelta(seconds=settings.REPORT_JOB_TIMEOUT_SECONDS)
+    return ReportJob.objects.filter(status=ReportJob.Status.RUNNING, started_at__lt=limit).update(
+        status=ReportJob.Status.QUEUED, started_at=None
+    )
+
+
+def claim_next_job():
+    """
+    Oldest queued job, marked RUNNING. The claim is a conditional UPDATE on the status, so several
+    workers can poll the same table without locks and without running a job twice.
+    """
+    queued = ReportJob.objects.filter(status=ReportJob.Status.QUEUED).order_by("id").values_list("pk", flat=True)
+    for pk in queued[:10]:
+        claimed = ReportJob.objects.filter(pk=pk, status=ReportJob.Status.QUEUED).update(
+            status=ReportJob.Status.RUNNING, started_at=timezone.now()
+        )
+        if claimed:
+            return ReportJob.objects.select_related("municipality").get(pk=pk)
+    return None
+
+
+def run_job(job):
+    """Write the job's export to a temporary file, then store it under its fingerprint."""
+    tz = job.municipality.tzinfo if job.municipality else timezone.get_default_timezone()
+    try:
+        with tempfile.TemporaryFile() as tmp:
+            for chunk in export_stream(job.kind, job.file_format, job.municipality, job.params, tz):
+                tmp.write(chunk.encode() if isinstance(chunk, str) else chunk)
+            tmp.seek(0)
+            name = default_storage.save(f"report_jobs/{job.fingerprint}.{job.file_format}", File(tmp))
+    except Exception as exc:
+        logger.exception("Report job %s failed", job.pk)
+        ReportJob.objects.filter(pk=job.pk).update(
+            status=ReportJob.Status.FAILED, error=str(exc), finished_at=timezone.now()
+        )
+        return False
+    ReportJob.objects.filter(pk=job.pk).update(status=ReportJob.Status.DONE, result=name, finished_at=timezone.now())
+    return True
+
+
+def process_jobs(limit=None):
+    """Run queued jobs until the queue is empty (or `limit` jobs ran). Returns how many succeeded."""
+    requeue_stale_jobs()
+    done = ran = 0
+    while limit is None or ran < limit:
+        job = claim_next_job()
+        if job is None:
+            break
+        ran += 1
+        done += run_job(job)
+    return done
@@ -0,0 +1,43 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from reports.rollups import expected_rollups, rebuild_rollups, stored_rollups
+from tenants.models import Municipality
+
+
+class Command(BaseCommand):
+    help = (
+        "Reconstrói (ou, com --verify, apenas confere) os contadores do dashboard e de consumo (km/L) "
+        "a partir das tabelas de origem."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--municipality", type=int, help="Restringe a uma prefeitura (id).")
+        parser.add_argument("--verify", action="store_true", help="Só compara e lista divergências, sem gravar.")
+
+    def handle(self, *args, **options):
+        municipalities = Municipality.objects.order_by("id")
+        if options["municipality"]:
+            municipalities = municipalities.filter(id=options["municipality"])
+
+        drifted = 0
+        for municipality in municipalities:
+            if not options["verify"]:
+                rebuild_rollups(municipality)
+                continue
+            expected, stored = expected_rollups(municipality), stored_rollups(municipality)
+            for label, want, have in zip(("veículos", "viagens", "eficiência"), expected, stored):
+                for key in sorted(want.keys() | have.keys(), key=str):
+                    if want.get(key) != have.get(key):
+                        drifted += 1
+                        self.stdout.write(
+                            self.style.WARNING(
+                                f"{municipality} {label} {key}: esperado {want.get(key, 0)}, armazenado {have.get(key, 0)}"
+                            )
+                        )
+
+        if options["verify"]:
+            if drifted:
+                raise CommandError(f"{drifted} contadores divergentes; rode sem --verify para corrigir.")
+            self.stdout.write(self.style.SUCCESS("Contadores do dashboard conferem."))
+        else:
+            self.stdout.write(self.style.SUCCESS("Contadores do dashboard reconstruídos."))
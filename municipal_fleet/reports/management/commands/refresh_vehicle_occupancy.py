@@ -0,0 +1,36 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from rest_framework import serializers
+
+from municipal_fleet.filters import parse_date_range
+from reports.occupancy import rebuild_occupancy, refresh_queued
+from tenants.models import Municipality
+
+
+class Command(BaseCommand):
+    help = (
+        "Atualiza a ocupação diária dos veículos (relatório de utilização): processa os dias marcados "
+        "pelas alterações de viagens ou, com --since, recalcula um período inteiro. Rode diariamente (cron)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--since", help="Recalcula todos os veículos a partir desta data (AAAA-MM-DD).")
+        parser.add_argument("--until", help="Último dia recalculado com --since (padrão: hoje).")
+        parser.add_argument("--municipality", type=int, help="Restringe o --since a uma prefeitura (id).")
+
+    def handle(self, *args, **options):
+        if not options["since"]:
+            self.stdout.write(self.style.SUCCESS(f"Dias de veículo atualizados: {refresh_queued()}"))
+            return
+        try:
+            since, until = parse_date_range(options, "since", "until")
+        except serializers.ValidationError as exc:
+            raise CommandError(exc.detail) from exc
+        municipalities = Municipality.objects.order_by("id")
+        if options["municipality"]:
+            municipalities = municipalities.filter(id=options["municipality"])
+        total = 0
+        for municipality in municipalities:
+            last = until or timezone.localdate(timezone=municipality.tzinfo)
+            total += rebuild_occupancy(municipality, since, last)
+        self.stdout.write(self.style.SUCCESS(f"Dias de veículo recalculados: {total}"))
@@ -0,0 +1,29 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from reports.jobs import process_jobs
+
+
+class Command(BaseCommand):
+    help = "Worker dos relatórios em segundo plano: executa os ReportJob da fila (banco de dados, sem broker)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--once", action="store_true", help="Processa a fila atual e sai.")
+        parser.add_argument(
+            "--poll", type=float, help="Segundos entre consultas à fila (padrão REPORT_JOB_POLL_SECONDS)."
+        )
+
+    def handle(self, *args, **options):
+        if options["once"]:
+            self.stdout.write(self.style.SUCCESS(f"Relatórios gerados: {process_jobs()}"))
+            return
+        poll = options["poll"] or settings.REPORT_JOB_POLL_SECONDS
+        while True:
+            close_old_connections()
+            done = process_jobs()
+            if done:
+                self.stdout.write(f"Relatórios gerados: {done}")
+            time.sleep(poll)
@@ -0,0 +1,77 @@
+# Generated by Django 5.2.18 on 2026-10-18 05:19
+
+from zoneinfo import ZoneInfo
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count
+from django.db.models.functions import ExtractMonth, ExtractYear
+
+
+def backfill_rollups(apps, schema_editor):
+    Municipality = apps.get_model("tenants", "Municipality")
+    Vehicle = apps.get_model("fleet", "Vehicle")
+    Trip = apps.get_model("trips", "Trip")
+    VehicleStatusRollup = apps.get_model("reports", "VehicleStatusRollup")
+    TripMonthRollup = apps.get_model("reports", "TripMonthRollup")
+    for municipality_id, tz_name in Municipality.objects.values_list("id", "timezone"):
+        tz = ZoneInfo(tz_name)
+        vehicles = Vehicle.objects.filter(municipality_id=municipality_id).values("status").annotate(total=Count("id"))
+        VehicleStatusRollup.objects.bulk_create(
+            VehicleStatusRollup(municipality_id=municipality_id, status=row["status"], total=row["total"])
+            for row in vehicles.order_by()
+        )
+        trips = (
+            Trip.objects.filter(municipality_id=municipality_id)
+            .annotate(y=ExtractYear("departure_datetime", tzinfo=tz), m=ExtractMonth("departure_datetime", tzinfo=tz))
+            .values("y", "m", "status")
+            .annotate(total=Count("id"))
+            .order_by()
+        )
+        TripMonthRollup.objects.bulk_create(
+            TripMonthRollup(
+                municipality_id=municipality_id, year=row["y"], month=row["m"], status=row["status"], total=row["total"]
+            )
+            for row in trips
+        )
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        ('tenants', '0002_municipality_timezone'),
+        ('fleet', '0003_keyset_pagination_index'),
+        ('trips', '0011_trip_passenger_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TripMonthRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('year', models.IntegerField()),
+                ('month', models.IntegerField()),
+                ('status', models.CharField(max_length=20)),
+                ('total', models.IntegerField(default=0)),
+                ('municipality', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='tenants.municipality')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('municipality', 'year', 'month', 'status'), name='trip_month_rollup_unique')],
+            },
+        ),
+        migrations.CreateModel(
+            name='VehicleStatusRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('status', models.CharField(max_length=20)),
+                ('total', models.IntegerField(default=0)),
+                ('municipality', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='tenants.municipality')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('municipality', 'status'), name='vehicle_status_rollup_unique')],
+            },
+        ),
+        migrations.RunPython(backfill_rollups, migrations.RunPython.noop),
+    ]
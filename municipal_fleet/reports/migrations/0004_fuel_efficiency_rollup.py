@@ -0,0 +1,85 @@
+# Generated by Django 5.2.18 on 2026-10-18 05:38
+
+from zoneinfo import ZoneInfo
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import ExpressionWrapper, F, IntegerField, Sum
+from django.db.models.functions import ExtractMonth, ExtractYear
+
+
+def backfill_fuel_efficiency(apps, schema_editor):
+    Municipality = apps.get_model("tenants", "Municipality")
+    Trip = apps.get_model("trips", "Trip")
+    FuelLog = apps.get_model("fleet", "FuelLog")
+    FuelEfficiencyRollup = apps.get_model("reports", "FuelEfficiencyRollup")
+    for municipality_id, tz_name in Municipality.objects.values_list("id", "timezone"):
+        tz = ZoneInfo(tz_name)
+        totals = {}
+        trips = (
+            Trip.objects.filter(
+                municipality_id=municipality_id,
+                status="COMPLETED",
+                odometer_end__isnull=False,
+                odometer_end__gte=F("odometer_start"),
+            )
+            .annotate(y=ExtractYear("departure_datetime", tzinfo=tz), m=ExtractMonth("departure_datetime", tzinfo=tz))
+            .values("vehicle_id", "driver_id", "y", "m")
+            .annotate(km=Sum(ExpressionWrapper(F("odometer_end") - F("odometer_start"), output_field=IntegerField())))
+            .order_by()
+        )
+        for row in trips:
+            totals[(row["vehicle_id"], row["driver_id"], row["y"], row["m"])] = [row["km"], 0]
+        logs = (
+            FuelLog.objects.filter(municipality_id=municipality_id)
+            .annotate(y=ExtractYear("filled_at"), m=ExtractMonth("filled_at"))
+            .values("vehicle_id", "driver_id", "y", "m")
+            .annotate(liters=Sum("liters"))
+            .order_by()
+        )
+        for row in logs:
+            totals.setdefault((row["vehicle_id"], row["driver_id"], row["y"], row["m"]), [0, 0])[1] = row["liters"]
+        FuelEfficiencyRollup.objects.bulk_create(
+            FuelEfficiencyRollup(
+                municipality_id=municipality_id,
+                vehicle_id=vehicle_id,
+                driver_id=driver_id,
+                year=year,
+                month=month,
+                kilometers=km,
+                liters=liters,
+            )
+            for (vehicle_id, driver_id, year, month), (km, liters) in totals.items()
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('drivers', '0002_driver_access_code'),
+        ('fleet', '0003_keyset_pagination_index'),
+        ('reports', '0003_report_job'),
+        ('tenants', '0002_municipality_timezone'),
+        ('trips', '0011_trip_passenger_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FuelEfficiencyRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('year', models.IntegerField()),
+                ('month', models.IntegerField()),
+                ('kilometers', models.BigIntegerField(default=0)),
+                ('liters', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('driver', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='drivers.driver')),
+                ('municipality', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='tenants.municipality')),
+                ('vehicle', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='fleet.vehicle')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['municipality', 'year', 'month'], name='fuel_efficiency_month_idx')],
+                'constraints': [models.UniqueConstraint(fields=('vehicle', 'driver', 'year', 'month'), name='fuel_efficiency_rollup_unique')],
+            },
+        ),
+        migrations.RunPython(backfill_fuel_efficiency, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,42 @@
+# Generated by Django 5.2.18 on 2026-10-18 05:49
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('fleet', '0003_keyset_pagination_index'),
+        ('reports', '0004_fuel_efficiency_rollup'),
+        ('tenants', '0002_municipality_timezone'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OccupancyRefresh',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('vehicle', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='fleet.vehicle')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('vehicle', 'day'), name='occupancy_refresh_unique')],
+            },
+        ),
+        migrations.CreateModel(
+            name='VehicleDayOccupancy',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('slots', models.BinaryField()),
+                ('busy_slots', models.SmallIntegerField(default=0)),
+                ('municipality', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='tenants.municipality')),
+                ('vehicle', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='fleet.vehicle')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['municipality', 'day'], name='vehicle_occupancy_day_idx')],
+                'constraints': [models.UniqueConstraint(fields=('vehicle', 'day'), name='vehicle_day_occupancy_unique')],
+            },
+        ),
+    ]
@@ -0,0 +1,135 @@
+from django.db import models
+
+
+class VehicleStatusRollup(models.Model):
+    """Number of vehicles per status, kept in step with vehicle writes (reports.signals)."""
+
+    municipality = models.ForeignKey("tenants.Municipality", on_delete=models.CASCADE, related_name="+")
+    status = models.CharField(max_length=20)
+    total = models.IntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["municipality", "status"], name="vehicle_status_rollup_unique"),
+        ]
+
+
+class TripMonthRollup(models.Model):
+    """Number of trips per status and departure month (municipality local time)."""
+
+    municipality = models.ForeignKey("tenants.Municipality", on_delete=models.CASCADE, related_name="+")
+    year = models.IntegerField()
+    month = models.IntegerField()
+    status = models.CharField(max_length=20)
+    total = models.IntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["municipality", "year", "month", "status"], name="trip_month_rollup_unique"
+            ),
+        ]
+
+
+class FuelEfficiencyRollup(models.Model):
+    """
+    Kilometers of completed trips and liters of fuel logs per vehicle, driver and month (local
+    time), kept in step with Trip/FuelLog writes; the km/L report ranks from these rows.
+    """
+
+    municipality = models.ForeignKey("tenants.Municipality", on_delete=models.CASCADE, related_name="+")
+    vehicle = models.ForeignKey("fleet.Vehicle", on_delete=models.CASCADE, related_name="+")
+    driver = models.ForeignKey("drivers.Driver", on_delete=models.CASCADE, related_name="+")
+    year = models.IntegerField()
+    month = models.IntegerField()
+    kilometers = models.BigIntegerField(default=0)
+    liters = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["vehicle", "driver", "year", "month"], name="fuel_efficiency_rollup_unique"
+            ),
+        ]
+        indexes = [models.Index(fields=["municipality", "year", "month"], name="fuel_efficiency_month_idx")]
+
+
+class VehicleDayOccupancy(models.Model):
+    """
+    Business-hour slots (SLOT_MINUTES each) a vehicle spent on trips during a local day, as a
+    little-endian bitmap plus its popcount. Written by `refresh_vehicle_occupancy`; days without
+    any occupied slot have no row.
+    """
+
+    municipality = models.ForeignKey("tenants.Municipality", on_delete=models.CASCADE, related_name="+")
+    vehicle = models.ForeignKey("fleet.Vehicle", on_delete=models.CASCADE, related_name="+")
+    day = models.DateField()
+    slots = models.BinaryField()
+    busy_slots = models.SmallIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["vehicle", "day"], name="vehicle_day_occupancy_unique"),
+        ]
+        indexes = [models.Index(fields=["municipality", "day"], name="vehicle_occupancy_day_idx")]
+
+
+class OccupancyRefresh(models.Model):
+    """Vehicle-day whose occupancy changed since the last `refresh_vehicle_occupancy` run."""
+
+    vehicle = models.ForeignKey("fleet.Vehicle", on_delete=models.CASCADE, related_name="+")
+    day = models.DateField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["vehicle", "day"], name="occupancy_refresh_unique"),
+        ]
+
+
+class ReportDataVersion(models.Model):
+    """Bumped by every write that can change a municipality's reports (reports.cache)."""
+
+    municipality = models.OneToOneField(
+        "tenants.Municipality", on_delete=models.CASCADE, primary_key=True, related_name="+"
+    )
+    version = models.BigIntegerField(default=0)
+
+
+class ReportJob(models.Model):
+    """A report export computed by the `run_report_jobs` worker instead of a request worker."""
+
+    class Kind(models.TextChoices):
+        ODOMETER = "odometer", "Odômetro"
+        TRIPS = "trips", "Viagens"
+        FUEL = "fuel", "Abastecimentos"
+
+    class Format(models.TextChoices):
+        CSV = "csv", "CSV"
+        XLSX = "xlsx", "XLSX"
+
+    class Status(models.TextChoices):
+        QUEUED = "QUEUED", "Na fila"
+        RUNNING = "RUNNING", "Em execução"
+        DONE = "DONE", "Concluído"
+        FAILED = "FAILED", "Falhou"
+
+    # Null for superadmin jobs, which cover every municipality.
+    municipality = models.ForeignKey(
+        "tenants.Municipality", on_delete=models.CASCADE, null=True, blank=True, related_name="report_jobs"
+    )
+    requested_by = models.ForeignKey("accounts.User", on_delete=models.SET_NULL, null=True, related_name="report_jobs")
+    kind = models.CharField(max_length=20, choices=Kind.choices)
+    file_format = models.CharField(max_length=10, choices=Format.choices, default=Format.CSV)
+    params = models.JSONField(default=dict, blank=True)
+    # Hash of kind, format, scope, params and report data version: equal fingerprints, equal files.
+    fingerprint = models.CharField(max_length=64, db_index=True)
+    status = models.CharField(max_length=20, choices=Status.choices, default=Status.QUEUED)
+    result = models.FileField(upload_to="report_jobs/", blank=True)
+    error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ["-id"]
+        indexes = [models.Index(fields=["status", "id"], name="reportjob_status_idx")]
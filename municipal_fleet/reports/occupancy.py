@@ -0,0 +1,239 @@
+from collections import defaultdict
+from datetime import datetime, time, timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import DateField, Sum
+from django.db.models.functions import Coalesce, Trunc
+from django.utils import timezone
+from rest_framework import serializers
+
+from fleet.models import Vehicle
+from municipal_fleet.filters import local_day_start
+from reports.cache import bump_data_version
+from reports.models import OccupancyRefresh, VehicleDayOccupancy
+from reports.rollups import municipality_timezones
+from reports.series import SERIES_MAX_POINTS, next_bucket, series_range
+from tenants.models import Municipality
+from trips.models import Trip
+
+SLOT_MINUTES = 15
+UTILIZATION_BUCKETS = ("week", "month")
+
+# Trip fields the occupied days depend on (snapshotted by reports.signals).
+TRIP_OCCUPANCY_FIELDS = (
+    "municipality_id",
+    "vehicle_id",
+    "departure_datetime",
+    "return_datetime_expected",
+    "return_datetime_actual",
+    "status",
+)
+
+
+def business_window(day, tz):
+    """[start, end) of the business hours (UTILIZATION_BUSINESS_HOURS) of a local day."""
+    opens, closes = settings.UTILIZATION_BUSINESS_HOURS
+    start = datetime.combine(day, time(opens), tzinfo=tz)
+    return start, start + timedelta(hours=closes - opens)
+
+
+def slots_per_day():
+    opens, closes = settings.UTILIZATION_BUSINESS_HOURS
+    return (closes - opens) * 60 // SLOT_MINUTES
+
+
+def occupied_days(departure, returns, tz):
+    """Local dates touched by the interval [departure, returns)."""
+    first = departure.astimezone(tz).date()
+    last = (returns - timedelta(microseconds=1)).astimezone(tz).date()
+    return [first + timedelta(days=offset) for offset in range((last - first).days + 1)]
+
+
+def trip_days(state, zones):
+    """(vehicle_id, day) pairs covered by a TRIP_OCCUPANCY_FIELDS snapshot."""
+    municipality_id, vehicle_id, departure, expected, actual, _status = state
+    returns = actual or expected
+    if returns <= departure:
+        return set()
+    return {(vehicle_id, day) for day in occupied_days(departure, returns, zones[municipality_id])}
+
+
+def queue_refresh(states, trips=()):
+    """Mark the vehicle-days of trip snapshots (old and new) for the next refresh_vehicle_occupancy run."""
+    states = [state for state in states if state]
+    if not states:
+        return
+    zones = municipality_timezones({state[0] for state in states}, trips)
+    pairs = set().union(*(trip_days(state, zones) for state in states))
+    OccupancyRefresh.objects.bulk_create(
+        [OccupancyRefresh(vehicle_id=vehicle_id, day=day) for vehicle_id, day in pairs], ignore_conflicts=True
+    )
+
+
+def day_bitmap(intervals, day, tz):
+    """
+    Slots of `day`'s business hours covered by any interval, as an int bitmask (bit 0 = first slot).
+    Overlapping trips simply OR into the same bits, and intervals are clipped to the window.
+    """
+    start, end = business_window(day, tz)
+    slot = timedelta(minutes=SLOT_MINUTES)
+    mask = 0
+    for departure, returns in intervals:
+        lower, upper = max(departure, start), min(returns, end)
+        if lower >= upper:
+            continue
+        first = (lower - start) // slot
+        last = -((start - upper) // slot)  # ceiling: a partly used slot counts as used
+        mask |= ((1 << (last - first)) - 1) << first
+    return mask
+
+
+def compute_occupancy(municipality, pairs):
+    """Recompute and store the occupancy rows of (vehicle_id, day) pairs of one municipality."""
+    if not pairs:
+        return 0
+    tz = municipality.tzinfo
+    days = sorted({day for _vehicle_id, day in pairs})
+    lower, upper = local_day_start(days[0], tz), local_day_start(days[-1] + timedelta(days=1), tz)
+    trips = (
+        Trip.objects.filter(vehicle_id__in={vehicle_id for vehicle_id, _day in pairs}, departure_datetime__lt=upper)
+        .exclude(status=Trip.Status.CANCELLED)
+        .annotate(ends_at=Coalesce("return_datetime_actual", "return_datetime_expected"))
+        .filter(ends_at__gt=lower)
+        .values_list("vehicle_id", "departure_datetime", "ends_at")
+    )
+    intervals = defaultdict(list)
+    for vehicle_id, departure, returns in trips:
+        intervals[vehicle_id].append((departure, returns))
+
+    size = (slots_per_day() + 7) // 8
+    rows, empty = [], []
+    for vehicle_id, day in pairs:
+        mask = day_bitmap(intervals[vehicle_id], day, tz)
+        if mask:
+            rows.append(
+                VehicleDayOccupancy(
+                    municipality=municipality,
+                    vehicle_id=vehicle_id,
+                    day=day,
+                    slots=mask.to_bytes(size, "little"),
+                    busy_slots=mask.bit_count(),
+                )
+            )
+        else:
+            empty.append((vehicle_id, day))
+    with transaction.atomic():
+        VehicleDayOccupancy.objects.bulk_create(
+            rows, update_conflicts=True, unique_fields=["vehicle", "day"], update_fields=["slots", "busy_slots"]
+        )
+        for vehicle_id, day in empty:
+            VehicleDayOccupancy.objects.filter(vehicle_id=vehicle_id, day=day).delete()
+        bump_data_version(municipality.pk)
+    return len(pairs)
+
+
+def refresh_queued(batch_size=1000):
+    """Process the OccupancyRefresh queue in batches; returns the number of vehicle-days refreshed."""
+    total = 0
+    while True:
+        queued = list(
+            OccupancyRefresh.objects.order_by("id").values_list("id", "vehicle_id", "vehicle__municipality_id", "day")[
+                :batch_size
+            ]
+        )
+        if not queued:
+            return total
+        by_municipality = defaultdict(set)
+        for _pk, vehicle_id, municipality_id, day in queued:
+            by_municipality[municipality_id].add((vehicle_id, day))
+        with transaction.atomic():
+            # Dequeued before reading the trips: a trip saved meanwhile queues its days again.
+            OccupancyRefresh.objects.filter(pk__in=[row[0] for row in queued]).delete()
+            for municipality in Municipality.objects.filter(pk__in=by_municipality):
+                total += compute_occupancy(municipality, by_municipality[municipality.pk])
+
+
+def rebuild_occupancy(municipality, since, until):
+    """Recompute every vehicle of a municipality for each local day in [since, until]."""
+    vehicles = list(Vehicle.objects.filter(municipality=municipality).values_list("pk", flat=True))
+    total, day = 0, since
+    while day <= until:
+        # A month at a time keeps the trip query and the upsert batch bounded.
+        chunk_end = min(until, day + timedelta(days=30))
+        days = [day + timedelta(days=offset) for offset in range((chunk_end - day).days + 1)]
+        total += compute_occupancy(municipality, {(vehicle_id, d) for vehicle_id in vehicles for d in days})
+        day = chunk_end + timedelta(days=1)
+    return total
+
+
+def utilization_report(municipality, params, tz):
+    """
+    Used vs available business hours per week or month (`bucket`), fleet-wide and per vehicle,
+    summed from VehicleDayOccupancy: a year of a whole fleet is one aggregate over day rows.
+
+    The range is widened to whole buckets like the chart series and stops at today; available
+    hours are business hours of every day in range for every vehicle in the filter.
+    """
+    bucket = params.get("bucket", "month")
+    if bucket not in UTILIZATION_BUCKETS:
+        raise serializers.ValidationError({"bucket": f"Use {', '.join(UTILIZATION_BUCKETS)}."})
+    first, last = series_range(params, bucket, tz)
+    periods = [first]
+    while periods[-1] < last:
+        periods.append(next_bucket(periods[-1], bucket))
+        if len(periods) > SERIES_MAX_POINTS:
+            raise serializers.ValidationError(
+                {"bucket": f"Intervalo longo demais para {bucket}: máximo de {SERIES_MAX_POINTS} pontos."}
+            )
+    upper = min(next_bucket(last, bucket) - timedelta(days=1), timezone.localdate(timezone=tz))
+
+    vehicles = Vehicle.objects.order_by("license_plate")
+    occupancy = VehicleDayOccupancy.objects.filter(day__gte=first, day__lte=upper)
+    if municipality is not None:
+        vehicles = vehicles.filter(municipality=municipality)
+        occupancy = occupancy.filter(municipality=municipality)
+    if params.get("vehicle_id"):
+        vehicles = vehicles.filter(pk=params["vehicle_id"])
+        occupancy = occupancy.filter(vehicle_id=params["vehicle_id"])
+    vehicles = list(vehicles.values_list("pk", "license_plate"))
+
+    slot_hours = SLOT_MINUTES / 60
+    day_hours = slots_per_day() * slot_hours
+    by_period = {
+        row["period"]: row["busy"]
+        for row in occupancy.annotate(period=Trunc("day", bucket, output_field=DateField()))
+        .values("period")
+        .annotate(busy=Sum("busy_slots"))
+        .order_by()
+    }
+    by_vehicle = dict(occupancy.values("vehicle_id").annotate(busy=Sum("busy_slots")).values_list("vehicle_id", "busy"))
+
+    def entry(busy, days, count=1):
+        used, available = round((busy or 0) * slot_hours, 2), round(max(days, 0) * day_hours * count, 2)
+        return {
+            "used_hours": used,
+            "available_hours": available,
+            "utilization": round(used / available, 4) if available else None,
+        }
+
+    total_days = (upper - first).days + 1
+    return {
+        "bucket": bucket,
+        "business_hours": list(settings.UTILIZATION_BUSINESS_HOURS),
+        "periods": [
+            {
+                "period": period,
+                **entry(
+                    by_period.get(period),
+                    (min(next_bucket(period, bucket), upper + timedelta(days=1)) - period).days,
+                    len(vehicles),
+                ),
+            }
+            for period in periods
+        ],
+        "vehicles": [
+            {"vehicle_id": pk, "license_plate": plate, **entry(by_vehicle.get(pk), total_days)}
+            for pk, plate in vehicles
+        ],
+    }
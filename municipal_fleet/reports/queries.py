@@ -0,0 +1,257 @@
+from datetime import timedelta
+from zoneinfo import ZoneInfo
+
+from django.conf import settings
+from django.db.models import ExpressionWrapper, F, FloatField, Func, IntegerField, Sum, Window
+from django.db.models.functions import Cast, NullIf, Rank
+from django.utils import timezone
+
+from fleet.models import FuelLog
+from fleet.storage import receipt_storage
+from municipal_fleet.filters import day_bounds, filter_date_params, parse_date_range
+from reports.models import FuelEfficiencyRollup
+from tenants.models import Municipality
+from trips.models import MonthlyOdometer, Trip
+
+# Report rows shared by the report views and the background report jobs. Each builder takes the
+# municipality to scope to (None = all, superadmin), the filter params and the local timezone.
+
+
+def _filter_ids(qs, params):
+    driver_id = params.get("driver_id")
+    vehicle_id = params.get("vehicle_id")
+    if driver_id:
+        qs = qs.filter(driver_id=driver_id)
+    if vehicle_id:
+        qs = qs.filter(vehicle_id=vehicle_id)
+    return qs
+
+
+def _month_after(day):
+    return (day.replace(day=28) + timedelta(days=4)).replace(day=1)
+
+
+def _is_month_end(day):
+    return _month_after(day) - timedelta(days=1) == day
+
+
+def plan_odometer_range(start, end):
+    """
+    Split inclusive local dates into whole months and partial edges.
+
+    Returns ((first_month, last_month), [(edge_start, edge_end), ...]): the months as (year, month)
+    bounds, either side None when open, or None when no month is fully covered (everything then
+    comes from the edges).
+    """
+    first = start if start is None or start.day == 1 else _month_after(start)
+    last = end if end is None or _is_month_end(end) else end.replace(day=1) - timedelta(days=1)
+    if first and last and first > last:
+        return None, [(start, end)]
+    edges = []
+    if start and first != start:
+        edges.append((start, first - timedelta(days=1)))
+    if end and last != end:
+        edges.append((last + timedelta(days=1), end))
+    months = ((first.year, first.month) if first else None, (last.year, last.month) if last else None)
+    return months, edges
+
+
+def _odometer_scope(municipality_ids, params, tz, start, end, totals):
+    """Add the km of one group of municipalities (sharing `tz`) to `totals` by vehicle."""
+    distance = ExpressionWrapper(F("odometer_end") - F("odometer_start"), output_field=IntegerField())
+    trips = _filter_ids(Trip.objects.filter(municipality_id__in=municipality_ids), params).filter(
+        # Same rule as record_trip_distance, so a month reads the same from MonthlyOdometer or trips.
+        status=Trip.Status.COMPLETED,
+        odometer_end__gte=F("odometer_start"),
+    )
+    months, edges = plan_odometer_range(start, end)
+    if params.get("driver_id"):
+        # MonthlyOdometer has no driver: the whole range is answered from trips.
+        months, edges = None, [(start, end)]
+    if months:
+        monthly = MonthlyOdometer.objects.filter(vehicle__municipality_id__in=municipality_ids, kilometers__gt=0)
+        if params.get("vehicle_id"):
+            monthly = monthly.filter(vehicle_id=params["vehicle_id"])
+        monthly = monthly.annotate(period=F("year") * 100 + F("month"))
+        if months[0]:
+            monthly = monthly.filter(period__gte=months[0][0] * 100 + months[0][1])
+        if months[1]:
+            monthly = monthly.filter(period__lte=months[1][0] * 100 + months[1][1])
+        rows = monthly.values("vehicle_id", "vehicle__license_plate").annotate(km=Sum("kilometers")).order_by()
+        for row in rows:
+            _add_kilometers(totals, row)
+    for edge_start, edge_end in edges:
+        lower, upper = day_bounds(edge_start, edge_end, tz)
+        edge = trips
+        if lower:
+            edge = edge.filter(departure_datetime__gte=lower)
+        if upper:
+            edge = edge.filter(departure_datetime__lt=upper)
+        for row in edge.values("vehicle_id", "vehicle__license_plate").annotate(km=Sum(distance)).order_by():
+            _add_kilometers(totals, row)
+
+
+def _add_kilometers(totals, row):
+    entry = totals.setdefault(
+        row["vehicle_id"],
+        {"vehicle_id": row["vehicle_id"], "vehicle__license_plate": row["vehicle__license_plate"], "kilometers": 0},
+    )
+    entry["kilometers"] += row["km"] or 0
+
+
+def odometer_rows(municipality, params, tz):
+    """
+    Kilometers per vehicle over `start_date`/`end_date`, ordered by plate.
+
+    Whole months are read from MonthlyOdometer and only the partial months at the edges from the
+    trips themselves, so a year costs a few hundred summary rows. Without a municipality
+    (superadmin) the plan runs once per timezone, so every municipality's months and dates follow
+    its own local time, as MonthlyOdometer does.
+    """
+    start, end = parse_date_range(params)
+    totals = {}
+    if municipality is not None:
+        _odometer_scope([municipality.pk], params, tz, start, end, totals)
+    else:
+        zones = {}
+        for pk, zone in Municipality.objects.values_list("pk", "timezone"):
+            zones.setdefault(zone, []).append(pk)
+        for zone, municipality_ids in zones.items():
+            _odometer_scope(municipality_ids, params, ZoneInfo(zone), start, end, totals)
+    return sorted(totals.values(), key=lambda row: row["vehicle__license_plate"])
+
+
+def trip_queryset(municipality, params, tz):
+    qs = Trip.objects.select_related("vehicle", "driver")
+    if municipality is not None:
+        qs = qs.filter(municipality=municipality)
+    return _filter_ids(filter_date_params(qs, params, tz, "departure_datetime"), params)
+
+
+def fuel_queryset(municipality, params, tz):
+    qs = FuelLog.objects.select_related("vehicle", "driver")
+    if municipality is not None:
+        qs = qs.filter(municipality=municipality)
+    return filter_date_params(_filter_ids(qs, params), params, tz, "filled_at")
+
+
+class _WindowAvg(Func):
+    """AVG() as a window over an aggregated column (Django's Avg refuses to wrap an aggregate)."""
+
+    function = "AVG"
+    output_field = FloatField()
+    window_compatible = True
+
+
+EFFICIENCY_GROUPS = {
+    "vehicle": ("vehicle_id", "vehicle__license_plate"),
+    "driver": ("driver_id", "driver__name"),
+}
+
+
+def fuel_efficiency_rows(municipality, params, tz, group="vehicle"):
+    """
+    km/L per vehicle (or driver) and month from FuelEfficiencyRollup, ranked within each
+    municipality and month by window functions, with the month's fleet average alongside.
+
+    `start_date`/`end_date` select whole months (default: the current local month). Rows with km
+    but no fuel logged have no km/L and rank last.
+    """
+    start, end = parse_date_range(params)
+    today = timezone.localdate(timezone=tz)
+    first, last = start or end or today, end or start or today
+    qs = FuelEfficiencyRollup.objects.annotate(period=F("year") * 100 + F("month")).filter(
+        period__gte=first.year * 100 + first.month, period__lte=last.year * 100 + last.month
+    )
+    if municipality is not None:
+        qs = qs.filter(municipality=municipality)
+    key, label = EFFICIENCY_GROUPS[group]
+    km_per_liter = Cast(F("total_km"), FloatField()) / NullIf(Cast(F("total_liters"), FloatField()), 0.0)
+    partition = [F("municipality_id"), F("year"), F("month")]
+    rows = (
+        qs.values("municipality_id", "year", "month", key, label)
+        .annotate(total_km=Sum("kilometers"), total_liters=Sum("liters"))
+        .annotate(km_per_liter=km_per_liter)
+        .annotate(
+            rank=Window(Rank(), partition_by=partition, order_by=F("km_per_liter").desc(nulls_last=True)),
+            fleet_average=Window(_WindowAvg(F("km_per_liter")), partition_by=partition),
+        )
+        .order_by("year", "month", "municipality_id", "rank", label)
+    )
+    threshold = settings.FUEL_EFFICIENCY_OUTLIER_RATIO
+    result = []
+    for row in rows:
+        row["kilometers"], row["liters"] = row.pop("total_km"), row.pop("total_liters")
+        ratio, average = row["km_per_liter"], row["fleet_average"]
+        row["km_per_liter"] = round(ratio, 2) if ratio is not None else None
+        row["fleet_average"] = round(average, 2) if average is not None else None
+        # Outlier: km/L more than FUEL_EFFICIENCY_OUTLIER_RATIO away from the month's fleet average.
+        row["outlier"] = bool(ratio is not None and average and abs(ratio - average) > threshold * average)
+        result.append(row)
+    return result
+
+
+def _trip_labels(build_url):
+    return {
+        "status": lambda value: Trip.Status(value).label,
+        "category": lambda value: Trip.Category(value).label,
+    }
+
+
+def _fuel_labels(build_url):
+    return {"receipt_image": lambda name: build_url(receipt_storage().url(name)) if name else ""}
+
+
+# Export of each report as a file: row builder, ordering, (key, header) columns matching the
+# frontend report tables, value converters (given a URL builder) and the download file name.
+EXPORTS = {
+    "odometer": {
+        "queryset": odometer_rows,
+        "ordering": ("vehicle__license_plate",),
+        "columns": (("vehicle__license_plate", "Veículo"), ("kilometers", "KM Rodados")),
+        "converters": lambda build_url: {},
+        "filename": "odometro",
+    },
+    "trips": {
+        "queryset": trip_queryset,
+        "ordering": ("-departure_datetime", "-id"),
+        "columns": (
+            ("id", "ID"),
+            ("origin", "Origem"),
+            ("destination", "Destino"),
+            ("category", "Categoria"),
+            ("status", "Status"),
+            ("departure_datetime", "Saída"),
+            ("return_datetime_expected", "Retorno"),
+            ("passengers_count", "Passageiros"),
+            ("vehicle__license_plate", "Veículo"),
+            ("driver__name", "Motorista"),
+        ),
+        "converters": _trip_labels,
+        "filename": "viagens",
+    },
+    "fuel": {
+        "queryset": fuel_queryset,
+        "ordering": ("-filled_at", "-created_at", "-id"),
+        "columns": (
+            ("filled_at", "Data"),
+            ("fuel_station", "Posto"),
+            ("liters", "Litros"),
+            ("vehicle__license_plate", "Veículo"),
+            ("driver__name", "Motorista"),
+            ("notes", "Observações"),
+            ("receipt_image", "Comprovante"),
+        ),
+        "converters": _fuel_labels,
+        "filename": "abastecimentos",
+    },
+}
+
+
+def export_rows(kind, municipality, params, tz):
+    """Ordered `.values()` rows of an export, restricted to its columns (lists are already final)."""
+    spec = EXPORTS[kind]
+    qs = spec["queryset"](municipality, params, tz)
+    if isinstance(qs, list):
+        return qs
+    return qs.order_by(*spec["ordering"]).values(*(key for key, _label in spec["columns"]))
@@ -0,0 +1,236 @@
+from collections import Counter
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, ExpressionWrapper, F, IntegerField, Sum
+from django.db.models.functions import ExtractMonth, ExtractYear
+
+from fleet.models import FuelLog, Vehicle
+from reports.cache import bump_data_version
+from reports.models import FuelEfficiencyRollup, TripMonthRollup, VehicleStatusRollup
+from tenants.models import Municipality
+from trips.models import Trip
+
+
+def bump(model, delta, **key):
+    """
+    `total = total + delta` for the rollup row `key`, created on first use.
+
+    Same upsert as the monthly odometer: UPDATE first; a concurrent first INSERT of the same key
+    loses on the unique constraint and retries the UPDATE.
+    """
+    if not delta:
+        return
+    rows = model.objects.filter(**key)
+    if rows.update(total=F("total") + delta):
+        return
+    try:
+        with transaction.atomic():
+            model.objects.create(total=delta, **key)
+    except IntegrityError:
+        rows.update(total=F("total") + delta)
+
+
+def municipality_timezones(municipality_ids, trips=()):
+    """tzinfo per municipality id, reusing municipalities already cached on the trips."""
+    zones = {trip.municipality_id: trip.municipality.tzinfo for trip in trips if Trip.municipality.is_cached(trip)}
+    missing = set(municipality_ids) - zones.keys()
+    if missing:
+        zones.update({pk: m.tzinfo for pk, m in Municipality.objects.in_bulk(missing).items()})
+    return zones
+
+
+def trip_key(municipality_id, departure, status, zones):
+    local = departure.astimezone(zones[municipality_id])
+    return municipality_id, local.year, local.month, status
+
+
+def _bump_trips(keys):
+    for (municipality_id, year, month, status), delta in keys.items():
+        bump(TripMonthRollup, delta, municipality_id=municipality_id, year=year, month=month, status=status)
+
+
+def count_trips(trips, sign):
+    """Add (sign=1) or remove (sign=-1) trips from the monthly rollup, one upsert per distinct key."""
+    zones = municipality_timezones({trip.municipality_id for trip in trips}, trips)
+    keys = Counter(trip_key(trip.municipality_id, trip.departure_datetime, trip.status, zones) for trip in trips)
+    _bump_trips({key: sign * total for key, total in keys.items()})
+
+
+def move_trip(trip, previous_municipality_id, previous_departure, previous_status):
+    zones = municipality_timezones({trip.municipality_id, previous_municipality_id}, [trip])
+    old = trip_key(previous_municipality_id, previous_departure, previous_status, zones)
+    new = trip_key(trip.municipality_id, trip.departure_datetime, trip.status, zones)
+    if old != new:
+        _bump_trips({old: -1, new: 1})
+
+
+def count_vehicle(municipality_id, status, delta):
+    bump(VehicleStatusRollup, delta, municipality_id=municipality_id, status=status)
+
+
+def add_efficiency(municipality_id, vehicle_id, driver_id, year, month, kilometers=0, liters=0):
+    """Add kilometers/liters to a (vehicle, driver, month) efficiency row; same upsert as bump()."""
+    rows = FuelEfficiencyRollup.objects.filter(vehicle_id=vehicle_id, driver_id=driver_id, year=year, month=month)
+    changes = {"kilometers": F("kilometers") + kilometers, "liters": F("liters") + liters}
+    if rows.update(**changes):
+        return
+    try:
+        with transaction.atomic():
+            FuelEfficiencyRollup.objects.create(
+                municipality_id=municipality_id,
+                vehicle_id=vehicle_id,
+                driver_id=driver_id,
+                year=year,
+                month=month,
+                kilometers=kilometers,
+                liters=liters,
+            )
+    except IntegrityError:
+        rows.update(**changes)
+
+
+# Trip/FuelLog fields a row's efficiency contribution depends on (snapshotted by reports.signals).
+TRIP_EFFICIENCY_FIELDS = (
+    "municipality_id", "vehicle_id", "driver_id", "departure_datetime", "status", "odometer_start", "odometer_end"
+)
+FUEL_EFFICIENCY_FIELDS = ("municipality_id", "vehicle_id", "driver_id", "filled_at", "liters")
+
+
+def _trip_kilometers(state, zones):
+    """(rollup key, km) a trip snapshot contributes, or None; same rule as trips.odometer.trip_distance."""
+    municipality_id, vehicle_id, driver_id, departure, status, start, end = state
+    if status != Trip.Status.COMPLETED or end is None or end < start:
+        return None
+    local = departure.astimezone(zones[municipality_id])
+    return (municipality_id, vehicle_id, driver_id, local.year, local.month), end - start
+
+
+def move_trip_kilometers(previous, current):
+    """Move a trip's kilometers from its previous snapshot's row to its current one."""
+    completed = [state for state in (previous, current) if state and state[4] == Trip.Status.COMPLETED]
+    if not completed:
+        return
+    zones = municipality_timezones({state[0] for state in completed})
+    old = _trip_kilometers(previous, zones) if previous else None
+    new = _trip_kilometers(current, zones) if current else None
+    if old == new:
+        return
+    if old:
+        add_efficiency(*old[0], kilometers=-old[1])
+    if new:
+        add_efficiency(*new[0], kilometers=new[1])
+
+
+def _fuel_liters(state):
+    municipality_id, vehicle_id, driver_id, filled_at, liters = state
+    # Values assigned by hand (e.g. objects.create(filled_at="2024-01-05")) are not parsed yet.
+    filled_at = FuelLog._meta.get_field("filled_at").to_python(filled_at)
+    liters = FuelLog._meta.get_field("liters").to_python(liters)
+    return (municipality_id, vehicle_id, driver_id, filled_at.year, filled_at.month), liters
+
+
+def move_fuel_liters(previous, current):
+    old = _fuel_liters(previous) if previous else None
+    new = _fuel_liters(current) if current else None
+    if old == new:
+        return
+    if old:
+        add_efficiency(*old[0], liters=-old[1])
+    if new:
+        add_efficiency(*new[0], liters=new[1])
+
+
+def expected_efficiency(municipality):
+    """{(vehicle_id, driver_id, year, month): (kilometers, liters)} recomputed from trips and fuel logs."""
+    tz = municipality.tzinfo
+    trips = (
+        Trip.objects.filter(
+            municipality=municipality,
+            status=Trip.Status.COMPLETED,
+            odometer_end__isnull=False,
+            odometer_end__gte=F("odometer_start"),
+        )
+        .annotate(local_year=ExtractYear("departure_datetime", tzinfo=tz), local_month=ExtractMonth("departure_datetime", tzinfo=tz))
+        .values("vehicle_id", "driver_id", "local_year", "local_month")
+        .annotate(km=Sum(ExpressionWrapper(F("odometer_end") - F("odometer_start"), output_field=IntegerField())))
+        .order_by()
+    )
+    logs = (
+        FuelLog.objects.filter(municipality=municipality)
+        .annotate(local_year=ExtractYear("filled_at"), local_month=ExtractMonth("filled_at"))
+        .values("vehicle_id", "driver_id", "local_year", "local_month")
+        .annotate(total=Sum("liters"))
+        .order_by()
+    )
+    totals = {}
+    for row in trips:
+        totals[(row["vehicle_id"], row["driver_id"], row["local_year"], row["local_month"])] = (row["km"], 0)
+    for row in logs:
+        key = (row["vehicle_id"], row["driver_id"], row["local_year"], row["local_month"])
+        totals[key] = (totals.get(key, (0, 0))[0], row["total"])
+    return {key: value for key, value in totals.items() if any(value)}
+
+
+def expected_rollups(municipality):
+    """
+    Rollup rows recomputed from the raw tables: ({status: total}, {(year, month, status): total},
+    {(vehicle_id, driver_id, year, month): (kilometers, liters)}).
+    """
+    vehicles = Vehicle.objects.filter(municipality=municipality).values("status").annotate(total=Count("id"))
+    tz = municipality.tzinfo
+    trips = (
+        Trip.objects.filter(municipality=municipality)
+        .annotate(local_year=ExtractYear("departure_datetime", tzinfo=tz), local_month=ExtractMonth("departure_datetime", tzinfo=tz))
+        .values("local_year", "local_month", "status")
+        .annotate(total=Count("id"))
+        .order_by()
+    )
+    return (
+        {row["status"]: row["total"] for row in vehicles.order_by()},
+        {(row["local_year"], row["local_month"], row["status"]): row["total"] for row in trips},
+        expected_efficiency(municipality),
+    )
+
+
+def stored_rollups(municipality):
+    vehicles = VehicleStatusRollup.objects.filter(municipality=municipality).exclude(total=0)
+    trips = TripMonthRollup.objects.filter(municipality=municipality).exclude(total=0)
+    efficiency = FuelEfficiencyRollup.objects.filter(municipality=municipality).exclude(kilometers=0, liters=0)
+    return (
+        dict(vehicles.values_list("status", "total")),
+        {(year, month, status): total for year, month, status, total in trips.values_list("year", "month", "status", "total")},
+        {
+            (vehicle_id, driver_id, year, month): (km, liters)
+            for vehicle_id, driver_id, year, month, km, liters in efficiency.values_list(
+                "vehicle_id", "driver_id", "year", "month", "kilometers", "liters"
+            )
+        },
+    )
+
+
+@transaction.atomic
+def rebuild_rollups(municipality: Municipality):
+    bump_data_version(municipality.pk)
+    vehicles, trips, efficiency = expected_rollups(municipality)
+    VehicleStatusRollup.objects.filter(municipality=municipality).delete()
+    TripMonthRollup.objects.filter(municipality=municipality).delete()
+    FuelEfficiencyRollup.objects.filter(municipality=municipality).delete()
+    VehicleStatusRollup.objects.bulk_create(
+        VehicleStatusRollup(municipality=municipality, status=status, total=total) for status, total in vehicles.items()
+    )
+    TripMonthRollup.objects.bulk_create(
+        TripMonthRollup(municipality=municipality, year=year, month=month, status=status, total=total)
+        for (year, month, status), total in trips.items()
+    )
+    FuelEfficiencyRollup.objects.bulk_create(
+        FuelEfficiencyRollup(
+            municipality=municipality,
+            vehicle_id=vehicle_id,
+            driver_id=driver_id,
+            year=year,
+            month=month,
+            kilometers=km,
+            liters=liters,
+        )
+        for (vehicle_id, driver_id, year, month), (km, liters) in efficiency.items()
+    )
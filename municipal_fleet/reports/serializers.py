@@ -0,0 +1,46 @@
+from rest_framework import serializers
+
+from municipal_fleet.filters import parse_date_range
+from reports.jobs import JOB_PARAMS
+from reports.models import ReportJob
+
+
+class ReportJobSerializer(serializers.ModelSerializer):
+    download_url = serializers.SerializerMethodField()
+
+    class Meta:
+        model = ReportJob
+        fields = [
+            "id",
+            "kind",
+            "file_format",
+            "params",
+            "status",
+            "error",
+            "download_url",
+            "created_at",
+            "started_at",
+            "finished_at",
+        ]
+        read_only_fields = ["id", "status", "error", "download_url", "created_at", "started_at", "finished_at"]
+
+    def get_download_url(self, obj):
+        if obj.status != ReportJob.Status.DONE:
+            return None
+        request = self.context.get("request")
+        url = f"/api/reports/jobs/{obj.pk}/download/"
+        return request.build_absolute_uri(url) if request else url
+
+    def validate_params(self, value):
+        """Same filters as the report endpoints, normalized so equal requests get equal fingerprints."""
+        if not isinstance(value, dict):
+            raise serializers.ValidationError("Envie os filtros como objeto.")
+        unknown = sorted(set(value) - set(JOB_PARAMS))
+        if unknown:
+            raise serializers.ValidationError(f"Filtros desconhecidos: {', '.join(unknown)}.")
+        params = {name: str(raw).strip() for name, raw in value.items() if raw not in (None, "")}
+        parse_date_range(params)
+        for name in ("vehicle_id", "driver_id"):
+            if name in params and not params[name].isdigit():
+                raise serializers.ValidationError({name: "Informe um id numérico."})
+        return params
@@ -0,0 +1,137 @@
+from datetime import timedelta
+
+from django.db.models import Count, DateTimeField, ExpressionWrapper, F, IntegerField, Sum
+from django.db.models.functions import Trunc
+from django.utils import timezone
+from rest_framework import serializers
+
+from fleet.models import FuelLog
+from municipal_fleet.filters import day_bounds, parse_date_range
+from reports.models import FuelEfficiencyRollup, TripMonthRollup
+from trips.models import Trip
+
+METRICS = ("trips", "km", "liters")
+BUCKETS = ("day", "week", "month")
+# Upper bound on points per response; longer ranges must use a coarser bucket.
+SERIES_MAX_POINTS = 400
+# Range used when `start_date` is omitted, in buckets ending at `end_date` (default today).
+DEFAULT_POINTS = {"day": 30, "week": 12, "month": 12}
+
+
+def bucket_start(day, bucket):
+    if bucket == "week":
+        return day - timedelta(days=day.weekday())
+    if bucket == "month":
+        return day.replace(day=1)
+    return day
+
+
+def next_bucket(day, bucket):
+    if bucket == "week":
+        return day + timedelta(days=7)
+    if bucket == "month":
+        return (day.replace(day=28) + timedelta(days=4)).replace(day=1)
+    return day + timedelta(days=1)
+
+
+def series_range(params, bucket, tz):
+    """First and last bucket start for the request; the range is widened to whole buckets."""
+    start, end = parse_date_range(params)
+    end = bucket_start(end or timezone.localdate(timezone=tz), bucket)
+    if start:
+        return bucket_start(start, bucket), end
+    first = end
+    for _ in range(DEFAULT_POINTS[bucket] - 1):
+        first = bucket_start(first - timedelta(days=1), bucket)
+    return first, end
+
+
+def _raw_totals(metric, bucket, municipality, params, tz, first, last):
+    """{bucket start date: value} bucketed by the database in local time."""
+    upper = next_bucket(last, bucket) - timedelta(days=1)
+    if metric == "liters":
+        qs = FuelLog.objects.filter(filled_at__gte=first, filled_at__lte=upper)
+        value = Sum("liters")
+        period = Trunc("filled_at", bucket)
+    else:
+        lower_dt, upper_dt = day_bounds(first, upper, tz)
+        qs = Trip.objects.filter(departure_datetime__gte=lower_dt, departure_datetime__lt=upper_dt)
+        period = Trunc("departure_datetime", bucket, output_field=DateTimeField(), tzinfo=tz)
+        if metric == "trips":
+            qs = qs.exclude(status=Trip.Status.CANCELLED)
+            value = Count("id")
+        else:
+            qs = qs.filter(status=Trip.Status.COMPLETED, odometer_end__isnull=False, odometer_end__gte=F("odometer_start"))
+            value = Sum(ExpressionWrapper(F("odometer_end") - F("odometer_start"), output_field=IntegerField()))
+    if municipality is not None:
+        qs = qs.filter(municipality=municipality)
+    for name in ("vehicle_id", "driver_id"):
+        if params.get(name):
+            qs = qs.filter(**{name: params[name]})
+    rows = qs.annotate(period=period).values("period").annotate(value=value).order_by()
+    totals = {}
+    for row in rows:
+        day = row["period"]
+        if hasattr(day, "tzinfo"):
+            day = timezone.localtime(day, tz).date()
+        totals[day] = row["value"]
+    return totals
+
+
+def _rollup_totals(metric, municipality, params, first, last):
+    """Monthly totals read from the rollup tables instead of the raw rows."""
+    if metric == "trips":
+        qs = TripMonthRollup.objects.exclude(status=Trip.Status.CANCELLED)
+        value = Sum("total")
+    else:
+        qs = FuelEfficiencyRollup.objects.all()
+        value = Sum("kilometers" if metric == "km" else "liters")
+        for name in ("vehicle_id", "driver_id"):
+            if params.get(name):
+                qs = qs.filter(**{name: params[name]})
+    if municipality is not None:
+        qs = qs.filter(municipality=municipality)
+    rows = (
+        qs.annotate(period=F("year") * 100 + F("month"))
+        .filter(period__gte=first.year * 100 + first.month, period__lte=last.year * 100 + last.month)
+        .values("year", "month")
+        .annotate(value=value)
+        .order_by()
+    )
+    return {first.replace(year=row["year"], month=row["month"]): row["value"] for row in rows}
+
+
+def build_series(municipality, params, tz):
+    """
+    `{metric, bucket, points: [{period, value}]}` with one point per bucket, empty buckets as 0.
+
+    Monthly buckets come from the rollup tables (TripMonthRollup, FuelEfficiencyRollup) unless a
+    filter they cannot answer is present (trips per vehicle/driver); finer buckets are grouped by
+    the database with Trunc in the municipality timezone. Trips exclude cancelled ones; km counts
+    completed trips.
+    """
+    metric = params.get("metric", "trips")
+    bucket = params.get("bucket", "day")
+    if metric not in METRICS:
+        raise serializers.ValidationError({"metric": f"Use {', '.join(METRICS)}."})
+    if bucket not in BUCKETS:
+        raise serializers.ValidationError({"bucket": f"Use {', '.join(BUCKETS)}."})
+    first, last = series_range(params, bucket, tz)
+    periods = [first]
+    while periods[-1] < last:
+        periods.append(next_bucket(periods[-1], bucket))
+        if len(periods) > SERIES_MAX_POINTS:
+            raise serializers.ValidationError(
+                {"bucket": f"Intervalo longo demais para {bucket}: máximo de {SERIES_MAX_POINTS} pontos."}
+            )
+
+    filtered_trips = metric == "trips" and any(params.get(name) for name in ("vehicle_id", "driver_id"))
+    if bucket == "month" and not filtered_trips:
+        totals = _rollup_totals(metric, municipality, params, first, last)
+    else:
+        totals = _raw_totals(metric, bucket, municipality, params, tz, first, last)
+    return {
+        "metric": metric,
+        "bucket": bucket,
+        "points": [{"period": period, "value": totals.get(period) or 0} for period in periods],
+    }
@@ -0,0 +1,169 @@
+from django.db.models.signals import post_delete, post_init, post_save
+from django.dispatch import receiver
+
+from drivers.models import Driver
+from fleet.models import FuelLog, Vehicle
+from reports.cache import bump_data_version
+from reports.occupancy import TRIP_OCCUPANCY_FIELDS, queue_refresh
+from reports.rollups import (
+    FUEL_EFFICIENCY_FIELDS,
+    TRIP_EFFICIENCY_FIELDS,
+    count_trips,
+    count_vehicle,
+    move_fuel_liters,
+    move_trip,
+    move_trip_kilometers,
+)
+from trips.models import Trip
+from trips.signals import trips_bulk_created
+
+# Dashboard and fuel efficiency rollups and the vehicle occupancy queue follow every Trip/Vehicle/FuelLog write. The values a row was loaded with are kept on
+# the instance (post_init) so post_save can move its count from the old key to the new one.
+
+
+def _loaded(instance, *fields):
+    # Deferred fields are absent from __dict__; a partial snapshot is treated as unknown.
+    values = tuple(instance.__dict__.get(field) for field in fields)
+    return None if None in values else values
+
+
+def _snapshot(instance, fields):
+    # Like _loaded, but None is a real value here (odometer_end of an unfinished trip).
+    if any(field not in instance.__dict__ for field in fields):
+        return None
+    return tuple(instance.__dict__[field] for field in fields)
+
+
+@receiver(post_init, sender=Trip)
+def remember_trip_state(sender, instance, **kwargs):
+    instance._rollup_state = _loaded(instance, "municipality_id", "departure_datetime", "status")
+
+
+@receiver(post_save, sender=Trip)
+def update_trip_rollup(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    if created:
+        count_trips([instance], 1)
+    elif instance._rollup_state:
+        move_trip(instance, *instance._rollup_state)
+    instance._rollup_state = _loaded(instance, "municipality_id", "departure_datetime", "status")
+
+
+@receiver(post_delete, sender=Trip)
+def remove_trip_from_rollup(sender, instance, **kwargs):
+    if instance._rollup_state:
+        count_trips([instance], -1)
+
+
+@receiver(trips_bulk_created)
+def add_bulk_created_trips(sender, trips, **kwargs):
+    count_trips(trips, 1)
+    queue_refresh([_snapshot(trip, TRIP_OCCUPANCY_FIELDS) for trip in trips], trips)
+
+
+@receiver(post_init, sender=Trip)
+def remember_trip_distance(sender, instance, **kwargs):
+    instance._efficiency_state = _snapshot(instance, TRIP_EFFICIENCY_FIELDS)
+
+
+@receiver(post_save, sender=Trip)
+def update_trip_efficiency(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    current = _snapshot(instance, TRIP_EFFICIENCY_FIELDS)
+    if created or instance._efficiency_state:
+        move_trip_kilometers(None if created else instance._efficiency_state, current)
+    instance._efficiency_state = current
+
+
+@receiver(post_delete, sender=Trip)
+def remove_trip_efficiency(sender, instance, **kwargs):
+    if instance._efficiency_state:
+        move_trip_kilometers(instance._efficiency_state, None)
+
+
+@receiver(post_init, sender=Trip)
+def remember_trip_interval(sender, instance, **kwargs):
+    instance._occupancy_state = _snapshot(instance, TRIP_OCCUPANCY_FIELDS)
+
+
+@receiver(post_save, sender=Trip)
+def queue_trip_occupancy(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    current = _snapshot(instance, TRIP_OCCUPANCY_FIELDS)
+    previous = None if created else instance._occupancy_state
+    if previous != current:
+        # A partial snapshot (deferred fields) cannot tell which days it covered: requeue the new ones.
+        queue_refresh([previous, current], [instance])
+    instance._occupancy_state = current
+
+
+@receiver(post_delete, sender=Trip)
+def queue_deleted_trip_occupancy(sender, instance, **kwargs):
+    queue_refresh([instance._occupancy_state], [instance])
+
+
+@receiver(post_init, sender=FuelLog)
+def remember_fuel_state(sender, instance, **kwargs):
+    instance._efficiency_state = _snapshot(instance, FUEL_EFFICIENCY_FIELDS)
+
+
+@receiver(post_save, sender=FuelLog)
+def update_fuel_efficiency(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    current = _snapshot(instance, FUEL_EFFICIENCY_FIELDS)
+    if created or instance._efficiency_state:
+        move_fuel_liters(None if created else instance._efficiency_state, current)
+    instance._efficiency_state = current
+
+
+@receiver(post_delete, sender=FuelLog)
+def remove_fuel_efficiency(sender, instance, **kwargs):
+    if instance._efficiency_state:
+        move_fuel_liters(instance._efficiency_state, None)
+
+
+@receiver(post_init, sender=Vehicle)
+def remember_vehicle_state(sender, instance, **kwargs):
+    instance._rollup_state = _loaded(instance, "municipality_id", "status")
+
+
+@receiver(post_save, sender=Vehicle)
+def update_vehicle_rollup(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    current = (instance.municipality_id, instance.status)
+    previous = None if created else instance._rollup_state
+    if previous != current:
+        if previous:
+            count_vehicle(*previous, -1)
+        count_vehicle(*current, 1)
+    instance._rollup_state = current
+
+
+@receiver(post_delete, sender=Vehicle)
+def remove_vehicle_from_rollup(sender, instance, **kwargs):
+    if instance._rollup_state:
+        count_vehicle(*instance._rollup_state, -1)
+
+
+@receiver(post_save, sender=Trip)
+@receiver(post_delete, sender=Trip)
+@receiver(post_save, sender=Vehicle)
+@receiver(post_delete, sender=Vehicle)
+@receiver(post_save, sender=FuelLog)
+@receiver(post_delete, sender=FuelLog)
+@receiver(post_save, sender=Driver)
+@receiver(post_delete, sender=Driver)
+def invalidate_cached_reports(sender, instance, raw=False, **kwargs):
+    if not raw:
+        bump_data_version(instance.municipality_id)
+
+
+@receiver(trips_bulk_created)
+def invalidate_cached_reports_after_bulk(sender, trips, **kwargs):
+    for municipality_id in {trip.municipality_id for trip in trips}:
+        bump_data_version(municipality_id)
@@ -1,9 +1,27 @@
 from django.urls import path
-from reports.views import DashboardView, OdometerReportView, TripReportView, FuelReportView
+from rest_framework.routers import DefaultRouter
+
+from reports.views import (
+    DashboardView,
+    FuelEfficiencyReportView,
+    FuelReportView,
+    OdometerReportView,
+    ReportJobViewSet,
+    SeriesReportView,
+    TripReportView,
+    UtilizationReportView,
+)
+
+router = DefaultRouter()
+router.register(r"jobs", ReportJobViewSet, basename="report-job")
 
 urlpatterns = [
     path("dashboard/", DashboardView.as_view(), name="dashboard-report"),
     path("odometer/", OdometerReportView.as_view(), name="odometer-report"),
     path("trips/", TripReportView.as_view(), name="trip-report"),
     path("fuel/", FuelReportView.as_view(), name="fuel-report"),
+    path("fuel_efficiency/", FuelEfficiencyReportView.as_view(), name="fuel-efficiency-report"),
+    path("series/", SeriesReportView.as_view(), name="series-report"),
+    path("utilization/", UtilizationReportView.as_view(), name="utilization-report"),
+    *router.urls,
 ]
@@ -1,154 +1,242 @@
-from datetime import date
-from django.db.models import Count, Sum, F, ExpressionWrapper, IntegerField
+from zoneinfo import ZoneInfo
+
+from django.db.models import Count, Q, Sum
+from django.http import FileResponse
 from django.utils import timezone
-from rest_framework import permissions, response, views
-from fleet.models import Vehicle, FuelLog
-from trips.models import Trip, MonthlyOdometer
+from rest_framework import decorators, mixins, permissions, response, status, views, viewsets
+
+from fleet.models import MaintenanceForecast
+from fleet.storage import with_receipt_links
+from municipal_fleet.filters import request_timezone
+from municipal_fleet.pagination import KeysetOrPageNumberPagination
+from reports.cache import cached_report
+from reports.exports import ExportableReportMixin, export_response, wants_export
+from reports.jobs import submit_job
+from reports.models import ReportJob, TripMonthRollup, VehicleStatusRollup
+from reports.occupancy import utilization_report
+from reports.queries import (
+    EFFICIENCY_GROUPS,
+    EXPORTS,
+    fuel_efficiency_rows,
+    fuel_queryset,
+    odometer_rows,
+    trip_queryset,
+)
+from reports.serializers import ReportJobSerializer
+from reports.series import build_series
+from tenants.mixins import MunicipalityQuerysetMixin
+from tenants.models import Municipality
+from trips.models import MonthlyOdometer
 
 
 class DashboardView(views.APIView):
     permission_classes = [permissions.IsAuthenticated]
 
+    @cached_report("dashboard")
     def get(self, request):
+        """Counts come from the rollup tables kept up to date by reports.signals, not from raw rows."""
         user = request.user
-        qs_vehicle = Vehicle.objects.all()
-        qs_trip = Trip.objects.all()
-        if user.role != "SUPERADMIN":
-            qs_vehicle = qs_vehicle.filter(municipality=user.municipality)
-            qs_trip = qs_trip.filter(municipality=user.municipality)
-
-        vehicle_status = qs_vehicle.values("status").annotate(total=Count("id"))
-        now = timezone.now()
-        trips_month = qs_trip.filter(departure_datetime__month=now.month, departure_datetime__year=now.year)
-        trips_by_status = trips_month.values("status").annotate(total=Count("id"))
+        scope = {} if user.role == "SUPERADMIN" else {"municipality": user.municipality}
+        tz = request_timezone(request)
+        now = timezone.localtime(timezone=tz)
+
+        vehicle_status = list(
+            VehicleStatusRollup.objects.filter(total__gt=0, **scope)
+            .values("status")
+            .annotate(total=Sum("total"))
+            .order_by("status")
+        )
+        trips_by_status = list(
+            TripMonthRollup.objects.filter(year=now.year, month=now.month, total__gt=0, **scope)
+            .values("status")
+            .annotate(total=Sum("total"))
+            .order_by("status")
+        )
 
-        maintenance_alerts = qs_vehicle.filter(
-            next_service_date__lte=date.today()
-        ).values("id", "license_plate", "next_service_date")
+        # Projected nightly by `forecast_maintenance`; the earliest due kind per vehicle, due by each
+        # municipality's own local date.
+        maintenance_alerts = {}
+        if user.role == "SUPERADMIN":
+            zones = Municipality.objects.values_list("timezone", flat=True).distinct()
+            overdue = Q(pk__in=[])
+            for name in zones:
+                overdue |= Q(municipality__timezone=name, due_date__lte=timezone.localdate(timezone=ZoneInfo(name)))
+        else:
+            overdue = Q(due_date__lte=timezone.localdate(timezone=user.municipality.tzinfo))
+        due = MaintenanceForecast.objects.filter(overdue, **scope).order_by("due_date", "kind")
+        for vehicle_id, plate, due_date, kind in due.values_list("vehicle_id", "vehicle__license_plate", "due_date", "kind"):
+            maintenance_alerts.setdefault(
+                vehicle_id, {"id": vehicle_id, "license_plate": plate, "next_service_date": due_date, "kind": kind}
+            )
 
         odometer_month = MonthlyOdometer.objects.filter(year=now.year, month=now.month)
         if user.role != "SUPERADMIN":
             odometer_month = odometer_month.filter(vehicle__municipality=user.municipality)
 
         data = {
-            "total_vehicles": qs_vehicle.count(),
-            "vehicles_by_status": list(vehicle_status),
-            "trips_month_total": trips_month.count(),
-            "trips_by_status": list(trips_by_status),
+            "total_vehicles": sum(row["total"] for row in vehicle_status),
+            "vehicles_by_status": vehicle_status,
+            "trips_month_total": sum(row["total"] for row in trips_by_status),
+            "trips_by_status": trips_by_status,
             "odometer_month": list(
                 odometer_month.values("vehicle_id", "vehicle__license_plate", "kilometers")
             ),
-            "maintenance_alerts": list(maintenance_alerts),
+            "maintenance_alerts": sorted(maintenance_alerts.values(), key=lambda alert: alert["license_plate"]),
         }
         return response.Response(data)
 
 
-class OdometerReportView(views.APIView):
+class OdometerReportView(ExportableReportMixin, views.APIView):
     permission_classes = [permissions.IsAuthenticated]
 
+    @cached_report("odometer")
     def get(self, request):
-        user = request.user
-        start_date = request.query_params.get("start_date")
-        end_date = request.query_params.get("end_date")
-        vehicle_id = request.query_params.get("vehicle_id")
-
-        trips_qs = Trip.objects.all()
-        if user.role != "SUPERADMIN":
-            trips_qs = trips_qs.filter(municipality=user.municipality)
-        if start_date:
-            trips_qs = trips_qs.filter(departure_datetime__date__gte=start_date)
-        if end_date:
-            trips_qs = trips_qs.filter(departure_datetime__date__lte=end_date)
-        if vehicle_id:
-            trips_qs = trips_qs.filter(vehicle_id=vehicle_id)
-        trips_qs = trips_qs.filter(status=Trip.Status.COMPLETED, odometer_end__isnull=False)
-        distance_expr = ExpressionWrapper(F("odometer_end") - F("odometer_start"), output_field=IntegerField())
-        aggregates = (
-            trips_qs.values("vehicle_id", "vehicle__license_plate")
-            .annotate(kilometers=Sum(distance_expr))
-            .order_by("vehicle__license_plate")
-        )
-        return response.Response(list(aggregates))
+        if wants_export(request):
+            return export_response(request, "odometer")
+        municipality = None if request.user.role == "SUPERADMIN" else request.user.municipality
+        return response.Response(odometer_rows(municipality, request.query_params, request_timezone(request)))
 
 
-class TripReportView(views.APIView):
+class TripReportView(ExportableReportMixin, views.APIView):
     permission_classes = [permissions.IsAuthenticated]
 
+    @cached_report("trips")
     def get(self, request):
-        user = request.user
-        qs = Trip.objects.select_related("vehicle", "driver")
-        if user.role != "SUPERADMIN":
-            qs = qs.filter(municipality=user.municipality)
-        start_date = request.query_params.get("start_date")
-        end_date = request.query_params.get("end_date")
-        driver_id = request.query_params.get("driver_id")
-        vehicle_id = request.query_params.get("vehicle_id")
-        if start_date:
-            qs = qs.filter(departure_datetime__date__gte=start_date)
-        if end_date:
-            qs = qs.filter(departure_datetime__date__lte=end_date)
-        if driver_id:
-            qs = qs.filter(driver_id=driver_id)
-        if vehicle_id:
-            qs = qs.filter(vehicle_id=vehicle_id)
+        if wants_export(request):
+            return export_response(request, "trips")
+        municipality = None if request.user.role == "SUPERADMIN" else request.user.municipality
+        qs = trip_queryset(municipality, request.query_params, request_timezone(request))
 
         summary = {
             "total": qs.count(),
             "by_status": list(qs.values("status").annotate(total=Count("id"))),
             "total_passengers": qs.aggregate(total=Sum("passengers_count"))["total"] or 0,
         }
-        trips_data = list(
-            qs.values(
-                "id",
-                "origin",
-                "destination",
-                "status",
-                "departure_datetime",
-                "return_datetime_expected",
-                "passengers_count",
-                "category",
-                "vehicle__license_plate",
-                "driver__name",
-            )
+        trips_data = qs.values(
+            "id",
+            "origin",
+            "destination",
+            "status",
+            "departure_datetime",
+            "return_datetime_expected",
+            "passengers_count",
+            "category",
+            "vehicle__license_plate",
+            "driver__name",
         )
-        return response.Response({"summary": summary, "trips": trips_data})
+        if KeysetOrPageNumberPagination.cursor_query_param in request.query_params:
+            paginator = KeysetOrPageNumberPagination()
+            page = paginator.paginate_keyset(trips_data, request, ("-departure_datetime", "-id"))
+            return response.Response({"summary": summary, "trips": page, **paginator.get_keyset_links()})
+        return response.Response({"summary": summary, "trips": list(trips_data.order_by("-departure_datetime", "-id"))})
 
 
-class FuelReportView(views.APIView):
+class FuelReportView(ExportableReportMixin, views.APIView):
     permission_classes = [permissions.IsAuthenticated]
 
+    @cached_report("fuel")
     def get(self, request):
-        user = request.user
-        qs = FuelLog.objects.select_related("vehicle", "driver")
-        if user.role != "SUPERADMIN":
-            qs = qs.filter(municipality=user.municipality)
-        driver_id = request.query_params.get("driver_id")
-        vehicle_id = request.query_params.get("vehicle_id")
-        start_date = request.query_params.get("start_date")
-        end_date = request.query_params.get("end_date")
-        if driver_id:
-            qs = qs.filter(driver_id=driver_id)
-        if vehicle_id:
-            qs = qs.filter(vehicle_id=vehicle_id)
-        if start_date:
-            qs = qs.filter(filled_at__gte=start_date)
-        if end_date:
-            qs = qs.filter(filled_at__lte=end_date)
+        if wants_export(request):
+            return export_response(request, "fuel")
+        municipality = None if request.user.role == "SUPERADMIN" else request.user.municipality
+        qs = fuel_queryset(municipality, request.query_params, request_timezone(request))
 
         summary = {
             "total_logs": qs.count(),
             "total_liters": qs.aggregate(total=Sum("liters"))["total"] or 0,
         }
-        logs = list(
-            qs.values(
-                "id",
-                "filled_at",
-                "liters",
-                "fuel_station",
-                "notes",
-                "receipt_image",
-                "vehicle__license_plate",
-                "driver__name",
-            ).order_by("-filled_at", "-id")
+        logs = qs.values(
+            "id",
+            "filled_at",
+            "created_at",
+            "liters",
+            "fuel_station",
+            "notes",
+            "receipt_image",
+            "vehicle__license_plate",
+            "driver__name",
+        )
+        if KeysetOrPageNumberPagination.cursor_query_param in request.query_params:
+            paginator = KeysetOrPageNumberPagination()
+            page = paginator.paginate_keyset(logs, request, ("-filled_at", "-created_at", "-id"))
+            return response.Response(
+                {"summary": summary, "logs": with_receipt_links(request, page), **paginator.get_keyset_links()}
+            )
+        rows = list(logs.order_by("-filled_at", "-created_at", "-id"))
+        return response.Response({"summary": summary, "logs": with_receipt_links(request, rows)})
+
+
+class FuelEfficiencyReportView(views.APIView):
+    permission_classes = [permissions.IsAuthenticated]
+
+    @cached_report("fuel_efficiency")
+    def get(self, request):
+        group = request.query_params.get("group", "vehicle")
+        if group not in EFFICIENCY_GROUPS:
+            return response.Response({"group": "Use vehicle ou driver."}, status=status.HTTP_400_BAD_REQUEST)
+        municipality = None if request.user.role == "SUPERADMIN" else request.user.municipality
+        return response.Response(
+            fuel_efficiency_rows(municipality, request.query_params, request_timezone(request), group)
+        )
+
+
+class SeriesReportView(views.APIView):
+    """Chart series: `?metric=trips|km|liters&bucket=day|week|month` plus the usual filters."""
+
+    permission_classes = [permissions.IsAuthenticated]
+
+    @cached_report("series")
+    def get(self, request):
+        municipality = None if request.user.role == "SUPERADMIN" else request.user.municipality
+        return response.Response(build_series(municipality, request.query_params, request_timezone(request)))
+
+
+class UtilizationReportView(views.APIView):
+    """Used vs available vehicle hours: `?bucket=week|month` plus dates and `vehicle_id`."""
+
+    permission_classes = [permissions.IsAuthenticated]
+
+    @cached_report("utilization")
+    def get(self, request):
+        municipality = None if request.user.role == "SUPERADMIN" else request.user.municipality
+        return response.Response(utilization_report(municipality, request.query_params, request_timezone(request)))
+
+
+class ReportJobViewSet(
+    MunicipalityQuerysetMixin,
+    mixins.CreateModelMixin,
+    mixins.RetrieveModelMixin,
+    mixins.ListModelMixin,
+    viewsets.GenericViewSet,
+):
+    """
+    Report exports run by the `run_report_jobs` worker: POST queues (or reuses) a job, GET polls
+    its status and `download/` returns the stored file once it is DONE.
+    """
+
+    queryset = ReportJob.objects.all()
+    serializer_class = ReportJobSerializer
+    permission_classes = [permissions.IsAuthenticated]
+
+    def create(self, request, *args, **kwargs):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        data = serializer.validated_data
+        job, created = submit_job(
+            request.user, data["kind"], data.get("file_format", ReportJob.Format.CSV), data.get("params", {})
+        )
+        return response.Response(
+            self.get_serializer(job).data, status=status.HTTP_201_CREATED if created else status.HTTP_200_OK
+        )
+
+    @decorators.action(detail=True, methods=["get"])
+    def download(self, request, pk=None):
+        job = self.get_object()
+        if job.status != ReportJob.Status.DONE:
+            return response.Response({"detail": "Relatório ainda não está pronto."}, status=status.HTTP_409_CONFLICT)
+        stamp = timezone.localtime(job.finished_at).date().isoformat()
+        return FileResponse(
+            job.result.open("rb"),
+            as_attachment=True,
+            filename=f"{EXPORTS[job.kind]['filename']}-{stamp}.{job.file_format}",
         )
-        return response.Response({"summary": summary, "logs": logs})
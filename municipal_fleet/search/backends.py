@@ -0,0 +1,116 @@
+import re
+import unicodedata
+
+from django.db import connection
+from django.db.models import F, FloatField, Func, Value
+from django.db.models.expressions import RawSQL
+
+from search.models import SearchDocument
+from search.registry import SEARCH_FIELDS
+
+# pg_trgm and the FTS5 trigram tokenizer only index terms of at least three characters.
+MIN_TERM_LENGTH = 3
+INDEX_CHUNK_SIZE = 2000
+
+_COMPACT = re.compile(r"[\W_]+")
+
+
+def normalize(value) -> str:
+    """Lower-case and strip accents so "João" and "joao" index and match the same way."""
+    text = unicodedata.normalize("NFKD", str(value))
+    text = "".join(ch for ch in text if not unicodedata.combining(ch))
+    return " ".join(text.lower().split())
+
+
+def build_document(values) -> str:
+    parts = []
+    for value in values:
+        if value in (None, ""):
+            continue
+        text = normalize(value)
+        parts.append(text)
+        compact = _COMPACT.sub("", text)
+        # Plates and CPFs are typed with or without punctuation ("ABC-1234", "11111111111").
+        if compact != text:
+            parts.append(compact)
+    return " | ".join(parts)
+
+
+def index_objects(model, ids, documents=SearchDocument):
+    """
+    (Re)build the documents of `ids`; rows that no longer exist are dropped. `documents` is the
+    SearchDocument model to write to (the historical one inside a data migration).
+    """
+    label = model._meta.label
+    fields = SEARCH_FIELDS[label]
+    ids = list(ids)
+    for offset in range(0, len(ids), INDEX_CHUNK_SIZE):
+        chunk = ids[offset : offset + INDEX_CHUNK_SIZE]
+        rows = model.objects.filter(pk__in=chunk).order_by().values_list("pk", "municipality_id", *fields)
+        entries = [
+            documents(model=label, object_id=row[0], municipality_id=row[1], document=build_document(row[2:]))
+            for row in rows
+        ]
+        documents.objects.bulk_create(
+            entries,
+            update_conflicts=True,
+            unique_fields=["model", "object_id"],
+            update_fields=["municipality", "document", "updated_at"],
+        )
+        missing = set(chunk) - {entry.object_id for entry in entries}
+        if missing:
+            remove_objects(model, missing, documents)
+
+
+def remove_objects(model, ids, documents=SearchDocument):
+    documents.objects.filter(model=model._meta.label, object_id__in=list(ids)).delete()
+
+
+def search_matches(model, term, municipality_id=None):
+    """
+    SearchDocument rows of `model` matching every word of `term`, annotated with `rank` (lower is
+    a better match). Meant to be used as a subquery, so the caller's own filters and pagination
+    apply to every match, not to a capped list of ids.
+
+    Returns None when the index cannot answer (term shorter than three characters, or a database
+    other than PostgreSQL/SQLite) so callers fall back to a plain ICONTAINS scan.
+    """
+    words = [_COMPACT.sub("", word) for word in normalize(term).split()]
+    words = [word for word in words if word]
+    if not words or min(len(word) for word in words) < MIN_TERM_LENGTH:
+        return None
+    qs = SearchDocument.objects.filter(model=model._meta.label)
+    if municipality_id:
+        qs = qs.filter(municipality_id=municipality_id)
+    if connection.vendor == "postgresql":
+        return _match_postgresql(qs, words)
+    if connection.vendor == "sqlite":
+        return _match_sqlite(qs, words)
+    return None
+
+
+def _match_postgresql(qs, words):
+    from django.contrib.postgres.search import TrigramSimilarity
+
+    for word in words:
+        # LIKE '%word%' on a pg_trgm GIN-indexed column is an index scan, not a sequential one.
+        qs = qs.filter(document__contains=word)
+    return qs.annotate(rank=-TrigramSimilarity("document", " ".join(words)))
+
+
+class _FtsRank(Func):
+    """FTS5 rank of the document with rowid `rowid` for the MATCH expression `match`."""
+
+    template = "(SELECT rank FROM search_document_fts WHERE search_document_fts MATCH %(expressions)s)"
+    arg_joiner = " AND rowid = "
+    output_field = FloatField()
+
+    def __init__(self, match, rowid):
+        super().__init__(Value(match), rowid)
+
+
+def _match_sqlite(qs, words):
+    match = " ".join('"{}"'.format(word.replace('"', '""')) for word in words)
+    return qs.filter(
+        id__in=RawSQL("SELECT rowid FROM search_document_fts WHERE search_document_fts MATCH %s", [match])
+    ).annotate(rank=_FtsRank(match, F("id")))
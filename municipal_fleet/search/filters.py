@@ -0,0 +1,27 @@
+from django.db.models import OuterRef, Subquery
+from rest_framework import filters
+
+from search.backends import search_matches
+
+
+class IndexedSearchFilter(filters.SearchFilter):
+    """
+    `?search=` served from the search index, ranked best match first.
+
+    Falls back to DRF's multi-column ICONTAINS (the view's `search_fields`) when the index cannot
+    answer, e.g. for one- or two-letter terms.
+    """
+
+    def filter_queryset(self, request, queryset, view):
+        terms = self.get_search_terms(request)
+        if not terms:
+            return queryset
+        user = request.user
+        municipality_id = None if getattr(user, "role", None) == "SUPERADMIN" else user.municipality_id
+        matches = search_matches(queryset.model, " ".join(terms), municipality_id=municipality_id)
+        if matches is None:
+            return super().filter_queryset(request, queryset, view)
+        # Every match is filtered, counted and paginated with the view's other filters; the rank
+        # only orders them.
+        rank = Subquery(matches.filter(object_id=OuterRef("pk")).values("rank")[:1])
+        return queryset.filter(pk__in=matches.values("object_id")).order_by(rank.asc(), *queryset.query.order_by)
@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+
+from search.backends import INDEX_CHUNK_SIZE, index_objects
+from search.models import SearchDocument
+from search.registry import SEARCH_FIELDS, get_model
+
+
+class Command(BaseCommand):
+    help = "Reconstrói o índice de busca (viagens, motoristas, veículos e abastecimentos)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--model", choices=sorted(SEARCH_FIELDS), help="Reindexa apenas um modelo.")
+
+    def handle(self, *args, **options):
+        labels = [options["model"]] if options["model"] else sorted(SEARCH_FIELDS)
+        for label in labels:
+            model = get_model(label)
+            ids = list(model.objects.values_list("pk", flat=True).order_by("pk").iterator(chunk_size=INDEX_CHUNK_SIZE))
+            index_objects(model, ids)
+            stale = SearchDocument.objects.filter(model=label).exclude(object_id__in=model.objects.values("pk"))
+            removed, _ = stale.delete()
+            self.stdout.write(f"{label}: {len(ids)} documentos, {removed} removidos")
+        self.stdout.write(self.style.SUCCESS("Índice de busca atualizado."))
@@ -0,0 +1,81 @@
+import django.db.models.deletion
+from django.db import migrations, models
+
+SQLITE_FORWARD = [
+    # External-content FTS5 table: stores only the trigram index, text stays in search_searchdocument.
+    (
+        "CREATE VIRTUAL TABLE search_document_fts USING fts5("
+        "document, content='search_searchdocument', content_rowid='id', tokenize='trigram')"
+    ),
+    (
+        "CREATE TRIGGER search_document_ai AFTER INSERT ON search_searchdocument BEGIN "
+        "INSERT INTO search_document_fts(rowid, document) VALUES (new.id, new.document); END"
+    ),
+    (
+        "CREATE TRIGGER search_document_ad AFTER DELETE ON search_searchdocument BEGIN "
+        "INSERT INTO search_document_fts(search_document_fts, rowid, document) "
+        "VALUES ('delete', old.id, old.document); END"
+    ),
+    (
+        "CREATE TRIGGER search_document_au AFTER UPDATE ON search_searchdocument BEGIN "
+        "INSERT INTO search_document_fts(search_document_fts, rowid, document) "
+        "VALUES ('delete', old.id, old.document); "
+        "INSERT INTO search_document_fts(rowid, document) VALUES (new.id, new.document); END"
+    ),
+]
+SQLITE_BACKWARD = [
+    "DROP TRIGGER IF EXISTS search_document_au",
+    "DROP TRIGGER IF EXISTS search_document_ad",
+    "DROP TRIGGER IF EXISTS search_document_ai",
+    "DROP TABLE IF EXISTS search_document_fts",
+]
+POSTGRESQL_FORWARD = [
+    "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+    "CREATE INDEX search_document_trgm_idx ON search_searchdocument USING gin (document gin_trgm_ops)",
+]
+POSTGRESQL_BACKWARD = ["DROP INDEX IF EXISTS search_document_trgm_idx"]
+
+
+def create_text_index(apps, schema_editor):
+    statements = {"sqlite": SQLITE_FORWARD, "postgresql": POSTGRESQL_FORWARD}
+    for sql in statements.get(schema_editor.connection.vendor, []):
+        schema_editor.execute(sql)
+
+
+def drop_text_index(apps, schema_editor):
+    statements = {"sqlite": SQLITE_BACKWARD, "postgresql": POSTGRESQL_BACKWARD}
+    for sql in statements.get(schema_editor.connection.vendor, []):
+        schema_editor.execute(sql)
+
+
+class Migration(migrations.Migration):
+    initial = True
+
+    dependencies = [
+        ("tenants", "0002_municipality_timezone"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="SearchDocument",
+            fields=[
+                ("id", models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name="ID")),
+                ("model", models.CharField(max_length=50)),
+                ("object_id", models.BigIntegerField()),
+                ("document", models.TextField()),
+                ("updated_at", models.DateTimeField(auto_now=True)),
+                (
+                    "municipality",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE, related_name="+", to="tenants.municipality"
+                    ),
+                ),
+            ],
+            options={
+                "constraints": [
+                    models.UniqueConstraint(fields=("model", "object_id"), name="search_document_object_unique")
+                ],
+            },
+        ),
+        migrations.RunPython(create_text_index, drop_text_index),
+    ]
@@ -0,0 +1,26 @@
+from django.db import migrations
+
+from search.backends import INDEX_CHUNK_SIZE, index_objects
+from search.registry import SEARCH_FIELDS
+
+
+def backfill_documents(apps, schema_editor):
+    """Index the rows that existed before the search index, so `?search=` finds them right after upgrading."""
+    documents = apps.get_model("search", "SearchDocument")
+    for label in SEARCH_FIELDS:
+        model = apps.get_model(label)
+        ids = model.objects.order_by("pk").values_list("pk", flat=True).iterator(chunk_size=INDEX_CHUNK_SIZE)
+        index_objects(model, ids, documents=documents)
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("search", "0001_initial"),
+        ("drivers", "0002_driver_access_code"),
+        ("fleet", "0002_fuellog"),
+        ("trips", "0003_merge_0002_trip_category_and_cargo_fields_0002_trip_passengers_details"),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_documents, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,24 @@
+from django.db import models
+
+
+class SearchDocument(models.Model):
+    """
+    Accent-free, lower-cased text of one searchable row (see search.registry).
+
+    The text is indexed outside the ORM: a pg_trgm GIN index on PostgreSQL and an FTS5 trigram
+    shadow table kept in sync by triggers on SQLite (migration 0001).
+    """
+
+    model = models.CharField(max_length=50)
+    object_id = models.BigIntegerField()
+    municipality = models.ForeignKey("tenants.Municipality", on_delete=models.CASCADE, related_name="+")
+    document = models.TextField()
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["model", "object_id"], name="search_document_object_unique"),
+        ]
+
+    def __str__(self):
+        return f"{self.model}#{self.object_id}"
@@ -0,0 +1,24 @@
+from django.apps import apps
+
+# Model label -> fields concatenated into its search document. Mirrors each viewset's search_fields,
+# which remain the fallback for terms too short for the trigram index.
+SEARCH_FIELDS = {
+    "trips.Trip": ["origin", "destination", "vehicle__license_plate", "driver__name"],
+    "drivers.Driver": ["name", "cpf", "phone"],
+    "fleet.Vehicle": ["license_plate", "brand", "model"],
+    "fleet.FuelLog": ["fuel_station", "driver__name", "vehicle__license_plate"],
+}
+
+# Changing a driver or vehicle changes the documents of rows that embed its fields.
+DEPENDENTS = {
+    "drivers.Driver": [("trips.Trip", "driver_id"), ("fleet.FuelLog", "driver_id")],
+    "fleet.Vehicle": [("trips.Trip", "vehicle_id"), ("fleet.FuelLog", "vehicle_id")],
+}
+
+
+def is_indexed(model) -> bool:
+    return model._meta.label in SEARCH_FIELDS
+
+
+def get_model(label):
+    return apps.get_model(label)
@@ -0,0 +1,39 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from search.backends import index_objects, remove_objects
+from search.models import SearchDocument
+from search.registry import DEPENDENTS, get_model, is_indexed
+from trips.models import Trip
+from trips.signals import trips_bulk_created
+
+
+def _current_document(label, pk):
+    return SearchDocument.objects.filter(model=label, object_id=pk).values_list("document", flat=True).first()
+
+
+@receiver(post_save)
+def index_saved_object(sender, instance, raw=False, **kwargs):
+    if raw or not is_indexed(sender):
+        return
+    label = sender._meta.label
+    dependents = DEPENDENTS.get(label)
+    previous = _current_document(label, instance.pk) if dependents else None
+    index_objects(sender, [instance.pk])
+    # Only cascade to trips/fuel logs when the embedded text actually changed (e.g. a driver rename).
+    if not dependents or previous is None or previous == _current_document(label, instance.pk):
+        return
+    for dependent_label, fk in dependents:
+        dependent = get_model(dependent_label)
+        index_objects(dependent, dependent.objects.filter(**{fk: instance.pk}).values_list("pk", flat=True))
+
+
+@receiver(post_delete)
+def remove_deleted_object(sender, instance, **kwargs):
+    if is_indexed(sender):
+        remove_objects(sender, [instance.pk])
+
+
+@receiver(trips_bulk_created)
+def index_bulk_created_trips(sender, trips, **kwargs):
+    index_objects(Trip, [trip.pk for trip in trips])
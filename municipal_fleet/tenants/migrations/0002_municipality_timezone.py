@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 05:01
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tenants', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='municipality',
+            name='timezone',
+            field=models.CharField(default='America/Sao_Paulo', max_length=64),
+        ),
+    ]
@@ -1,3 +1,6 @@
+from zoneinfo import ZoneInfo
+
+from django.conf import settings
 from django.db import models
 
 
@@ -8,8 +11,14 @@ class Municipality(models.Model):
     city = models.CharField(max_length=100)
     state = models.CharField(max_length=2)
     phone = models.CharField(max_length=20)
+    # IANA name; Brazil spans several zones (e.g. America/Manaus, America/Cuiaba, America/Rio_Branco).
+    timezone = models.CharField(max_length=64, default=settings.TIME_ZONE)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
     def __str__(self) -> str:
         return self.name
+
+    @property
+    def tzinfo(self) -> ZoneInfo:
+        return ZoneInfo(self.timezone)
@@ -0,0 +1,39 @@
+from django.test import TestCase
+
+from tests.test_scheduling import ScheduleTestMixin
+
+
+class TripFieldsetTests(ScheduleTestMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.trip = self._make_trip(
+            0, passengers_details=[{"name": "Ana", "cpf": "11122233344"}], passengers_count=1, notes="Observação longa"
+        )
+
+    def test_slim_list_matches_detail_representation(self):
+        row = self.client.get("/api/trips/").data["results"][0]
+        detail = self.client.get(f"/api/trips/{self.trip.id}/").data
+        self.assertNotIn("passengers_details", row)
+        self.assertNotIn("notes", row)
+        self.assertEqual(row, {name: detail[name] for name in row})
+
+    def test_fields_and_omit(self):
+        resp = self.client.get("/api/trips/", {"fields": "id,passengers_details"})
+        self.assertEqual(resp.data["results"][0], {"id": self.trip.id, "passengers_details": self.trip.passengers_details})
+
+        resp = self.client.get("/api/trips/", {"omit": "municipality,odometer_end"})
+        self.assertNotIn("municipality", resp.data["results"][0])
+        self.assertIn("origin", resp.data["results"][0])
+
+        resp = self.client.get(f"/api/trips/{self.trip.id}/", {"fields": "id,notes"})
+        self.assertEqual(resp.data, {"id": self.trip.id, "notes": "Observação longa"})
+
+        self.assertEqual(self.client.get("/api/trips/", {"fields": "id,senha"}).status_code, 400)
+
+    def test_cursor_pages_work_with_sparse_fields(self):
+        self._make_trip(3)
+        first = self.client.get("/api/trips/", {"cursor": "", "page_size": 1, "fields": "origin"})
+        self.assertEqual(first.data["results"], [{"origin": "A"}])
+        second = self.client.get(first.data["next"])
+        self.assertEqual(second.status_code, 200)
+        self.assertEqual(len(second.data["results"]), 1)
@@ -1,19 +1,22 @@
-from datetime import timedelta, datetime, timezone as dt_timezone
+from datetime import datetime, timedelta
+from datetime import timezone as dt_timezone
 
+from django.core.cache import cache
+from django.core.management import call_command
 from django.test import TestCase
 from django.utils import timezone
 from rest_framework.test import APIClient
-from django.core.management import call_command
 
 from accounts.models import User
-from tenants.models import Municipality
-from fleet.models import Vehicle
 from drivers.models import Driver
-from trips.models import Trip, MonthlyOdometer
+from fleet.models import Vehicle
+from tenants.models import Municipality
+from trips.models import MonthlyOdometer, Trip
 
 
 class FullApplicationTests(TestCase):
     def setUp(self):
+        cache.clear()
         self.client = APIClient()
         self.muni_a = Municipality.objects.create(
             name="Pref A",
@@ -0,0 +1,259 @@
+from datetime import datetime, timedelta
+from datetime import timezone as dt_timezone
+from importlib import import_module
+from io import StringIO
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.db.migrations.executor import MigrationExecutor
+from django.test import TestCase
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from accounts.models import User
+from drivers.models import Driver
+from fleet.models import MaintenanceForecast, Vehicle, VehicleMaintenance
+from tenants.models import Municipality
+from trips.models import MonthlyOdometer, OdometerRebuildWatermark, Trip, TripDistance
+from trips.odometer import _incremental_scope
+
+
+class OdometerTestMixin:
+    def setUp(self):
+        self.client = APIClient()
+        self.muni = Municipality.objects.create(
+            name="Pref Odometro",
+            cnpj="99.999.999/0001-99",
+            address="Rua 9",
+            city="Cidade",
+            state="SP",
+            phone="11111110000",
+        )
+        self.admin = User.objects.create_user(
+            email="admin@odometro.com", password="pass123", role=User.Roles.ADMIN_MUNICIPALITY, municipality=self.muni
+        )
+        self.vehicle = Vehicle.objects.create(
+            municipality=self.muni,
+            license_plate="ODO1234",
+            model="Van",
+            brand="Ford",
+            year=2020,
+            max_passengers=10,
+            odometer_current=1000,
+            odometer_initial=1000,
+        )
+        self.driver = Driver.objects.create(
+            municipality=self.muni,
+            name="Driver Odometro",
+            cpf="999.999.999-99",
+            cnh_number="99999",
+            cnh_category="D",
+            cnh_expiration_date="2030-01-01",
+            phone="11999990000",
+        )
+        self.client.force_authenticate(self.admin)
+        self.departure = timezone.now().replace(day=10, hour=12, microsecond=0)
+
+
+class OdometerLedgerTests(OdometerTestMixin, TestCase):
+    def _complete(self, odometer_start, odometer_end, hours=0):
+        departure = self.departure + timedelta(hours=hours)
+        resp = self.client.post(
+            "/api/trips/",
+            {
+                "vehicle": self.vehicle.id,
+                "driver": self.driver.id,
+                "origin": "A",
+                "destination": "B",
+                "departure_datetime": departure.isoformat(),
+                "return_datetime_expected": (departure + timedelta(hours=1)).isoformat(),
+                "odometer_start": odometer_start,
+                "odometer_end": odometer_end,
+                "status": Trip.Status.COMPLETED,
+            },
+            format="json",
+        )
+        self.assertEqual(resp.status_code, 201, resp.data)
+        return resp.data["id"]
+
+    def _monthly_km(self):
+        return MonthlyOdometer.objects.get(
+            vehicle=self.vehicle, year=self.departure.year, month=self.departure.month
+        ).kilometers
+
+    def test_resaving_completed_trip_does_not_double_count(self):
+        trip_id = self._complete(1000, 1050)
+        resp = self.client.patch(f"/api/trips/{trip_id}/", {"notes": "revisado"}, format="json")
+        self.assertEqual(resp.status_code, 200, resp.data)
+        self.assertEqual(self._monthly_km(), 50)
+        self.assertEqual(TripDistance.objects.get(trip_id=trip_id).kilometers, 50)
+
+    def test_corrections_and_deletes_apply_only_the_difference(self):
+        first = self._complete(1000, 1050)
+        self._complete(1050, 1080, hours=2)
+        self.assertEqual(self._monthly_km(), 80)
+
+        resp = self.client.patch(f"/api/trips/{first}/", {"odometer_end": 1040}, format="json")
+        self.assertEqual(resp.status_code, 200, resp.data)
+        self.assertEqual(self._monthly_km(), 70)
+
+        resp = self.client.delete(f"/api/trips/{first}/")
+        self.assertEqual(resp.status_code, 204)
+        self.assertEqual(self._monthly_km(), 30)
+
+    def test_vehicle_odometer_never_moves_backwards(self):
+        self._complete(1000, 1200)
+        self._complete(1000, 1100, hours=2)
+        self.vehicle.refresh_from_db()
+        self.assertEqual(self.vehicle.odometer_current, 1200)
+
+
+
+class RebuildMonthlyOdometerTests(OdometerTestMixin, TestCase):
+    def _trip(self, departure, km, **extra):
+        return Trip.objects.create(
+            municipality=self.muni,
+            vehicle=self.vehicle,
+            driver=self.driver,
+            origin="A",
+            destination="B",
+            departure_datetime=departure,
+            return_datetime_expected=departure + timedelta(hours=1),
+            odometer_start=1000,
+            odometer_end=1000 + km,
+            status=Trip.Status.COMPLETED,
+            **extra,
+        )
+
+    def _rebuild(self, *args):
+        out = StringIO()
+        call_command("rebuild_monthly_odometer", *args, stdout=out)
+        return out.getvalue()
+
+    def _km(self, year, month):
+        return MonthlyOdometer.objects.get(vehicle=self.vehicle, year=year, month=month).kilometers
+
+    def test_months_are_local_and_stale_totals_are_zeroed(self):
+        # 02:00 UTC on Feb 1st is still January 31st in São Paulo.
+        self._trip(datetime(2024, 2, 1, 2, 0, tzinfo=dt_timezone.utc), 25)
+        MonthlyOdometer.objects.create(vehicle=self.vehicle, year=2024, month=3, kilometers=99)
+        self.assertIn("Resumos processados: 1", self._rebuild())
+        self.assertEqual(self._km(2024, 1), 25)
+        self.assertEqual(self._km(2024, 3), 0)
+        self.assertEqual(TripDistance.objects.get().month, 1)
+
+    def test_since_leaves_earlier_months_untouched(self):
+        self._trip(datetime(2024, 1, 15, 12, 0, tzinfo=dt_timezone.utc), 30)
+        self._trip(datetime(2024, 2, 15, 12, 0, tzinfo=dt_timezone.utc), 40)
+        MonthlyOdometer.objects.create(vehicle=self.vehicle, year=2024, month=1, kilometers=7)
+        self._rebuild("--since", "2024-02-20")
+        self.assertEqual(self._km(2024, 1), 7)
+        self.assertEqual(self._km(2024, 2), 40)
+
+    def test_incremental_only_recomputes_changed_months(self):
+        jan = self._trip(datetime(2024, 1, 15, 12, 0, tzinfo=dt_timezone.utc), 30)
+        self._trip(datetime(2024, 3, 15, 12, 0, tzinfo=dt_timezone.utc), 40)
+        self._rebuild("--incremental")
+        self.assertIn("Resumos processados: 0", self._rebuild("--incremental"))
+
+        MonthlyOdometer.objects.filter(year=2024, month=1).update(kilometers=1)
+        jan.odometer_end = 1050
+        jan.departure_datetime = datetime(2024, 2, 15, 12, 0, tzinfo=dt_timezone.utc)
+        jan.return_datetime_expected = jan.departure_datetime + timedelta(hours=1)
+        jan.save()
+        self._rebuild("--incremental")
+        self.assertEqual(self._km(2024, 1), 0)
+        self.assertEqual(self._km(2024, 2), 50)
+        self.assertEqual(self._km(2024, 3), 40)
+
+
+    def test_incremental_run_without_changes_only_moves_the_watermark(self):
+        trips = Trip.objects.filter(municipality=self.muni)
+        self.assertEqual(_incremental_scope(trips, self.muni), (None, None))
+        self._trip(datetime(2024, 1, 15, 12, 0, tzinfo=dt_timezone.utc), 30)
+        self._rebuild("--incremental")
+        self.assertEqual(_incremental_scope(trips, self.muni), (None, set()))
+
+        before = OdometerRebuildWatermark.objects.get(municipality=self.muni).rebuilt_at
+        MonthlyOdometer.objects.filter(year=2024, month=1).update(kilometers=1)
+        self.assertIn("Resumos processados: 0", self._rebuild("--incremental"))
+        self.assertEqual(self._km(2024, 1), 1)
+        self.assertGreater(OdometerRebuildWatermark.objects.get(municipality=self.muni).rebuilt_at, before)
+
+
+class MaintenanceForecastTests(OdometerTestMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+        self.today = timezone.localdate()
+        since = (self.today - timedelta(days=settings.MAINTENANCE_FORECAST_WINDOW_DAYS)).replace(day=1)
+        # 100 km/day over the forecast window.
+        MonthlyOdometer.objects.create(
+            vehicle=self.vehicle, year=self.today.year, month=self.today.month, kilometers=100 * ((self.today - since).days + 1)
+        )
+        Vehicle.objects.filter(pk=self.vehicle.pk).update(odometer_current=14000)
+        VehicleMaintenance.objects.create(
+            vehicle=self.vehicle, description="Revisão geral", date=self.today - timedelta(days=10), mileage=9000
+        )
+
+    def _forecasts(self):
+        return {row.kind: row for row in MaintenanceForecast.objects.filter(vehicle=self.vehicle)}
+
+    def test_projects_due_dates_from_mileage_pace(self):
+        call_command("forecast_maintenance", stdout=StringIO())
+        forecasts = self._forecasts()
+        service, oil = forecasts[MaintenanceForecast.Kind.SERVICE], forecasts[MaintenanceForecast.Kind.OIL_CHANGE]
+        self.assertEqual((service.due_date, service.due_mileage), (self.today + timedelta(days=50), 19000))
+        self.assertEqual(service.basis, MaintenanceForecast.Basis.MILEAGE)
+        # No oil change on record: due since the initial odometer + 5000 km.
+        self.assertEqual((oil.due_date, oil.due_mileage), (self.today, 6000))
+
+        resp = self.client.post(
+            "/api/vehicles/maintenance/",
+            {"vehicle": self.vehicle.id, "description": "Troca de óleo", "date": self.today, "mileage": 14000},
+            format="json",
+        )
+        self.assertEqual(resp.status_code, 201, resp.data)
+        self.assertEqual(self._forecasts()[MaintenanceForecast.Kind.OIL_CHANGE].due_date, self.today + timedelta(days=50))
+
+        Vehicle.objects.filter(pk=self.vehicle.pk).update(next_service_date=self.today + timedelta(days=5))
+        call_command("forecast_maintenance", stdout=StringIO())
+        service = self._forecasts()[MaintenanceForecast.Kind.SERVICE]
+        self.assertEqual((service.due_date, service.basis), (self.today + timedelta(days=5), MaintenanceForecast.Basis.MANUAL))
+
+    def test_endpoint_and_dashboard_read_the_forecasts(self):
+        other = Vehicle.objects.create(
+            municipality=self.muni, license_plate="OFF0000", model="Van", brand="Ford", year=2020, max_passengers=10,
+            status=Vehicle.Status.INACTIVE,
+        )
+        call_command("forecast_maintenance", stdout=StringIO())
+        self.assertFalse(MaintenanceForecast.objects.filter(vehicle=other).exists())
+
+        resp = self.client.get("/api/vehicles/maintenance_forecast/")
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual([row["kind"] for row in resp.data], [MaintenanceForecast.Kind.OIL_CHANGE])
+        resp = self.client.get("/api/vehicles/maintenance_forecast/", {"days": 60})
+        self.assertEqual([row["kind"] for row in resp.data], [MaintenanceForecast.Kind.OIL_CHANGE, MaintenanceForecast.Kind.SERVICE])
+        self.assertEqual(self.client.get("/api/vehicles/maintenance_forecast/", {"days": "x"}).status_code, 400)
+
+        alerts = self.client.get("/api/reports/dashboard/").data["maintenance_alerts"]
+        self.assertEqual(alerts, [{"id": self.vehicle.id, "license_plate": "ODO1234", "next_service_date": self.today, "kind": "OIL_CHANGE"}])
+
+    def test_vehicle_edits_refresh_the_forecast(self):
+        self.assertFalse(self._forecasts())
+        resp = self.client.patch(
+            f"/api/vehicles/{self.vehicle.id}/", {"next_service_date": self.today + timedelta(days=3)}, format="json"
+        )
+        self.assertEqual(resp.status_code, 200, resp.data)
+        service = self._forecasts()[MaintenanceForecast.Kind.SERVICE]
+        self.assertEqual((service.due_date, service.basis), (self.today + timedelta(days=3), MaintenanceForecast.Basis.MANUAL))
+
+    def test_migration_backfills_forecasts_with_historical_models(self):
+        migration = ("fleet", "0006_backfill_maintenance_forecast")
+        state = MigrationExecutor(connection).loader.project_state(migration, at_end=True)
+        import_module(f"{migration[0]}.migrations.{migration[1]}").backfill_forecasts(state.apps, None)
+        self.assertEqual(set(self._forecasts()), {MaintenanceForecast.Kind.SERVICE, MaintenanceForecast.Kind.OIL_CHANGE})
+        alerts = self.client.get("/api/reports/dashboard/").data["maintenance_alerts"]
+        self.assertEqual([alert["kind"] for alert in alerts], ["OIL_CHANGE"])
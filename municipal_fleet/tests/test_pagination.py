@@ -0,0 +1,134 @@
+from datetime import timedelta
+
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from accounts.models import User
+from drivers.models import Driver
+from fleet.models import FuelLog, Vehicle
+from municipal_fleet.pagination import KeysetOrPageNumberPagination
+from tenants.models import Municipality
+from trips.models import Trip
+
+
+class KeysetPaginationTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.muni = Municipality.objects.create(
+            name="Pref Cursor",
+            cnpj="55.555.555/0001-55",
+            address="Rua 5",
+            city="Cidade",
+            state="SP",
+            phone="11444440000",
+        )
+        self.admin = User.objects.create_user(
+            email="admin@cursor.com", password="pass123", role=User.Roles.ADMIN_MUNICIPALITY, municipality=self.muni
+        )
+        self.vehicle = Vehicle.objects.create(
+            municipality=self.muni,
+            license_plate="CUR1234",
+            model="Van",
+            brand="Ford",
+            year=2020,
+            max_passengers=10,
+        )
+        self.driver = Driver.objects.create(
+            municipality=self.muni,
+            name="Driver Cursor",
+            cpf="555.555.555-55",
+            cnh_number="55555",
+            cnh_category="D",
+            cnh_expiration_date="2030-01-01",
+            phone="11333330000",
+        )
+        base = timezone.now().replace(microsecond=0)
+        # Pairs of trips share a departure so the id tie-breaker is exercised.
+        for idx in range(7):
+            departure = base - timedelta(days=idx // 2)
+            Trip.objects.create(
+                municipality=self.muni,
+                vehicle=self.vehicle,
+                driver=self.driver,
+                origin=f"O{idx}",
+                destination="D",
+                departure_datetime=departure,
+                return_datetime_expected=departure + timedelta(hours=1),
+                odometer_start=0,
+                status=Trip.Status.COMPLETED,
+                odometer_end=10,
+            )
+        self.client.force_authenticate(self.admin)
+
+    def _walk(self, url):
+        ids, pages = [], []
+        while url:
+            resp = self.client.get(url)
+            self.assertEqual(resp.status_code, 200, resp.data)
+            self.assertNotIn("count", resp.data)
+            pages.append(resp.data)
+            ids.extend(item["id"] for item in resp.data["results"])
+            url = resp.data["next"]
+        return ids, pages
+
+    def test_trip_cursor_walks_every_row_once_in_stable_order(self):
+        expected = list(Trip.objects.order_by("-departure_datetime", "-id").values_list("id", flat=True))
+        ids, pages = self._walk("/api/trips/?cursor=&page_size=3")
+        self.assertEqual(ids, expected)
+        self.assertIsNone(pages[0]["previous"])
+
+        back = self.client.get(pages[-1]["previous"])
+        self.assertEqual([item["id"] for item in back.data["results"]], expected[3:6])
+
+    def test_seek_matches_lexicographic_order_for_row_values_and_mixed_directions(self):
+        rows = list(Trip.objects.values_list("departure_datetime", "id"))
+        pivot = sorted(rows)[3]
+        trips = Trip.objects.all()
+
+        def seek(order):
+            condition = KeysetOrPageNumberPagination._seek_filter(trips, order, pivot)
+            return set(trips.filter(condition).values_list("id", flat=True))
+
+        with CaptureQueriesContext(connection) as queries:
+            after = seek(["-departure_datetime", "-id"])
+        self.assertEqual(after, {pk for departure, pk in rows if (departure, pk) < pivot})
+        self.assertIn('("trips_trip"."departure_datetime", "trips_trip"."id") <', queries[0]["sql"])
+
+        later, earlier_id = pivot
+        self.assertEqual(
+            seek(["departure_datetime", "-id"]),
+            {pk for departure, pk in rows if departure > later or (departure == later and pk < earlier_id)},
+        )
+
+    def test_page_number_mode_is_unchanged_without_cursor(self):
+        resp = self.client.get("/api/trips/?page=2&page_size=3")
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(resp.data["count"], 7)
+
+    def test_invalid_cursor_returns_404(self):
+        resp = self.client.get("/api/trips/?cursor=bm9wZQ")
+        self.assertEqual(resp.status_code, 404)
+
+    def test_fuel_logs_and_report_support_cursor(self):
+        for day in (1, 1, 2):
+            FuelLog.objects.create(
+                municipality=self.muni,
+                vehicle=self.vehicle,
+                driver=self.driver,
+                filled_at=f"2024-01-0{day}",
+                liters="10.00",
+                fuel_station="Posto",
+            )
+        ids, _ = self._walk("/api/vehicles/fuel_logs/?cursor=&page_size=2")
+        self.assertEqual(ids, list(FuelLog.objects.order_by("-filled_at", "-created_at", "-id").values_list("id", flat=True)))
+
+        report = self.client.get("/api/reports/trips/?cursor=&page_size=5")
+        self.assertEqual(report.status_code, 200)
+        self.assertEqual(len(report.data["trips"]), 5)
+        self.assertEqual(report.data["summary"]["total"], 7)
+        self.assertIsNotNone(report.data["next"])
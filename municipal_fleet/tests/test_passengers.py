@@ -0,0 +1,51 @@
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import TestCase
+
+from tests.test_scheduling import ScheduleTestMixin
+from trips.models import Trip, TripPassenger
+
+
+class PassengerIndexTests(ScheduleTestMixin, TestCase):
+    def _passenger(self, name, cpf):
+        return {"name": name, "cpf": cpf, "special_need": "NONE"}
+
+    def _history(self, cpf, **params):
+        resp = self.client.get("/api/trips/passengers/", {"cpf": cpf, **params})
+        self.assertEqual(resp.status_code, 200, resp.data)
+        return [row["trip_id"] for row in resp.data["results"]]
+
+    def test_lookup_by_cpf_with_or_without_punctuation(self):
+        first = self.client.post(
+            "/api/trips/",
+            self._payload(0, passengers_details=[self._passenger("Ana", "111.222.333-44"), self._passenger("Bia", "55566677788")]),
+            format="json",
+        ).data["id"]
+        second = self.client.post(
+            "/api/trips/", self._payload(3, passengers_details=[self._passenger("Ana", "11122233344")]), format="json"
+        ).data["id"]
+        self.assertEqual(self._history("111.222.333-44"), [second, first])
+        self.assertEqual(self._history("55566677788"), [first])
+
+        resp = self.client.patch(
+            f"/api/trips/{first}/", {"passengers_details": [self._passenger("Bia", "555.666.777-88")]}, format="json"
+        )
+        self.assertEqual(resp.status_code, 200, resp.data)
+        self.assertEqual(self._history("11122233344"), [second])
+        self.assertEqual(self.client.get("/api/trips/passengers/", {"cpf": "123"}).status_code, 400)
+
+    def test_bulk_created_trips_are_indexed(self):
+        batch = [self._payload(0, passengers_details=[self._passenger("Caio", "999.888.777-66")])]
+        resp = self.client.post("/api/trips/bulk/", {"trips": batch}, format="json")
+        self.assertEqual(resp.status_code, 201, resp.data)
+        self.assertEqual(self._history("99988877766"), [resp.data["trips"][0]["id"]])
+
+    def test_rebuild_command_backfills_existing_trips(self):
+        trip = self._make_trip(0, passengers_details=[self._passenger("Duda", "222.333.444-55")], passengers_count=1)
+        self.assertFalse(TripPassenger.objects.exists())
+        call_command("rebuild_passenger_index", stdout=StringIO())
+        self.assertEqual(self._history("22233344455"), [trip.id])
+        Trip.objects.filter(pk=trip.pk).update(passengers_details=[])
+        call_command("rebuild_passenger_index", stdout=StringIO())
+        self.assertFalse(TripPassenger.objects.exists())
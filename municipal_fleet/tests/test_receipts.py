@@ -0,0 +1,160 @@
+import os
+import shutil
+import tempfile
+from io import StringIO
+
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+
+from accounts.models import User
+from drivers.models import Driver
+from drivers.portal import generate_portal_token
+from fleet.models import FuelLog, ReceiptBlob
+from fleet.storage import INCOMING_DIR, receipt_storage
+from tenants.models import Municipality
+from tests.test_reports import ReportTestMixin
+
+
+class ReceiptTestMixin(ReportTestMixin):
+    def setUp(self):
+        super().setUp()
+        self.media_root = tempfile.mkdtemp()
+        media = override_settings(MEDIA_ROOT=self.media_root)
+        media.enable()
+        self.addCleanup(media.disable)
+        self.addCleanup(shutil.rmtree, self.media_root, ignore_errors=True)
+
+    def _upload(self, content=b"\x89PNG foto do cupom", filename="cupom.PNG"):
+        resp = self.client.post(
+            "/api/vehicles/fuel_logs/",
+            {
+                "vehicle": self.vehicle.id,
+                "driver": self.driver.id,
+                "filled_at": "2024-05-02",
+                "liters": "30.00",
+                "fuel_station": "Posto",
+                "receipt_image": SimpleUploadedFile(filename, content, content_type="image/png"),
+            },
+            format="multipart",
+        )
+        self.assertEqual(resp.status_code, 201, resp.data)
+        return FuelLog.objects.get(pk=resp.data["id"])
+
+    def _stored_files(self):
+        return sorted(
+            os.path.relpath(os.path.join(root, name), self.media_root)
+            for root, _dirs, files in os.walk(self.media_root)
+            for name in files
+        )
+
+
+class ReceiptStorageTests(ReceiptTestMixin, TestCase):
+    def test_identical_uploads_share_one_counted_blob(self):
+        first = self._upload()
+        retry = self._upload(filename="outro-nome.png")
+        self.assertEqual(first.receipt_image.name, retry.receipt_image.name)
+        self.assertRegex(first.receipt_image.name, r"^fuel_receipts/[0-9a-f]{2}/[0-9a-f]{64}\.png$")
+        self.assertEqual(self._stored_files(), [first.receipt_image.name])
+        self.assertEqual(ReceiptBlob.objects.get(name=first.receipt_image.name).total, 2)
+
+        other = self._upload(content=b"outra foto")
+        self.assertEqual(len(self._stored_files()), 2)
+        other.receipt_image = first.receipt_image.name
+        other.save()
+        self.assertEqual(ReceiptBlob.objects.get(name=first.receipt_image.name).total, 3)
+        # Deleting through the storage never removes a shared blob.
+        receipt_storage().delete(first.receipt_image.name)
+        self.assertIn(first.receipt_image.name, self._stored_files())
+
+    def test_gc_purges_only_unreferenced_blobs_past_the_grace_period(self):
+        kept = self._upload()
+        dropped = self._upload(content=b"foto descartada")
+        name = dropped.receipt_image.name
+        dropped.delete()
+        self.assertEqual(ReceiptBlob.objects.get(name=name).total, 0)
+        os.makedirs(os.path.join(self.media_root, INCOMING_DIR), exist_ok=True)
+        open(os.path.join(self.media_root, INCOMING_DIR, "tmpupload"), "wb").close()
+
+        call_command("gc_receipt_blobs", stdout=StringIO())
+        self.assertIn(name, self._stored_files())
+
+        call_command("gc_receipt_blobs", "--grace-hours", "0", "--dry-run", stdout=StringIO())
+        self.assertIn(name, self._stored_files())
+        call_command("gc_receipt_blobs", "--grace-hours", "0", stdout=StringIO())
+        self.assertEqual(self._stored_files(), [kept.receipt_image.name])
+        self.assertFalse(ReceiptBlob.objects.filter(name=name).exists())
+
+    def test_recount_repairs_counts_from_fuel_logs(self):
+        log = self._upload()
+        ReceiptBlob.objects.update(total=7)
+        call_command("gc_receipt_blobs", "--recount", "--grace-hours", "0", stdout=StringIO())
+        self.assertEqual(ReceiptBlob.objects.get(name=log.receipt_image.name).total, 1)
+        self.assertEqual(self._stored_files(), [log.receipt_image.name])
+
+
+class ReceiptDeliveryTests(ReceiptTestMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.log = self._upload()
+        self.url = f"/api/vehicles/receipts/{self.log.receipt_image.name}"
+
+    def test_staff_of_the_municipality_get_the_file(self):
+        listed = self.client.get(f"/api/vehicles/fuel_logs/{self.log.id}/").data["receipt_image"]
+        self.assertIn(f"{self.url}?token=", listed)
+        resp = self.client.get(self.url)
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(b"".join(resp.streaming_content), b"\x89PNG foto do cupom")
+        self.assertEqual(resp["Content-Type"], "image/png")
+        self.assertNotIn("X-Accel-Redirect", resp)
+
+        with override_settings(RECEIPT_ACCEL_REDIRECT_PREFIX="/protected-media/"):
+            resp = self.client.get(self.url)
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(resp["X-Accel-Redirect"], f"/protected-media/{self.log.receipt_image.name}")
+        self.assertEqual(resp.content, b"")
+
+    def test_other_tenants_and_anonymous_are_refused(self):
+        other = Municipality.objects.create(
+            name="Pref Outra", cnpj="77.777.777/0001-77", address="Rua 7", city="Belém", state="PA", phone="91999990000"
+        )
+        outsider = User.objects.create_user(
+            email="admin@outra.com", password="pass123", role=User.Roles.ADMIN_MUNICIPALITY, municipality=other
+        )
+        self.client.force_authenticate(outsider)
+        self.assertEqual(self.client.get(self.url).status_code, 404)
+        self.client.force_authenticate(None)
+        self.assertEqual(self.client.get(self.url).status_code, 403)
+
+    def test_driver_portal_token_opens_only_own_receipts(self):
+        self.client.force_authenticate(None)
+        resp = self.client.get(self.url, {"driver_token": generate_portal_token(self.driver)})
+        self.assertEqual(resp.status_code, 200)
+        colleague = Driver.objects.create(
+            municipality=self.muni,
+            name="Outro Motorista",
+            cpf="777.777.777-77",
+            cnh_number="77777",
+            cnh_category="D",
+            cnh_expiration_date="2030-01-01",
+            phone="92977770000",
+        )
+        resp = self.client.get(self.url, HTTP_X_DRIVER_TOKEN=generate_portal_token(colleague))
+        self.assertEqual(resp.status_code, 404)
+
+    def test_links_from_the_lists_open_without_credentials(self):
+        report = self.client.get("/api/reports/fuel/").data["logs"][0]["receipt_image"]
+        portal = self.client.get(
+            "/api/drivers/portal/fuel_logs/", HTTP_X_DRIVER_TOKEN=generate_portal_token(self.driver)
+        ).data["logs"][0]["receipt_image"]
+        self.client.force_authenticate(None)
+        for link in (report, portal):
+            resp = self.client.get(link)
+            self.assertEqual(resp.status_code, 200, link)
+            self.assertEqual(b"".join(resp.streaming_content), b"\x89PNG foto do cupom")
+
+        self.assertEqual(self.client.get(report.replace("token=", "token=x")).status_code, 403)
+        other_name = self.log.receipt_image.name.replace(".png", ".jpg")
+        self.assertEqual(self.client.get(report.replace(self.log.receipt_image.name, other_name)).status_code, 403)
+        with override_settings(RECEIPT_LINK_MAX_AGE=-1):
+            self.assertEqual(self.client.get(report).status_code, 403)
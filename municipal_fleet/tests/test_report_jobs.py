@@ -0,0 +1,84 @@
+import shutil
+import tempfile
+from datetime import datetime
+from datetime import timezone as dt_timezone
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+
+from accounts.models import User
+from reports.models import ReportJob
+from tenants.models import Municipality
+from tests.test_reports import ReportTestMixin
+
+
+class ReportJobTests(ReportTestMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.media_root = tempfile.mkdtemp()
+        media = override_settings(MEDIA_ROOT=self.media_root)
+        media.enable()
+        self.addCleanup(media.disable)
+        self.addCleanup(shutil.rmtree, self.media_root, ignore_errors=True)
+        self._make_trip(datetime(2023, 3, 1, 12, 0, tzinfo=dt_timezone.utc), km=40)
+
+    def _submit(self, **payload):
+        payload = {"kind": "trips", "params": {"start_date": "2023-01-01", "end_date": "2024-12-31"}, **payload}
+        return self.client.post("/api/reports/jobs/", payload, format="json")
+
+    def _work(self):
+        call_command("run_report_jobs", "--once", stdout=StringIO())
+
+    def test_job_runs_in_worker_and_result_is_downloadable(self):
+        resp = self._submit()
+        self.assertEqual(resp.status_code, 201)
+        self.assertEqual(resp.data["status"], ReportJob.Status.QUEUED)
+        self.assertIsNone(resp.data["download_url"])
+        job_id = resp.data["id"]
+        self.assertEqual(self.client.get(f"/api/reports/jobs/{job_id}/download/").status_code, 409)
+
+        self._work()
+        status = self.client.get(f"/api/reports/jobs/{job_id}/")
+        self.assertEqual(status.data["status"], ReportJob.Status.DONE)
+        self.assertTrue(status.data["download_url"].endswith(f"/api/reports/jobs/{job_id}/download/"))
+
+        download = self.client.get(f"/api/reports/jobs/{job_id}/download/")
+        self.assertEqual(download.status_code, 200)
+        self.assertIn("attachment", download["Content-Disposition"])
+        lines = b"".join(download.streaming_content).decode("utf-8-sig").splitlines()
+        self.assertTrue(lines[0].startswith("ID;Origem;Destino"))
+        self.assertEqual(len(lines), 2)
+
+    def test_identical_job_is_reused_until_data_changes(self):
+        first = self._submit().data["id"]
+        self.assertEqual(self._submit().status_code, 200)
+        self._work()
+        reused = self._submit()
+        self.assertEqual(reused.status_code, 200)
+        self.assertEqual(reused.data["id"], first)
+        self.assertEqual(ReportJob.objects.count(), 1)
+
+        self.assertEqual(self._submit(file_format="xlsx").status_code, 201)
+        with self.captureOnCommitCallbacks(execute=True):
+            self._make_trip(datetime(2023, 4, 1, 12, 0, tzinfo=dt_timezone.utc))
+        fresh = self._submit()
+        self.assertEqual(fresh.status_code, 201)
+        self.assertNotEqual(fresh.data["id"], first)
+
+    def test_invalid_params_are_rejected(self):
+        self.assertEqual(self._submit(params={"start_date": "ontem"}).status_code, 400)
+        self.assertEqual(self._submit(params={"municipality": 1}).status_code, 400)
+        self.assertEqual(self._submit(kind="dashboard").status_code, 400)
+
+    def test_jobs_are_scoped_to_the_municipality(self):
+        job_id = self._submit().data["id"]
+        other = Municipality.objects.create(
+            name="Pref Outra", cnpj="77.777.777/0001-77", address="Rua 7", city="Outra", state="AM", phone="92977770000"
+        )
+        other_admin = User.objects.create_user(
+            email="admin@outra.com", password="pass123", role=User.Roles.ADMIN_MUNICIPALITY, municipality=other
+        )
+        self.client.force_authenticate(other_admin)
+        self.assertEqual(self.client.get(f"/api/reports/jobs/{job_id}/").status_code, 404)
+        self.assertEqual(self.client.get("/api/reports/jobs/").data["count"], 0)
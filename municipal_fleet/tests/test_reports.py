@@ -0,0 +1,452 @@
+import zipfile
+from datetime import date, datetime, timedelta
+from datetime import timezone as dt_timezone
+from io import BytesIO, StringIO
+
+from django.core.cache import cache
+from django.core.management import CommandError, call_command
+from django.db.models import F
+from django.test import TestCase
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from accounts.models import User
+from drivers.models import Driver
+from fleet.models import FuelLog, Vehicle
+from reports.cache import data_version
+from reports.exports import CSVRenderer, XLSXRenderer
+from reports.models import OccupancyRefresh, TripMonthRollup, VehicleDayOccupancy
+from reports.queries import plan_odometer_range
+from tenants.models import Municipality
+from trips.models import MonthlyOdometer, Trip
+from trips.odometer import record_trip_distance
+
+
+class ReportTestMixin:
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.muni = Municipality.objects.create(
+            name="Pref Manaus",
+            cnpj="66.666.666/0001-66",
+            address="Rua 6",
+            city="Manaus",
+            state="AM",
+            phone="92999990000",
+            timezone="America/Manaus",
+        )
+        self.admin = User.objects.create_user(
+            email="admin@manaus.com", password="pass123", role=User.Roles.ADMIN_MUNICIPALITY, municipality=self.muni
+        )
+        self.vehicle = self._make_vehicle("MAN1234")
+        self.driver = Driver.objects.create(
+            municipality=self.muni,
+            name="Driver Manaus",
+            cpf="666.666.666-66",
+            cnh_number="66666",
+            cnh_category="D",
+            cnh_expiration_date="2030-01-01",
+            phone="92988880000",
+        )
+        self.client.force_authenticate(self.admin)
+
+    def _make_vehicle(self, license_plate, **extra):
+        defaults = {"model": "Van", "brand": "Ford", "year": 2020, "max_passengers": 10}
+        defaults.update(extra)
+        return Vehicle.objects.create(municipality=self.muni, license_plate=license_plate, **defaults)
+
+    def _make_trip(self, departure, km=0, vehicle=None, driver=None, **extra):
+        fields = {"status": Trip.Status.COMPLETED, "odometer_end": 100 + km} if km else {}
+        fields.update(extra)
+        trip = Trip.objects.create(
+            municipality=self.muni,
+            vehicle=vehicle or self.vehicle,
+            driver=driver or self.driver,
+            origin="A",
+            destination="B",
+            departure_datetime=departure,
+            return_datetime_expected=departure + timedelta(hours=1),
+            odometer_start=100,
+            **fields,
+        )
+        if km:
+            # What the trip serializer does on save: keep MonthlyOdometer in step.
+            record_trip_distance(trip)
+        return trip
+
+
+class DateFilterTests(ReportTestMixin, TestCase):
+    def test_date_filters_use_municipality_local_day(self):
+        # 03:30 UTC on March 1st is still February 29th in Manaus (UTC-4).
+        trip = self._make_trip(datetime(2024, 3, 1, 3, 30, tzinfo=dt_timezone.utc))
+        for url in ("/api/trips/", "/api/reports/trips/"):
+            same_day = self.client.get(url, {"start_date": "2024-02-29", "end_date": "2024-02-29"})
+            next_day = self.client.get(url, {"start_date": "2024-03-01"})
+            self.assertEqual(same_day.status_code, 200)
+            rows = same_day.data["results"] if "results" in same_day.data else same_day.data["trips"]
+            self.assertEqual([row["id"] for row in rows], [trip.id])
+            rows = next_day.data["results"] if "results" in next_day.data else next_day.data["trips"]
+            self.assertEqual(rows, [])
+
+    def test_invalid_dates_return_400_instead_of_500(self):
+        for url in ("/api/trips/", "/api/vehicles/fuel_logs/", "/api/reports/trips/", "/api/reports/odometer/", "/api/reports/fuel/"):
+            resp = self.client.get(url, {"start_date": "31/12/2024"})
+            self.assertEqual(resp.status_code, 400, url)
+            self.assertIn("start_date", resp.data)
+        resp = self.client.get("/api/reports/trips/", {"start_date": "2024-02-01", "end_date": "2024-01-01"})
+        self.assertEqual(resp.status_code, 400)
+
+
+class DashboardRollupTests(ReportTestMixin, TestCase):
+    def _dashboard(self):
+        resp = self.client.get("/api/reports/dashboard/")
+        self.assertEqual(resp.status_code, 200)
+        return resp.data
+
+    def _verify(self):
+        call_command("rebuild_dashboard_rollups", "--verify", stdout=StringIO())
+
+    def test_dashboard_counts_follow_trip_and_vehicle_writes(self):
+        now = timezone.localtime(timezone=self.muni.tzinfo).replace(hour=8, minute=0, second=0, microsecond=0)
+        # Cached reports are invalidated once the writes commit.
+        with self.captureOnCommitCallbacks(execute=True):
+            spare = self._make_vehicle("MAN9999")
+            planned = self._make_trip(now)
+            cancelled = self._make_trip(now + timedelta(hours=2))
+            cancelled.status = Trip.Status.CANCELLED
+            cancelled.save()
+            moved = self._make_trip(now + timedelta(hours=4))
+            moved.departure_datetime = now - timedelta(days=62)
+            moved.return_datetime_expected = moved.departure_datetime + timedelta(hours=1)
+            moved.save()
+            spare.status = Vehicle.Status.MAINTENANCE
+            spare.save()
+
+        with self.assertNumQueries(5):
+            data = self._dashboard()
+        self.assertEqual(data["total_vehicles"], 2)
+        self.assertEqual(
+            {row["status"]: row["total"] for row in data["vehicles_by_status"]},
+            {Vehicle.Status.AVAILABLE: 1, Vehicle.Status.MAINTENANCE: 1},
+        )
+        self.assertEqual(data["trips_month_total"], 2)
+        self.assertEqual(
+            {row["status"]: row["total"] for row in data["trips_by_status"]},
+            {Trip.Status.PLANNED: 1, Trip.Status.CANCELLED: 1},
+        )
+
+        with self.captureOnCommitCallbacks(execute=True):
+            planned.delete()
+            spare.delete()
+        self.assertEqual(self._dashboard()["trips_month_total"], 1)
+        self.assertEqual(self._dashboard()["total_vehicles"], 1)
+        self._verify()
+
+    def test_verify_reports_drift_and_rebuild_repairs_it(self):
+        self._make_trip(timezone.now())
+        TripMonthRollup.objects.update(total=5)
+        with self.assertRaises(CommandError):
+            self._verify()
+        call_command("rebuild_dashboard_rollups", stdout=StringIO())
+        self._verify()
+        self.assertEqual(self._dashboard()["trips_month_total"], 1)
+
+
+class ReportCacheTests(ReportTestMixin, TestCase):
+    def test_cached_dashboard_costs_one_query_until_data_changes(self):
+        self._make_trip(timezone.now())
+        first = self.client.get("/api/reports/dashboard/")
+        self.assertEqual(first.data["trips_month_total"], 1)
+        with self.assertNumQueries(1):
+            again = self.client.get("/api/reports/dashboard/")
+        self.assertEqual(again.data, first.data)
+        self.assertEqual(again["ETag"], first["ETag"])
+
+        with self.assertNumQueries(1):
+            unchanged = self.client.get("/api/reports/dashboard/", HTTP_IF_NONE_MATCH=first["ETag"])
+        self.assertEqual(unchanged.status_code, 304)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self._make_trip(timezone.now())
+        changed = self.client.get("/api/reports/dashboard/", HTTP_IF_NONE_MATCH=first["ETag"])
+        self.assertEqual(changed.status_code, 200)
+        self.assertEqual(changed.data["trips_month_total"], 2)
+        self.assertNotEqual(changed["ETag"], first["ETag"])
+
+    def test_version_is_bumped_after_commit_only(self):
+        with self.captureOnCommitCallbacks() as callbacks:
+            self._make_trip(timezone.now())
+            self.assertEqual(data_version(self.muni.pk), 0)
+        self.assertTrue(callbacks)
+        for callback in callbacks:
+            callback()
+        self.assertEqual(data_version(self.muni.pk), len(callbacks))
+
+    def test_cache_is_per_municipality_and_query_string(self):
+        self._make_trip(timezone.now(), km=30)
+        all_months = self.client.get("/api/reports/odometer/")
+        other_month = self.client.get("/api/reports/odometer/", {"end_date": "2000-01-31"})
+        self.assertEqual(len(all_months.data), 1)
+        self.assertEqual(other_month.data, [])
+
+        other = Municipality.objects.create(
+            name="Pref Outra", cnpj="77.777.777/0001-77", address="Rua 7", city="Outra", state="AM", phone="92977770000"
+        )
+        other_admin = User.objects.create_user(
+            email="admin@outra.com", password="pass123", role=User.Roles.ADMIN_MUNICIPALITY, municipality=other
+        )
+        self.client.force_authenticate(other_admin)
+        self.assertEqual(self.client.get("/api/reports/odometer/").data, [])
+
+    def test_superadmin_bypasses_cache(self):
+        superadmin = User.objects.create_user(email="root@manaus.com", password="pass123", role=User.Roles.SUPERADMIN)
+        self.client.force_authenticate(superadmin)
+        resp = self.client.get("/api/reports/dashboard/")
+        self.assertEqual(resp.status_code, 200)
+        self.assertNotIn("ETag", resp)
+
+
+class ReportExportTests(ReportTestMixin, TestCase):
+    def _content(self, resp):
+        self.assertEqual(resp.status_code, 200)
+        return b"".join(resp.streaming_content)
+
+    def test_trip_report_streams_csv_with_localized_headers(self):
+        departure = datetime(2024, 1, 10, 12, 0, tzinfo=dt_timezone.utc)
+        self._make_trip(departure, km=25)
+        later = self._make_trip(departure + timedelta(days=1))
+        Trip.objects.filter(pk=later.pk).update(destination="Cais; Norte")
+        resp = self.client.get("/api/reports/trips/", {"format": "csv", "start_date": "2024-01-01"})
+        self.assertTrue(resp["Content-Type"].startswith("text/csv"))
+        self.assertIn('attachment; filename="viagens-', resp["Content-Disposition"])
+        lines = self._content(resp).decode("utf-8-sig").splitlines()
+        self.assertEqual(lines[0], "ID;Origem;Destino;Categoria;Status;Saída;Retorno;Passageiros;Veículo;Motorista")
+        self.assertEqual(len(lines), 3)
+        self.assertIn('"Cais; Norte";Passageiro;Planejada;11/01/2024 08:00', lines[1])
+        self.assertIn("Concluida;10/01/2024 08:00;10/01/2024 09:00;0;MAN1234;Driver Manaus", lines[2])
+
+    def test_fuel_report_streams_xlsx(self):
+        FuelLog.objects.create(
+            municipality=self.muni,
+            vehicle=self.vehicle,
+            driver=self.driver,
+            filled_at="2024-01-05",
+            liters="42.50",
+            fuel_station="Posto <Centro>",
+        )
+        resp = self.client.get("/api/reports/fuel/", {"format": "xlsx"})
+        with zipfile.ZipFile(BytesIO(self._content(resp))) as archive:
+            self.assertIsNone(archive.testzip())
+            sheet = archive.read("xl/worksheets/sheet1.xml").decode()
+        self.assertIn("<t>Litros</t>", sheet)
+        self.assertIn("<t>Posto &lt;Centro&gt;</t>", sheet)
+        self.assertIn("<v>42.50</v>", sheet)
+        self.assertIn("<t>05/01/2024</t>", sheet)
+
+    def test_export_errors_are_json(self):
+        resp = self.client.get("/api/reports/trips/", {"format": "csv", "start_date": "ontem"})
+        self.assertEqual(resp.status_code, 400)
+        self.assertEqual(resp["Content-Type"], "application/json")
+
+    def test_renderers_write_plain_responses_as_tables(self):
+        page = {"count": 2, "results": [{"id": 1, "liters": "4.50", "tags": ["a"]}, {"id": 2, "note": "x;y"}]}
+        lines = CSVRenderer().render(page).decode("utf-8-sig").splitlines()
+        self.assertEqual(lines, ["id;liters;tags;note", '1;4.50;"[""a""]";', '2;;;"x;y"'])
+        with zipfile.ZipFile(BytesIO(XLSXRenderer().render({"total": 3}))) as archive:
+            self.assertIn("<v>3</v>", archive.read("xl/worksheets/sheet1.xml").decode())
+
+
+class FuelEfficiencyTests(ReportTestMixin, TestCase):
+    def _fuel(self, vehicle, liters, filled_at="2024-01-15"):
+        return FuelLog.objects.create(
+            municipality=self.muni,
+            vehicle=vehicle,
+            driver=self.driver,
+            filled_at=filled_at,
+            liters=liters,
+            fuel_station="Posto",
+        )
+
+    def _report(self, **params):
+        resp = self.client.get("/api/reports/fuel_efficiency/", {"start_date": "2024-01-01", "end_date": "2024-01-31", **params})
+        self.assertEqual(resp.status_code, 200)
+        return resp.data
+
+    def test_ranks_vehicles_by_km_per_liter_and_flags_outliers(self):
+        january = datetime(2024, 1, 10, 12, 0, tzinfo=dt_timezone.utc)
+        economic, thirsty = self._make_vehicle("ECO0001"), self._make_vehicle("SED0002")
+        self._make_trip(january, km=300)
+        self._make_trip(january, km=200, vehicle=economic)
+        self._make_trip(january, km=100, vehicle=thirsty)
+        self._make_trip(january, vehicle=thirsty)  # planned: no distance
+        self._fuel(self.vehicle, "30.00")
+        self._fuel(economic, "20.00")
+        self._fuel(thirsty, "20.00")
+
+        rows = self._report()
+        self.assertEqual(
+            [(row["vehicle__license_plate"], row["km_per_liter"], row["rank"], row["outlier"]) for row in rows],
+            [("ECO0001", 10.0, 1, False), ("MAN1234", 10.0, 1, False), ("SED0002", 5.0, 3, True)],
+        )
+        self.assertEqual(rows[0]["fleet_average"], 8.33)
+
+        by_driver = self._report(group="driver")
+        self.assertEqual(len(by_driver), 1)
+        self.assertEqual((by_driver[0]["kilometers"], by_driver[0]["km_per_liter"]), (600, 8.57))
+
+        self.assertEqual(self._report(start_date="2024-02-01", end_date="2024-02-29"), [])
+        self.assertEqual(self.client.get("/api/reports/fuel_efficiency/", {"group": "fuel"}).status_code, 400)
+
+    def test_rollup_follows_fuel_and_trip_changes(self):
+        january = datetime(2024, 1, 10, 12, 0, tzinfo=dt_timezone.utc)
+        with self.captureOnCommitCallbacks(execute=True):
+            trip = self._make_trip(january, km=120)
+            log = self._fuel(self.vehicle, "10.00")
+            log.liters = "12.00"
+            log.save()
+        self.assertEqual(self._report()[0]["km_per_liter"], 10.0)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            trip.departure_datetime = datetime(2024, 2, 10, 12, 0, tzinfo=dt_timezone.utc)
+            trip.return_datetime_expected = trip.departure_datetime + timedelta(hours=1)
+            trip.save()
+        january_rows = self._report()
+        self.assertEqual((january_rows[0]["kilometers"], january_rows[0]["km_per_liter"]), (0, 0.0))
+        FuelLog.objects.get(pk=log.pk).delete()
+        call_command("rebuild_dashboard_rollups", "--verify", stdout=StringIO())
+
+
+class SeriesTests(ReportTestMixin, TestCase):
+    def _series(self, **params):
+        resp = self.client.get("/api/reports/series/", params)
+        self.assertEqual(resp.status_code, 200, resp.data)
+        return [(str(point["period"]), point["value"]) for point in resp.data["points"]]
+
+    def test_daily_buckets_use_local_time_and_fill_gaps(self):
+        # 02:30 UTC on the 11th is still the 10th in Manaus (UTC-4).
+        self._make_trip(datetime(2024, 1, 11, 2, 30, tzinfo=dt_timezone.utc))
+        self._make_trip(datetime(2024, 1, 12, 15, 0, tzinfo=dt_timezone.utc), km=80)
+        cancelled = self._make_trip(datetime(2024, 1, 12, 16, 0, tzinfo=dt_timezone.utc))
+        cancelled.status = Trip.Status.CANCELLED
+        cancelled.save()
+
+        trips = self._series(metric="trips", bucket="day", start_date="2024-01-10", end_date="2024-01-13")
+        self.assertEqual(trips, [("2024-01-10", 1), ("2024-01-11", 0), ("2024-01-12", 1), ("2024-01-13", 0)])
+        km = self._series(metric="km", bucket="week", start_date="2024-01-10", end_date="2024-01-20")
+        self.assertEqual(km, [("2024-01-08", 80), ("2024-01-15", 0)])
+
+    def test_monthly_buckets_are_served_from_rollups(self):
+        self._make_trip(datetime(2024, 1, 10, 12, 0, tzinfo=dt_timezone.utc), km=50)
+        self._make_trip(datetime(2024, 3, 10, 12, 0, tzinfo=dt_timezone.utc), km=70)
+        FuelLog.objects.create(
+            municipality=self.muni, vehicle=self.vehicle, driver=self.driver, filled_at="2024-03-02", liters="35.50", fuel_station="Posto"
+        )
+        params = {"bucket": "month", "start_date": "2024-01-15", "end_date": "2024-03-01"}
+        with self.assertNumQueries(2):
+            trips = self._series(metric="trips", **params)
+        self.assertEqual(trips, [("2024-01-01", 1), ("2024-02-01", 0), ("2024-03-01", 1)])
+        self.assertEqual(self._series(metric="km", **params), [("2024-01-01", 50), ("2024-02-01", 0), ("2024-03-01", 70)])
+        self.assertEqual(self._series(metric="liters", **params)[2][1], 35.5)
+        self.assertEqual(
+            self._series(metric="trips", vehicle_id=self.vehicle.pk, **params),
+            [("2024-01-01", 1), ("2024-02-01", 0), ("2024-03-01", 1)],
+        )
+
+    def test_rejects_unknown_metric_and_too_many_points(self):
+        self.assertEqual(self.client.get("/api/reports/series/", {"metric": "speed"}).status_code, 400)
+        resp = self.client.get("/api/reports/series/", {"bucket": "day", "start_date": "2020-01-01", "end_date": "2024-01-01"})
+        self.assertEqual(resp.status_code, 400)
+        self.assertEqual(len(self._series()), 30)
+
+
+class OdometerPlannerTests(ReportTestMixin, TestCase):
+    def test_plan_splits_whole_months_from_edges(self):
+        self.assertEqual(
+            plan_odometer_range(date(2024, 1, 20), date(2024, 3, 10)),
+            (((2024, 2), (2024, 2)), [(date(2024, 1, 20), date(2024, 1, 31)), (date(2024, 3, 1), date(2024, 3, 10))]),
+        )
+        self.assertEqual(plan_odometer_range(date(2024, 1, 1), date(2024, 12, 31)), (((2024, 1), (2024, 12)), []))
+        self.assertEqual(plan_odometer_range(None, None), ((None, None), []))
+        self.assertEqual(
+            plan_odometer_range(date(2024, 1, 5), date(2024, 1, 25)), (None, [(date(2024, 1, 5), date(2024, 1, 25))])
+        )
+
+    def test_report_merges_monthly_totals_with_edge_trips(self):
+        for day, km in ((10, 50), (45, 70), (64, 30), (79, 20)):
+            self._make_trip(datetime(2024, 1, 1, 12, 0, tzinfo=dt_timezone.utc) + timedelta(days=day - 1), km=km)
+        params = {"start_date": "2024-01-20", "end_date": "2024-03-10"}
+        self.assertEqual(self.client.get("/api/reports/odometer/", params).data[0]["kilometers"], 100)
+
+        # February is read from the summary row, not from its trips.
+        MonthlyOdometer.objects.filter(vehicle=self.vehicle, year=2024, month=2).update(kilometers=700)
+        cache.clear()
+        self.assertEqual(self.client.get("/api/reports/odometer/", params).data[0]["kilometers"], 730)
+        self.assertEqual(self.client.get("/api/reports/odometer/").data[0]["kilometers"], 800)
+        self.assertEqual(
+            self.client.get("/api/reports/odometer/", {**params, "driver_id": self.driver.pk}).data[0]["kilometers"], 100
+        )
+
+    def test_edge_trips_skip_negative_distances_like_the_monthly_rollup(self):
+        bad = self._make_trip(datetime(2024, 3, 4, 12, 0, tzinfo=dt_timezone.utc), km=1)
+        Trip.objects.filter(pk=bad.pk).update(odometer_end=F("odometer_start") - 40)
+        self._make_trip(datetime(2024, 3, 5, 12, 0, tzinfo=dt_timezone.utc), km=15)
+        resp = self.client.get("/api/reports/odometer/", {"start_date": "2024-01-01", "end_date": "2024-03-10"})
+        self.assertEqual(resp.data[0]["kilometers"], 15)
+
+
+class UtilizationTests(ReportTestMixin, TestCase):
+    def _trip(self, start, end, **extra):
+        # Manaus is UTC-4: local times given as UTC + 4h.
+        trip = self._make_trip(start + timedelta(hours=4), **extra)
+        trip.return_datetime_expected = end + timedelta(hours=4)
+        trip.save()
+        return trip
+
+    def _busy(self):
+        return dict(VehicleDayOccupancy.objects.values_list("day", "busy_slots"))
+
+    def test_refresh_merges_overlaps_and_clips_to_business_hours(self):
+        utc = dt_timezone.utc
+        early = self._trip(datetime(2024, 1, 10, 5, 0, tzinfo=utc), datetime(2024, 1, 10, 7, 10, tzinfo=utc))
+        self._trip(datetime(2024, 1, 10, 7, 0, tzinfo=utc), datetime(2024, 1, 10, 8, 0, tzinfo=utc))
+        self._trip(datetime(2024, 1, 10, 12, 0, tzinfo=utc), datetime(2024, 1, 10, 13, 0, tzinfo=utc), status=Trip.Status.CANCELLED)
+        self._trip(datetime(2024, 1, 10, 21, 0, tzinfo=utc), datetime(2024, 1, 11, 7, 0, tzinfo=utc))
+
+        call_command("refresh_vehicle_occupancy", stdout=StringIO())
+        # 06:00-07:15 and 07:00-08:00 merge into 8 slots; the overnight trip adds 21:00-22:00 and 06:00-07:00.
+        self.assertEqual(self._busy(), {date(2024, 1, 10): 12, date(2024, 1, 11): 4})
+        row = VehicleDayOccupancy.objects.get(day=date(2024, 1, 10))
+        self.assertEqual(int.from_bytes(bytes(row.slots), "little"), 0xFF | (0xF << 60))
+        self.assertFalse(OccupancyRefresh.objects.exists())
+
+        early.delete()
+        call_command("refresh_vehicle_occupancy", stdout=StringIO())
+        self.assertEqual(self._busy(), {date(2024, 1, 10): 8, date(2024, 1, 11): 4})
+
+        VehicleDayOccupancy.objects.all().delete()
+        call_command("refresh_vehicle_occupancy", since="2024-01-01", until="2024-01-31", stdout=StringIO())
+        self.assertEqual(self._busy(), {date(2024, 1, 10): 8, date(2024, 1, 11): 4})
+
+    def test_report_sums_used_and_available_hours(self):
+        utc = dt_timezone.utc
+        self._make_vehicle("MAN9999")
+        self._trip(datetime(2024, 1, 10, 8, 0, tzinfo=utc), datetime(2024, 1, 10, 12, 0, tzinfo=utc))
+        self._trip(datetime(2024, 2, 5, 8, 0, tzinfo=utc), datetime(2024, 2, 5, 10, 0, tzinfo=utc))
+        call_command("refresh_vehicle_occupancy", stdout=StringIO())
+
+        # Cache version, vehicle list and the two aggregates over day rows.
+        with self.assertNumQueries(4):
+            resp = self.client.get("/api/reports/utilization/", {"start_date": "2024-01-01", "end_date": "2024-02-29"})
+        self.assertEqual(resp.status_code, 200, resp.data)
+        january, february = resp.data["periods"]
+        self.assertEqual((january["used_hours"], january["available_hours"]), (4.0, 31 * 16 * 2))
+        self.assertEqual((february["used_hours"], february["available_hours"]), (2.0, 29 * 16 * 2))
+        vehicles = {row["license_plate"]: row for row in resp.data["vehicles"]}
+        self.assertEqual(vehicles["MAN1234"]["used_hours"], 6.0)
+        self.assertEqual(vehicles["MAN9999"]["utilization"], 0)
+
+        weeks = self.client.get(
+            "/api/reports/utilization/", {"bucket": "week", "start_date": "2024-01-08", "end_date": "2024-01-14"}
+        ).data["periods"]
+        self.assertEqual([(str(week["period"]), week["used_hours"]) for week in weeks], [("2024-01-08", 4.0)])
+        self.assertEqual(self.client.get("/api/reports/utilization/", {"bucket": "day"}).status_code, 400)
@@ -0,0 +1,314 @@
+from datetime import date, datetime, time, timedelta
+from io import StringIO
+from unittest import mock
+
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from accounts.models import User
+from drivers.models import Driver
+from fleet.models import Vehicle
+from reports.models import TripMonthRollup
+from tenants.models import Municipality
+from trips.models import MonthlyOdometer, Trip, TripEvent, TripPassenger, TripRecurrence
+from trips.recurrence import occurrence_dates
+from trips.scheduling import vehicle_conflicts
+from trips.signals import trips_bulk_created
+
+
+class ScheduleTestMixin:
+    def setUp(self):
+        self.client = APIClient()
+        self.muni = Municipality.objects.create(
+            name="Pref Agenda",
+            cnpj="44.444.444/0001-44",
+            address="Rua 4",
+            city="Cidade",
+            state="SP",
+            phone="11555550000",
+        )
+        self.admin = User.objects.create_user(
+            email="admin@agenda.com", password="pass123", role=User.Roles.ADMIN_MUNICIPALITY, municipality=self.muni
+        )
+        self.vehicle = self._make_vehicle("AGD1234")
+        self.driver = self._make_driver("Driver Agenda", "444.444.444-44")
+        self.client.force_authenticate(self.admin)
+        self.base = timezone.now().replace(microsecond=0) + timedelta(days=1)
+
+    def _make_vehicle(self, license_plate, **extra):
+        defaults = {
+            "model": "Van",
+            "brand": "Ford",
+            "year": 2020,
+            "max_passengers": 10,
+            "odometer_current": 1000,
+            "odometer_initial": 1000,
+        }
+        defaults.update(extra)
+        return Vehicle.objects.create(municipality=self.muni, license_plate=license_plate, **defaults)
+
+    def _make_driver(self, name, cpf):
+        return Driver.objects.create(
+            municipality=self.muni,
+            name=name,
+            cpf=cpf,
+            cnh_number="44444",
+            cnh_category="D",
+            cnh_expiration_date="2030-01-01",
+            phone="11666660000",
+        )
+
+    def _make_trip(self, start_offset_hours, duration_hours=2, vehicle=None, driver=None, **extra):
+        departure = self.base + timedelta(hours=start_offset_hours)
+        return Trip.objects.create(
+            municipality=self.muni,
+            vehicle=vehicle or self.vehicle,
+            driver=driver or self.driver,
+            origin="A",
+            destination="B",
+            departure_datetime=departure,
+            return_datetime_expected=departure + timedelta(hours=duration_hours),
+            odometer_start=1000,
+            **extra,
+        )
+
+    def _payload(self, start_offset_hours, duration_hours=2, vehicle=None, driver=None, **extra):
+        departure = self.base + timedelta(hours=start_offset_hours)
+        payload = {
+            "vehicle": (vehicle or self.vehicle).id,
+            "driver": (driver or self.driver).id,
+            "origin": "C",
+            "destination": "D",
+            "departure_datetime": departure.isoformat(),
+            "return_datetime_expected": (departure + timedelta(hours=duration_hours)).isoformat(),
+            "odometer_start": 1000,
+            "passengers_count": 1,
+        }
+        payload.update(extra)
+        return payload
+
+
+class VehicleScheduleTests(ScheduleTestMixin, TestCase):
+    def test_conflict_query_uses_half_open_intervals(self):
+        trip = self._make_trip(0)
+        end = trip.return_datetime_expected
+        self.assertFalse(vehicle_conflicts(self.vehicle.id, end, end + timedelta(hours=1)).exists())
+        self.assertTrue(vehicle_conflicts(self.vehicle.id, end - timedelta(minutes=1), end).exists())
+        self.assertFalse(vehicle_conflicts(self.vehicle.id, self.base, end, exclude_trip_id=trip.id).exists())
+
+    def test_cancelled_and_completed_trips_do_not_block(self):
+        self._make_trip(0, status=Trip.Status.CANCELLED)
+        resp = self.client.post("/api/trips/", self._payload(1), format="json")
+        self.assertEqual(resp.status_code, 201, resp.data)
+
+    def test_update_does_not_conflict_with_itself_but_detects_others(self):
+        first = self.client.post("/api/trips/", self._payload(0), format="json")
+        second = self.client.post("/api/trips/", self._payload(2), format="json")
+        self.assertEqual(first.status_code, 201, first.data)
+        self.assertEqual(second.status_code, 201, second.data)
+
+        resp = self.client.patch(f"/api/trips/{first.data['id']}/", {"origin": "Nova origem"}, format="json")
+        self.assertEqual(resp.status_code, 200, resp.data)
+
+        moved = self.base + timedelta(hours=3)
+        resp = self.client.patch(
+            f"/api/trips/{first.data['id']}/",
+            {"departure_datetime": moved.isoformat(), "return_datetime_expected": (moved + timedelta(hours=1)).isoformat()},
+            format="json",
+        )
+        self.assertEqual(resp.status_code, 400)
+        self.assertIn("non_field_errors", resp.data)
+
+
+    def test_available_vehicles_are_free_big_enough_and_best_fit_first(self):
+        busy = self.vehicle
+        small = self._make_vehicle("AGD0004", max_passengers=4)
+        large = self._make_vehicle("AGD0020", max_passengers=20)
+        worn = self._make_vehicle("AGD0011", max_passengers=10)
+        fresh = self._make_vehicle("AGD0012", max_passengers=10)
+        self._make_vehicle("AGD0013", max_passengers=10, status=Vehicle.Status.MAINTENANCE)
+        self._make_trip(0, vehicle=busy)
+        self._make_trip(0, vehicle=fresh, status=Trip.Status.CANCELLED)
+        today = timezone.localdate()
+        MonthlyOdometer.objects.create(vehicle=worn, year=today.year, month=today.month, kilometers=500)
+
+        window = {"start": (self.base + timedelta(hours=1)).isoformat(), "end": (self.base + timedelta(hours=3)).isoformat()}
+        with self.assertNumQueries(1):
+            resp = self.client.get("/api/vehicles/available/", {**window, "passengers": 6})
+        self.assertEqual(resp.status_code, 200, resp.data)
+        self.assertEqual([v["id"] for v in resp.data["available"]], [fresh.id, worn.id, large.id])
+        self.assertEqual(resp.data["available"][1]["month_km"], 500)
+
+        resp = self.client.get("/api/vehicles/available/", window)
+        self.assertEqual(resp.data["available"][0]["id"], small.id)
+        self.assertEqual(self.client.get("/api/vehicles/available/", {**window, "passengers": "x"}).status_code, 400)
+
+class DriverScheduleTests(ScheduleTestMixin, TestCase):
+    def test_driver_cannot_be_double_booked_across_vehicles(self):
+        self._make_trip(0)
+        other_vehicle = self._make_vehicle("AGD5678")
+        resp = self.client.post("/api/trips/", self._payload(1, vehicle=other_vehicle), format="json")
+        self.assertEqual(resp.status_code, 400)
+        self.assertIn("motorista", str(resp.data))
+
+    def test_availability_lists_only_free_active_drivers(self):
+        busy = self.driver
+        free = self._make_driver("Driver Livre", "555.555.555-55")
+        inactive = self._make_driver("Driver Inativo", "666.666.666-66")
+        inactive.status = Driver.Status.INACTIVE
+        inactive.save()
+        self._make_trip(0, driver=busy)
+
+        window = {"start": (self.base + timedelta(hours=1)).isoformat(), "end": (self.base + timedelta(hours=3)).isoformat()}
+        resp = self.client.get("/api/drivers/availability/", window)
+        self.assertEqual(resp.status_code, 200, resp.data)
+        self.assertEqual([d["id"] for d in resp.data["available"]], [free.id])
+
+        resp = self.client.get("/api/drivers/availability/", {"start": "amanhã"})
+        self.assertEqual(resp.status_code, 400)
+
+
+    def test_cnh_expiry_uses_the_municipality_local_date(self):
+        self.muni.timezone = "America/Manaus"
+        self.muni.save()
+        self.driver.cnh_expiration_date = date(2030, 1, 1)
+        self.driver.save()
+        # 03:30 UTC on January 2nd is still January 1st in Manaus (UTC-4), but not in São Paulo.
+        window = {"start": "2030-01-02T02:00:00Z", "end": "2030-01-02T03:30:00Z"}
+        resp = self.client.get("/api/drivers/availability/", window)
+        self.assertEqual(resp.status_code, 200, resp.data)
+        self.assertEqual([d["id"] for d in resp.data["available"]], [self.driver.id])
+
+
+class BulkTripCreationTests(ScheduleTestMixin, TestCase):
+    def test_bulk_creates_batch_with_constant_queries(self):
+        # Keep the whole batch in one month so the dashboard rollup touches a single key.
+        self.base = (self.base + timedelta(days=40)).replace(day=10, hour=8, minute=0, second=0)
+        other_vehicle = self._make_vehicle("AGD9999")
+        other_driver = self._make_driver("Driver Dois", "777.777.777-77")
+
+        def batch(day_offset, vehicle_trips):
+            small = [self._payload(24 * day_offset + hours) for hours in (0, 2, 4)]
+            others = [
+                self._payload(24 * day_offset + hours, vehicle=other_vehicle, driver=other_driver)
+                for hours in range(0, 3 * vehicle_trips, 3)
+            ]
+            return small + others
+
+        def post(trips):
+            with CaptureQueriesContext(connection) as queries:
+                resp = self.client.post("/api/trips/bulk/", {"trips": trips}, format="json")
+            self.assertEqual(resp.status_code, 201, resp.data)
+            self.assertEqual(resp.data["created"], len(trips))
+            return len(queries)
+
+        many = batch(0, 8)
+        # The batch's own round-trips (locks, conflict checks, insert), without the listeners.
+        with mock.patch.object(trips_bulk_created, "receivers", []), self.assertNumQueries(8):
+            resp = self.client.post("/api/trips/bulk/", {"trips": many}, format="json")
+        self.assertEqual(resp.status_code, 201, resp.data)
+        self.assertEqual(Trip.objects.filter(municipality=self.muni).count(), len(many))
+
+        # With the listeners (rollups, indexes, events) the cost still does not grow with the batch;
+        # the first call creates the rollup rows the later ones update.
+        post(batch(1, 1))
+        self.assertEqual(post(batch(2, 1)), post(batch(3, 8)))
+
+    def test_bulk_rejects_whole_batch_on_conflict(self):
+        existing = self._make_trip(10)
+        batch = [self._payload(0), self._payload(1), self._payload(6), self._payload(11)]
+        resp = self.client.post("/api/trips/bulk/", {"trips": batch}, format="json")
+        self.assertEqual(resp.status_code, 400)
+        self.assertIn("item 1 do lote", str(resp.data[1]))
+        self.assertEqual(resp.data[2], {})
+        self.assertIn(f"viagem #{existing.id}", str(resp.data[3]))
+        self.assertEqual(Trip.objects.count(), 1)
+
+    def test_bulk_accepts_only_planned_trips(self):
+        resp = self.client.post(
+            "/api/trips/bulk/", {"trips": [self._payload(0, status=Trip.Status.COMPLETED)]}, format="json"
+        )
+        self.assertEqual(resp.status_code, 400)
+
+
+class TripRecurrenceTests(ScheduleTestMixin, TestCase):
+    def _create_recurrence(self, **extra):
+        payload = {
+            "vehicle": self.vehicle.id,
+            "driver": self.driver.id,
+            "origin": "Bairro",
+            "destination": "Hospital",
+            "weekdays": [0, 2],
+            "departure_time": "07:00",
+            "return_time": "11:00",
+            "start_date": timezone.localdate().isoformat(),
+        }
+        payload.update(extra)
+        return self.client.post("/api/trips/recurrences/", payload, format="json")
+
+    def test_occurrence_dates_respect_weekdays_and_interval(self):
+        rule = TripRecurrence(weekdays=[0, 4], interval_weeks=2, start_date=date(2024, 1, 1))
+        dates = list(occurrence_dates(rule, date(2024, 1, 1), date(2024, 1, 31)))
+        self.assertEqual(dates, [date(2024, 1, 1), date(2024, 1, 5), date(2024, 1, 15), date(2024, 1, 19), date(2024, 1, 29)])
+
+    def test_create_materializes_rolling_horizon_once(self):
+        resp = self._create_recurrence()
+        self.assertEqual(resp.status_code, 201, resp.data)
+        trips = Trip.objects.filter(recurrence_id=resp.data["id"])
+        self.assertTrue(trips.exists())
+        self.assertTrue(all(timezone.localtime(t.departure_datetime).weekday() in (0, 2) for t in trips))
+        count = trips.count()
+        call_command("materialize_recurring_trips", stdout=StringIO())
+        self.assertEqual(trips.count(), count)
+
+    def test_conflicting_occurrences_are_skipped(self):
+        today = timezone.localdate()
+        next_monday = today + timedelta(days=(7 - today.weekday()) % 7 or 7)
+        departure = timezone.make_aware(datetime.combine(next_monday, time(8, 0)))
+        blocker = Trip.objects.create(
+            municipality=self.muni,
+            vehicle=self.vehicle,
+            driver=self.driver,
+            origin="X",
+            destination="Y",
+            departure_datetime=departure,
+            return_datetime_expected=departure + timedelta(hours=1),
+            odometer_start=1000,
+        )
+        resp = self._create_recurrence(weekdays=[0])
+        self.assertEqual(resp.status_code, 201, resp.data)
+        occurrences = Trip.objects.filter(recurrence_id=resp.data["id"])
+        self.assertFalse(occurrences.filter(departure_datetime__date=blocker.departure_datetime.date()).exists())
+        self.assertTrue(occurrences.exists())
+
+    def test_edit_keeps_existing_occurrences_without_announcing_them_again(self):
+        resp = self._create_recurrence(
+            weekdays=list(range(7)), passengers_details=[{"name": "Ana", "cpf": "11122233344"}], passengers_count=1
+        )
+        self.assertEqual(resp.status_code, 201, resp.data)
+        recurrence = TripRecurrence.objects.get(pk=resp.data["id"])
+        today = recurrence.trips.get(departure_datetime__date=timezone.localdate())
+        today.status = Trip.Status.CANCELLED
+        today.save()
+
+        def counts():
+            return (
+                TripPassenger.objects.filter(trip=today).count(),
+                TripEvent.objects.filter(trip_id=today.id, kind=TripEvent.Kind.CREATED).count(),
+                list(TripMonthRollup.objects.order_by("year", "month", "status").values_list("status", "total")),
+            )
+
+        before = counts()
+        resp = self.client.patch(f"/api/trips/recurrences/{recurrence.id}/", {"notes": "Nova"}, format="json")
+        self.assertEqual(resp.status_code, 200, resp.data)
+        self.assertEqual(counts(), before)
+        self.assertEqual(recurrence.trips.filter(departure_datetime=today.departure_datetime).count(), 1)
+
+        TripRecurrence.objects.filter(pk=recurrence.pk).update(materialized_until=None)
+        resp = self.client.post(f"/api/trips/recurrences/{recurrence.id}/materialize/", {}, format="json")
+        self.assertEqual(resp.data["created"], 0)
+        self.assertEqual(counts(), before)
@@ -0,0 +1,145 @@
+from datetime import timedelta
+from importlib import import_module
+from io import StringIO
+
+from django.apps import apps
+from django.core.management import call_command
+from django.test import TestCase
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from accounts.models import User
+from drivers.models import Driver
+from fleet.models import Vehicle
+from search.backends import index_objects
+from search.models import SearchDocument
+from tenants.models import Municipality
+from trips.models import Trip
+
+
+class SearchTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.muni = Municipality.objects.create(
+            name="Pref Busca",
+            cnpj="77.777.777/0001-77",
+            address="Rua 7",
+            city="Cidade",
+            state="SP",
+            phone="11444440000",
+        )
+        self.other_muni = Municipality.objects.create(
+            name="Pref Outra",
+            cnpj="88.888.888/0001-88",
+            address="Rua 8",
+            city="Outra",
+            state="SP",
+            phone="11333330000",
+        )
+        self.admin = User.objects.create_user(
+            email="admin@busca.com", password="pass123", role=User.Roles.ADMIN_MUNICIPALITY, municipality=self.muni
+        )
+        self.vehicle = self._make_vehicle("ABC-1D23")
+        self.driver = self._make_driver("João Conceição", "123.456.789-00")
+        self.client.force_authenticate(self.admin)
+
+    def _make_vehicle(self, license_plate, municipality=None):
+        return Vehicle.objects.create(
+            municipality=municipality or self.muni,
+            license_plate=license_plate,
+            model="Van",
+            brand="Ford",
+            year=2020,
+            max_passengers=10,
+        )
+
+    def _make_driver(self, name, cpf, municipality=None):
+        return Driver.objects.create(
+            municipality=municipality or self.muni,
+            name=name,
+            cpf=cpf,
+            cnh_number="77777",
+            cnh_category="D",
+            cnh_expiration_date="2030-01-01",
+            phone="11222220000",
+        )
+
+    def _make_trip(self, destination, driver=None, hours=0):
+        departure = timezone.now() + timedelta(days=1, hours=hours)
+        return Trip.objects.create(
+            municipality=self.muni,
+            vehicle=self.vehicle,
+            driver=driver or self.driver,
+            origin="Centro",
+            destination=destination,
+            departure_datetime=departure,
+            return_datetime_expected=departure + timedelta(hours=1),
+            odometer_start=0,
+        )
+
+    def _ids(self, url, term):
+        resp = self.client.get(url, {"search": term})
+        self.assertEqual(resp.status_code, 200, resp.data)
+        return [row["id"] for row in resp.data["results"]]
+
+    def test_accent_insensitive_search_is_scoped_to_municipality(self):
+        self._make_driver("Joao Conceicao", "999.999.999-99", municipality=self.other_muni)
+        self.assertEqual(self._ids("/api/drivers/", "conceicao"), [self.driver.id])
+        self.assertEqual(self._ids("/api/drivers/", "JOÃO concei"), [self.driver.id])
+
+    def test_plate_and_cpf_match_without_punctuation(self):
+        self.assertEqual(self._ids("/api/vehicles/", "abc1d23"), [self.vehicle.id])
+        self.assertEqual(self._ids("/api/drivers/", "12345678900"), [self.driver.id])
+
+    def test_trip_documents_follow_driver_rename(self):
+        trip = self._make_trip("Hospital Regional")
+        self.assertEqual(self._ids("/api/trips/", "hospital joao"), [trip.id])
+        self.driver.name = "Maria Aparecida"
+        self.driver.save()
+        self.assertEqual(self._ids("/api/trips/", "aparecida"), [trip.id])
+        self.assertEqual(self._ids("/api/trips/", "joao"), [])
+
+    def test_short_terms_fall_back_to_icontains(self):
+        trip = self._make_trip("UB")
+        self.assertEqual(self._ids("/api/trips/", "ub"), [trip.id])
+
+    def test_rebuild_command_restores_missing_documents(self):
+        trip = self._make_trip("Posto de Saúde")
+        SearchDocument.objects.all().delete()
+        call_command("rebuild_search_index", stdout=StringIO())
+        self.assertEqual(self._ids("/api/trips/", "saude"), [trip.id])
+        self.assertEqual(SearchDocument.objects.filter(model="trips.Trip").count(), 1)
+
+    def test_migration_indexes_rows_written_before_the_index(self):
+        trip = self._make_trip("Posto de Saúde")
+        SearchDocument.objects.all().delete()
+        self.assertEqual(self._ids("/api/trips/", "saude"), [])
+        import_module("search.migrations.0002_backfill_documents").backfill_documents(apps, None)
+        self.assertEqual(self._ids("/api/trips/", "saude"), [trip.id])
+        self.assertEqual(self._ids("/api/drivers/", "conceicao"), [self.driver.id])
+        self.assertEqual(SearchDocument.objects.count(), 3)
+
+    def test_filters_and_count_apply_to_every_match(self):
+        cancelled = self._make_trip("Hospital Regional", hours=-3)
+        cancelled.status = Trip.Status.CANCELLED
+        cancelled.save()
+        departure = timezone.now() + timedelta(days=1)
+        Trip.objects.bulk_create(
+            Trip(
+                municipality=self.muni,
+                vehicle=self.vehicle,
+                driver=self.driver,
+                origin="Centro",
+                destination="Hospital Regional",
+                departure_datetime=departure + timedelta(hours=3 * offset),
+                return_datetime_expected=departure + timedelta(hours=3 * offset + 1),
+                odometer_start=0,
+            )
+            for offset in range(1, 601)
+        )
+        index_objects(Trip, Trip.objects.values_list("pk", flat=True))
+
+        resp = self.client.get("/api/trips/", {"search": "hospital", "status": Trip.Status.CANCELLED})
+        self.assertEqual(resp.status_code, 200, resp.data)
+        self.assertEqual([row["id"] for row in resp.data["results"]], [cancelled.id])
+        self.assertEqual(self.client.get("/api/trips/", {"search": "hospital"}).data["count"], 601)
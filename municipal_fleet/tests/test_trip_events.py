@@ -0,0 +1,74 @@
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+
+from tests.test_scheduling import ScheduleTestMixin
+from trips.events import consume_events
+from trips.models import EventCursor, Trip, TripEvent
+
+HANDLED = []
+
+
+def remember_events(events):
+    HANDLED.extend(event.id for event in events)
+
+
+@override_settings(TRIP_EVENT_SETTLE_SECONDS=0)
+class TripStateMachineTests(ScheduleTestMixin, TestCase):
+    def _patch(self, trip_id, **data):
+        return self.client.patch(f"/api/trips/{trip_id}/", data, format="json")
+
+    def test_transitions_are_enforced_and_logged(self):
+        trip_id = self.client.post("/api/trips/", self._payload(0), format="json").data["id"]
+        self.assertEqual(self._patch(trip_id, status=Trip.Status.IN_PROGRESS).status_code, 200)
+        resp = self._patch(trip_id, status=Trip.Status.COMPLETED, odometer_end=1100)
+        self.assertEqual(resp.status_code, 200, resp.data)
+
+        resp = self._patch(trip_id, status=Trip.Status.PLANNED)
+        self.assertEqual(resp.status_code, 400)
+        self.assertIn("status", resp.data)
+        self.assertEqual(self._patch(trip_id, notes="ok").status_code, 200)
+
+        self.assertEqual(self.client.delete(f"/api/trips/{trip_id}/").status_code, 204)
+        log = list(TripEvent.objects.filter(trip_id=trip_id).values_list("kind", "from_status", "to_status"))
+        self.assertEqual(
+            log,
+            [
+                (TripEvent.Kind.CREATED, "", Trip.Status.PLANNED),
+                (TripEvent.Kind.STATUS_CHANGED, Trip.Status.PLANNED, Trip.Status.IN_PROGRESS),
+                (TripEvent.Kind.STATUS_CHANGED, Trip.Status.IN_PROGRESS, Trip.Status.COMPLETED),
+                (TripEvent.Kind.DELETED, Trip.Status.COMPLETED, ""),
+            ],
+        )
+
+    def test_bulk_creation_is_logged(self):
+        resp = self.client.post("/api/trips/bulk/", {"trips": [self._payload(0), self._payload(3)]}, format="json")
+        self.assertEqual(resp.status_code, 201, resp.data)
+        self.assertEqual(TripEvent.objects.filter(kind=TripEvent.Kind.CREATED).count(), 2)
+
+    def test_consumers_resume_from_their_cursor(self):
+        for hours in (0, 3):
+            self.client.post("/api/trips/", self._payload(hours), format="json")
+        HANDLED.clear()
+        self.assertEqual(consume_events("test", remember_events, batch_size=1), 1)
+        self.assertEqual(consume_events("test", remember_events, batch_size=1), 1)
+        self.assertEqual(consume_events("test", remember_events, batch_size=1), 0)
+        self.assertEqual(HANDLED, list(TripEvent.objects.values_list("id", flat=True)))
+        self.assertEqual(EventCursor.objects.get(consumer="test").last_event_id, HANDLED[-1])
+
+        self.client.post("/api/trips/", self._payload(6), format="json")
+        with self.settings(TRIP_EVENT_CONSUMERS={"test": "tests.test_trip_events.remember_events"}):
+            out = StringIO()
+            call_command("process_trip_events", stdout=out)
+        self.assertIn("test: 1 eventos processados", out.getvalue())
+
+    def test_events_endpoint_pages_by_id(self):
+        for hours in (0, 3, 6):
+            self.client.post("/api/trips/", self._payload(hours), format="json")
+        first = self.client.get("/api/trips/events/", {"page_size": 2})
+        self.assertEqual(first.status_code, 200)
+        self.assertEqual(len(first.data["results"]), 2)
+        rest = self.client.get("/api/trips/events/", {"after": first.data["last_id"]})
+        self.assertEqual(len(rest.data["results"]), 1)
+        self.assertEqual(self.client.get("/api/trips/events/", {"after": "x"}).status_code, 400)
@@ -0,0 +1,40 @@
+from django.test import TestCase
+from django.utils import timezone
+
+from tests.test_scheduling import ScheduleTestMixin
+
+
+class WhatsappBatchTests(ScheduleTestMixin, TestCase):
+    def _sheet(self):
+        day = timezone.localtime(self.base).date().isoformat()
+        resp = self.client.get("/api/trips/whatsapp_batch/", {"date": day})
+        self.assertEqual(resp.status_code, 200, resp.data)
+        return resp.data["drivers"]
+
+    def test_one_message_per_driver_listing_their_trips(self):
+        self.base = self.base.replace(hour=8, minute=0, second=0)
+        other = self._make_driver("Driver Outro", "888.888.888-88")
+        other_vehicle = self._make_vehicle("OUT1234")
+        first = self._make_trip(0)
+        second = self._make_trip(3)
+        third = self._make_trip(1, vehicle=other_vehicle, driver=other)
+
+        with self.assertNumQueries(2):
+            sheets = self._sheet()
+        self.assertEqual([sheet["trip_ids"] for sheet in sheets], [[first.id, second.id], [third.id]])
+        self.assertIn("1) Data:", sheets[0]["message"])
+        self.assertIn("2) Data:", sheets[0]["message"])
+        self.assertTrue(sheets[0]["wa_link"].startswith("https://wa.me/11666660000?text="))
+
+    def test_cached_sheet_is_refreshed_when_a_trip_changes(self):
+        trip = self._make_trip(0)
+        self._sheet()
+        with self.assertNumQueries(1):
+            self._sheet()
+        trip.destination = "Hospital Novo"
+        trip.save()
+        self.assertIn("Hospital Novo", self._sheet()[0]["message"])
+
+    def test_invalid_date_is_rejected(self):
+        resp = self.client.get("/api/trips/whatsapp_batch/", {"date": "ontem"})
+        self.assertEqual(resp.status_code, 400)
@@ -1,5 +1,6 @@
 from django.contrib import admin
-from trips.models import Trip, MonthlyOdometer
+
+from trips.models import MonthlyOdometer, Trip, TripRecurrence
 
 
 @admin.register(Trip)
@@ -13,3 +14,10 @@ class TripAdmin(admin.ModelAdmin):
 class MonthlyOdometerAdmin(admin.ModelAdmin):
     list_display = ("vehicle", "month", "year", "kilometers")
     list_filter = ("year", "month")
+
+
+@admin.register(TripRecurrence)
+class TripRecurrenceAdmin(admin.ModelAdmin):
+    list_display = ("origin", "destination", "departure_time", "vehicle", "driver", "is_active", "materialized_until")
+    search_fields = ("origin", "destination", "vehicle__license_plate", "driver__name")
+    list_filter = ("is_active", "municipality")
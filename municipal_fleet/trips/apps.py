@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class TripsConfig(AppConfig):
     name = "trips"
     default_auto_field = "django.db.models.BigAutoField"
+
+    def ready(self):
+        from trips import events, passengers  # noqa: F401
@@ -0,0 +1,74 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.dispatch import receiver
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from trips.models import EventCursor, TripEvent
+from trips.signals import trips_bulk_created
+
+
+def _event(trip, kind, from_status="", to_status=""):
+    return TripEvent(
+        trip_id=trip.pk,
+        municipality_id=trip.municipality_id,
+        kind=kind,
+        from_status=from_status,
+        to_status=to_status,
+        departure_datetime=trip.departure_datetime,
+    )
+
+
+def record_created(trips):
+    TripEvent.objects.bulk_create([_event(trip, TripEvent.Kind.CREATED, to_status=trip.status) for trip in trips])
+
+
+def record_status_change(trip, previous_status):
+    if trip.status != previous_status:
+        _event(trip, TripEvent.Kind.STATUS_CHANGED, previous_status, trip.status).save()
+
+
+def record_deleted(trips):
+    TripEvent.objects.bulk_create([_event(trip, TripEvent.Kind.DELETED, from_status=trip.status) for trip in trips])
+
+
+@receiver(trips_bulk_created)
+def record_bulk_created(sender, trips, **kwargs):
+    record_created(trips)
+
+
+def settled_events():
+    """
+    Events old enough to be read by id.
+
+    Ids are assigned at INSERT but become visible at COMMIT, so a slow transaction can publish a
+    lower id after a higher one was read. Holding back the last few seconds keeps a cursor from
+    jumping over it.
+    """
+    return TripEvent.objects.filter(created_at__lte=timezone.now() - timedelta(seconds=settings.TRIP_EVENT_SETTLE_SECONDS))
+
+
+def consume_events(consumer, handler, batch_size=500):
+    """
+    Feed the next batch of events after the consumer's cursor to `handler(events)`.
+
+    The handler and the cursor move run in one transaction, so a failing handler leaves the
+    batch to be retried. Returns the number of events processed.
+    """
+    with transaction.atomic():
+        cursor, _ = EventCursor.objects.get_or_create(consumer=consumer)
+        cursor = EventCursor.objects.select_for_update().get(pk=cursor.pk)
+        events = list(settled_events().filter(id__gt=cursor.last_event_id).order_by("id")[:batch_size])
+        if not events:
+            return 0
+        handler(events)
+        cursor.last_event_id = events[-1].id
+        cursor.save(update_fields=["last_event_id", "updated_at"])
+    return len(events)
+
+
+def registered_consumers():
+    """Consumers configured in settings.TRIP_EVENT_CONSUMERS ({name: dotted path to handler})."""
+    return {name: import_string(path) for name, path in settings.TRIP_EVENT_CONSUMERS.items()}
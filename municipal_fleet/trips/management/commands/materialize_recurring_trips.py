@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand
+
+from trips.models import TripRecurrence
+from trips.recurrence import horizon_date, materialize
+
+
+class Command(BaseCommand):
+    help = "Gera as viagens das recorrências ativas até o horizonte configurado (TRIP_RECURRENCE_HORIZON_DAYS)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--days", type=int, help="Horizonte em dias a partir de hoje.")
+        parser.add_argument("--municipality", type=int, help="Restringe a uma prefeitura (id).")
+
+    def handle(self, *args, **options):
+        until = horizon_date(options["days"])
+        qs = TripRecurrence.objects.filter(is_active=True).select_related("vehicle", "driver", "municipality")
+        if options["municipality"]:
+            qs = qs.filter(municipality_id=options["municipality"])
+
+        created_total = 0
+        for recurrence in qs.iterator():
+            created, skipped = materialize(recurrence, until)
+            created_total += created
+            for day, message in skipped:
+                self.stdout.write(self.style.WARNING(f"{recurrence} em {day:%d/%m/%Y}: {message}"))
+
+        self.stdout.write(self.style.SUCCESS(f"Viagens geradas até {until:%d/%m/%Y}: {created_total}"))
@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from trips.events import consume_events, registered_consumers
+
+
+class Command(BaseCommand):
+    help = "Entrega os eventos de viagem pendentes aos consumidores configurados (TRIP_EVENT_CONSUMERS)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--consumer", help="Processa apenas este consumidor.")
+        parser.add_argument("--batch-size", type=int, default=500, help="Eventos por transação.")
+
+    def handle(self, *args, **options):
+        consumers = registered_consumers()
+        if options["consumer"]:
+            if options["consumer"] not in consumers:
+                raise CommandError(f"Consumidor desconhecido: {options['consumer']}")
+            consumers = {options["consumer"]: consumers[options["consumer"]]}
+
+        for name, handler in consumers.items():
+            total = 0
+            while processed := consume_events(name, handler, options["batch_size"]):
+                total += processed
+            self.stdout.write(self.style.SUCCESS(f"{name}: {total} eventos processados"))
@@ -1,32 +1,52 @@
-from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
 
-from django.core.management.base import BaseCommand
-from django.db.models import F, ExpressionWrapper, IntegerField
-from django.utils import timezone
+import django
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.utils.dateparse import parse_date
 
-from trips.models import Trip, MonthlyOdometer
+from reports.cache import bump_data_version
+from tenants.models import Municipality
+from trips.odometer import rebuild_monthly_odometer
+
+
+def rebuild_municipality(municipality_id, since, incremental):
+    updated = rebuild_monthly_odometer(Municipality.objects.get(pk=municipality_id), since, incremental)
+    if updated:
+        bump_data_version(municipality_id)
+    return updated
 
 
 class Command(BaseCommand):
-    help = "Recalcula resumos de odômetro mensal a partir das viagens concluídas."
+    help = "Recalcula o razão de distâncias e os resumos de odômetro mensal a partir das viagens concluídas."
+
+    def add_arguments(self, parser):
+        scope = parser.add_mutually_exclusive_group()
+        scope.add_argument("--since", help="Recalcula apenas os meses a partir desta data (AAAA-MM-DD).")
+        scope.add_argument(
+            "--incremental", action="store_true", help="Recalcula só o que mudou desde a última execução por prefeitura."
+        )
+        parser.add_argument("--municipality", type=int, help="Restringe a uma prefeitura (id).")
+        parser.add_argument("--workers", type=int, default=1, help="Processos paralelos (uma prefeitura por vez em cada).")
 
     def handle(self, *args, **options):
-        qs = Trip.objects.filter(status=Trip.Status.COMPLETED, odometer_end__isnull=False)
-        distance_expr = ExpressionWrapper(F("odometer_end") - F("odometer_start"), output_field=IntegerField())
-        totals = defaultdict(int)
-
-        for trip in qs.annotate(distance=distance_expr):
-            if trip.distance is None or trip.distance < 0:
-                continue
-            dt = timezone.localtime(trip.departure_datetime)
-            key = (trip.vehicle_id, dt.year, dt.month)
-            totals[key] += trip.distance
-
-        updated = 0
-        for (vehicle_id, year, month), km in totals.items():
-            MonthlyOdometer.objects.update_or_create(
-                vehicle_id=vehicle_id, year=year, month=month, defaults={"kilometers": km}
-            )
-            updated += 1
+        since = None
+        if options["since"]:
+            since = parse_date(options["since"])
+            if since is None:
+                raise CommandError("Data inválida. Use o formato AAAA-MM-DD.")
+        municipalities = Municipality.objects.order_by("id").values_list("id", flat=True)
+        if options["municipality"]:
+            municipalities = municipalities.filter(id=options["municipality"])
+        municipality_ids = list(municipalities)
+        jobs = [(pk, since, options["incremental"]) for pk in municipality_ids]
+
+        if options["workers"] > 1 and len(jobs) > 1:
+            # Child processes must open their own connections instead of sharing the parent's socket.
+            connections.close_all()
+            with ProcessPoolExecutor(max_workers=options["workers"], initializer=django.setup) as pool:
+                updated = sum(pool.map(rebuild_municipality, *zip(*jobs)))
+        else:
+            updated = sum(rebuild_municipality(*job) for job in jobs)
 
         self.stdout.write(self.style.SUCCESS(f"Resumos processados: {updated}"))
@@ -0,0 +1,35 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from trips.models import Trip
+from trips.passengers import sync_passengers
+
+CHUNK_SIZE = 2000
+
+
+class Command(BaseCommand):
+    help = "Reconstrói o índice de passageiros por CPF a partir de Trip.passengers_details."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--municipality", type=int, help="Restringe a uma prefeitura (id).")
+
+    def handle(self, *args, **options):
+        qs = Trip.objects.only("id", "municipality_id", "departure_datetime", "passengers_details").order_by("id")
+        if options["municipality"]:
+            qs = qs.filter(municipality_id=options["municipality"])
+
+        processed = 0
+        chunk = []
+        for trip in qs.iterator(chunk_size=CHUNK_SIZE):
+            chunk.append(trip)
+            if len(chunk) == CHUNK_SIZE:
+                processed += self._sync(chunk)
+                chunk = []
+        processed += self._sync(chunk)
+        self.stdout.write(self.style.SUCCESS(f"Viagens indexadas: {processed}"))
+
+    @staticmethod
+    @transaction.atomic
+    def _sync(trips):
+        sync_passengers(trips)
+        return len(trips)
@@ -0,0 +1,60 @@
+from django.core.management.base import CommandError
+from django.db import migrations, models
+
+EXCLUSION_SQL = """
+ALTER TABLE trips_trip ADD CONSTRAINT trip_vehicle_no_overlap EXCLUDE USING gist (
+    vehicle_id WITH =,
+    tstzrange(departure_datetime, return_datetime_expected, '[)') WITH &&
+) WHERE (status IN ('PLANNED', 'IN_PROGRESS'))
+"""
+
+# Active trips that would violate the constraint; it cannot be added while any pair exists.
+OVERLAPS_SQL = """
+SELECT a.id, b.id, a.vehicle_id FROM trips_trip a
+JOIN trips_trip b ON b.vehicle_id = a.vehicle_id AND b.id > a.id
+    AND tstzrange(a.departure_datetime, a.return_datetime_expected, '[)')
+        && tstzrange(b.departure_datetime, b.return_datetime_expected, '[)')
+WHERE a.status IN ('PLANNED', 'IN_PROGRESS') AND b.status IN ('PLANNED', 'IN_PROGRESS')
+ORDER BY a.id, b.id
+LIMIT 50
+"""
+
+
+def add_vehicle_exclusion(apps, schema_editor):
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute(OVERLAPS_SQL)
+        overlaps = cursor.fetchall()
+    if overlaps:
+        pairs = ", ".join(f"#{first} x #{second} (veículo {vehicle})" for first, second, vehicle in overlaps)
+        raise CommandError(
+            "Há viagens ativas sobrepostas no mesmo veículo; cancele ou reagende uma de cada par antes de "
+            f"migrar: {pairs}" + (" (lista limitada a 50 pares)" if len(overlaps) == 50 else "")
+        )
+    schema_editor.execute("CREATE EXTENSION IF NOT EXISTS btree_gist")
+    schema_editor.execute(EXCLUSION_SQL)
+
+
+def drop_vehicle_exclusion(apps, schema_editor):
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    schema_editor.execute("ALTER TABLE trips_trip DROP CONSTRAINT IF EXISTS trip_vehicle_no_overlap")
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("trips", "0003_merge_0002_trip_category_and_cargo_fields_0002_trip_passengers_details"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="trip",
+            index=models.Index(
+                condition=models.Q(("status__in", ["PLANNED", "IN_PROGRESS"])),
+                fields=["vehicle", "departure_datetime", "return_datetime_expected"],
+                name="trip_vehicle_schedule_idx",
+            ),
+        ),
+        migrations.RunPython(add_vehicle_exclusion, reverse_code=drop_vehicle_exclusion),
+    ]
@@ -0,0 +1,20 @@
+# Generated by Django 5.2.18 on 2026-10-18 04:55
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('drivers', '0002_driver_access_code'),
+        ('fleet', '0002_fuellog'),
+        ('tenants', '0001_initial'),
+        ('trips', '0004_trip_vehicle_schedule_index'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='trip',
+            index=models.Index(condition=models.Q(('status__in', ['PLANNED', 'IN_PROGRESS'])), fields=['driver', 'departure_datetime', 'return_datetime_expected'], name='trip_driver_schedule_idx'),
+        ),
+    ]
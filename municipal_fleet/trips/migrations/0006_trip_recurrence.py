@@ -0,0 +1,54 @@
+# Generated by Django 5.2.18 on 2026-10-18 04:58
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('drivers', '0002_driver_access_code'),
+        ('fleet', '0002_fuellog'),
+        ('tenants', '0001_initial'),
+        ('trips', '0005_trip_driver_schedule_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TripRecurrence',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('origin', models.CharField(max_length=255)),
+                ('destination', models.CharField(max_length=255)),
+                ('stops_description', models.TextField(blank=True)),
+                ('passengers_count', models.PositiveIntegerField(default=0)),
+                ('passengers_details', models.JSONField(blank=True, default=list)),
+                ('notes', models.TextField(blank=True)),
+                ('weekdays', models.JSONField(default=list)),
+                ('interval_weeks', models.PositiveSmallIntegerField(default=1)),
+                ('departure_time', models.TimeField()),
+                ('return_time', models.TimeField()),
+                ('start_date', models.DateField()),
+                ('end_date', models.DateField(blank=True, null=True)),
+                ('is_active', models.BooleanField(default=True)),
+                ('materialized_until', models.DateField(blank=True, null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('driver', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='trip_recurrences', to='drivers.driver')),
+                ('municipality', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='trip_recurrences', to='tenants.municipality')),
+                ('vehicle', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='trip_recurrences', to='fleet.vehicle')),
+            ],
+            options={
+                'ordering': ['origin', 'departure_time'],
+            },
+        ),
+        migrations.AddField(
+            model_name='trip',
+            name='recurrence',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='trips', to='trips.triprecurrence'),
+        ),
+        migrations.AddConstraint(
+            model_name='trip',
+            constraint=models.UniqueConstraint(fields=('recurrence', 'departure_datetime'), name='trip_recurrence_occurrence_unique'),
+        ),
+    ]
@@ -0,0 +1,20 @@
+# Generated by Django 5.2.18 on 2026-10-18 05:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('drivers', '0002_driver_access_code'),
+        ('fleet', '0003_keyset_pagination_index'),
+        ('tenants', '0001_initial'),
+        ('trips', '0006_trip_recurrence'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='trip',
+            index=models.Index(fields=['municipality', '-departure_datetime', '-id'], name='trip_muni_departure_idx'),
+        ),
+    ]
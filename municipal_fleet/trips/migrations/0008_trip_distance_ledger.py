@@ -0,0 +1,52 @@
+# Generated by Django 5.2.18 on 2026-10-18 05:07
+
+from zoneinfo import ZoneInfo
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import F
+
+
+def backfill_ledger(apps, schema_editor):
+    """Record already-completed trips so re-saving them does not count their distance twice."""
+    Trip = apps.get_model("trips", "Trip")
+    TripDistance = apps.get_model("trips", "TripDistance")
+    completed = (
+        Trip.objects.filter(status="COMPLETED", odometer_end__isnull=False, odometer_end__gte=F("odometer_start"))
+        .values_list("id", "vehicle_id", "departure_datetime", "odometer_start", "odometer_end", "municipality__timezone")
+        .iterator(chunk_size=2000)
+    )
+    batch = []
+    for trip_id, vehicle_id, departure, start, end, tz_name in completed:
+        local = departure.astimezone(ZoneInfo(tz_name))
+        batch.append(
+            TripDistance(trip_id=trip_id, vehicle_id=vehicle_id, year=local.year, month=local.month, kilometers=end - start)
+        )
+        if len(batch) >= 2000:
+            TripDistance.objects.bulk_create(batch)
+            batch = []
+    TripDistance.objects.bulk_create(batch)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('fleet', '0003_keyset_pagination_index'),
+        ('trips', '0007_keyset_pagination_index'),
+        ('tenants', '0002_municipality_timezone'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TripDistance',
+            fields=[
+                ('trip', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='distance_entry', serialize=False, to='trips.trip')),
+                ('year', models.IntegerField()),
+                ('month', models.IntegerField()),
+                ('kilometers', models.PositiveIntegerField()),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('vehicle', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='trip_distances', to='fleet.vehicle')),
+            ],
+        ),
+        migrations.RunPython(backfill_ledger, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,22 @@
+# Generated by Django 5.2.18 on 2026-10-18 05:09
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tenants', '0002_municipality_timezone'),
+        ('trips', '0008_trip_distance_ledger'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OdometerRebuildWatermark',
+            fields=[
+                ('municipality', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='odometer_watermark', serialize=False, to='tenants.municipality')),
+                ('rebuilt_at', models.DateTimeField()),
+            ],
+        ),
+    ]
@@ -0,0 +1,40 @@
+# Generated by Django 5.2.18 on 2026-10-18 05:11
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tenants', '0002_municipality_timezone'),
+        ('trips', '0009_odometer_rebuild_watermark'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EventCursor',
+            fields=[
+                ('consumer', models.CharField(max_length=100, primary_key=True, serialize=False)),
+                ('last_event_id', models.BigIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='TripEvent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('CREATED', 'Criada'), ('STATUS_CHANGED', 'Status alterado'), ('DELETED', 'Excluída')], max_length=20)),
+                ('from_status', models.CharField(blank=True, choices=[('PLANNED', 'Planejada'), ('IN_PROGRESS', 'Em andamento'), ('COMPLETED', 'Concluida'), ('CANCELLED', 'Cancelada')], max_length=20)),
+                ('to_status', models.CharField(blank=True, choices=[('PLANNED', 'Planejada'), ('IN_PROGRESS', 'Em andamento'), ('COMPLETED', 'Concluida'), ('CANCELLED', 'Cancelada')], max_length=20)),
+                ('departure_datetime', models.DateTimeField()),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('municipality', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='tenants.municipality')),
+                ('trip', models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING, related_name='events', to='trips.trip')),
+            ],
+            options={
+                'ordering': ['id'],
+                'indexes': [models.Index(fields=['municipality', 'id'], name='tripevent_muni_id_idx')],
+            },
+        ),
+    ]
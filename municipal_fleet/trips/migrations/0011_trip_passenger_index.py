@@ -0,0 +1,30 @@
+# Generated by Django 5.2.18 on 2026-10-18 05:14
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tenants', '0002_municipality_timezone'),
+        ('trips', '0010_trip_event_log'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TripPassenger',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('cpf', models.CharField(max_length=11)),
+                ('name', models.CharField(max_length=255)),
+                ('departure_datetime', models.DateTimeField()),
+                ('municipality', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='tenants.municipality')),
+                ('trip', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='passenger_entries', to='trips.trip')),
+            ],
+            options={
+                'ordering': ['-departure_datetime', '-id'],
+                'indexes': [models.Index(fields=['municipality', 'cpf', '-departure_datetime'], name='trippassenger_cpf_idx')],
+            },
+        ),
+    ]
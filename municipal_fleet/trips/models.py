@@ -1,5 +1,13 @@
 from django.db import models
-from django.utils import timezone
+
+
+class TripQuerySet(models.QuerySet):
+    def active(self):
+        return self.filter(status__in=Trip.ACTIVE_STATUSES)
+
+    def overlapping(self, start, end):
+        # Half-open intervals: a trip returning exactly when another departs is not a conflict.
+        return self.filter(departure_datetime__lt=end, return_datetime_expected__gt=start)
 
 
 class Trip(models.Model):
@@ -14,6 +22,15 @@ class Trip(models.Model):
         COMPLETED = "COMPLETED", "Concluida"
         CANCELLED = "CANCELLED", "Cancelada"
 
+    ACTIVE_STATUSES = (Status.PLANNED, Status.IN_PROGRESS)
+    # Allowed status changes. PLANNED -> COMPLETED stays allowed for trips registered after the fact.
+    TRANSITIONS = {
+        Status.PLANNED: (Status.IN_PROGRESS, Status.COMPLETED, Status.CANCELLED),
+        Status.IN_PROGRESS: (Status.COMPLETED, Status.CANCELLED),
+        Status.COMPLETED: (),
+        Status.CANCELLED: (),
+    }
+
     municipality = models.ForeignKey("tenants.Municipality", on_delete=models.CASCADE, related_name="trips")
     vehicle = models.ForeignKey("fleet.Vehicle", on_delete=models.PROTECT, related_name="trips")
     driver = models.ForeignKey("drivers.Driver", on_delete=models.PROTECT, related_name="trips")
@@ -34,15 +51,88 @@ class Trip(models.Model):
     stops_description = models.TextField(blank=True)
     status = models.CharField(max_length=20, choices=Status.choices, default=Status.PLANNED)
     notes = models.TextField(blank=True)
+    recurrence = models.ForeignKey(
+        "trips.TripRecurrence", on_delete=models.SET_NULL, null=True, blank=True, related_name="trips"
+    )
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    objects = TripQuerySet.as_manager()
+
     class Meta:
         ordering = ["-departure_datetime"]
+        indexes = [
+            models.Index(
+                fields=["vehicle", "departure_datetime", "return_datetime_expected"],
+                name="trip_vehicle_schedule_idx",
+                condition=models.Q(status__in=["PLANNED", "IN_PROGRESS"]),
+            ),
+            models.Index(
+                fields=["driver", "departure_datetime", "return_datetime_expected"],
+                name="trip_driver_schedule_idx",
+                condition=models.Q(status__in=["PLANNED", "IN_PROGRESS"]),
+            ),
+            # Keyset pagination order of TripViewSet/TripReportView.
+            models.Index(fields=["municipality", "-departure_datetime", "-id"], name="trip_muni_departure_idx"),
+        ]
+        constraints = [
+            # Keeps recurrence materialization idempotent across reruns and concurrent workers.
+            models.UniqueConstraint(fields=["recurrence", "departure_datetime"], name="trip_recurrence_occurrence_unique"),
+        ]
 
     def __str__(self):
         return f"{self.origin} -> {self.destination} ({self.departure_datetime.date()})"
 
+    def can_transition(self, status) -> bool:
+        return status == self.status or status in self.TRANSITIONS[self.status]
+
+
+class TripPassenger(models.Model):
+    """One row per passenger of a trip, projected from Trip.passengers_details for CPF lookups."""
+
+    trip = models.ForeignKey(Trip, on_delete=models.CASCADE, related_name="passenger_entries")
+    municipality = models.ForeignKey("tenants.Municipality", on_delete=models.CASCADE, related_name="+")
+    # Digits only, so "123.456.789-00" and "12345678900" are the same passenger.
+    cpf = models.CharField(max_length=11)
+    name = models.CharField(max_length=255)
+    departure_datetime = models.DateTimeField()
+
+    class Meta:
+        ordering = ["-departure_datetime", "-id"]
+        indexes = [
+            models.Index(fields=["municipality", "cpf", "-departure_datetime"], name="trippassenger_cpf_idx"),
+        ]
+
+
+class TripEvent(models.Model):
+    """Append-only log of trip lifecycle changes, written in the same transaction as the change."""
+
+    class Kind(models.TextChoices):
+        CREATED = "CREATED", "Criada"
+        STATUS_CHANGED = "STATUS_CHANGED", "Status alterado"
+        DELETED = "DELETED", "Excluída"
+
+    # No FK constraint so events of deleted trips stay in the log.
+    trip = models.ForeignKey(Trip, on_delete=models.DO_NOTHING, db_constraint=False, related_name="events")
+    municipality = models.ForeignKey("tenants.Municipality", on_delete=models.CASCADE, related_name="+")
+    kind = models.CharField(max_length=20, choices=Kind.choices)
+    from_status = models.CharField(max_length=20, choices=Trip.Status.choices, blank=True)
+    to_status = models.CharField(max_length=20, choices=Trip.Status.choices, blank=True)
+    departure_datetime = models.DateTimeField()
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ["id"]
+        indexes = [models.Index(fields=["municipality", "id"], name="tripevent_muni_id_idx")]
+
+
+class EventCursor(models.Model):
+    """Last TripEvent id a consumer has processed."""
+
+    consumer = models.CharField(max_length=100, primary_key=True)
+    last_event_id = models.BigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
 
 class MonthlyOdometer(models.Model):
     vehicle = models.ForeignKey("fleet.Vehicle", on_delete=models.CASCADE, related_name="odometer_monthly")
@@ -55,10 +145,62 @@ class MonthlyOdometer(models.Model):
         unique_together = ("vehicle", "year", "month")
         ordering = ["-year", "-month"]
 
-    def add_distance(self, distance: int):
-        self.kilometers += distance
-        self.save(update_fields=["kilometers"])
-
     @property
     def period(self):
         return f"{self.month:02d}/{self.year}"
+
+
+class TripDistance(models.Model):
+    """
+    Ledger of the distance each completed trip contributed to MonthlyOdometer.
+
+    One row per trip: re-saving a completed trip applies only the difference to the monthly total,
+    and a trip leaving COMPLETED (or moving month/vehicle) takes its kilometers back out.
+    """
+
+    trip = models.OneToOneField(Trip, on_delete=models.CASCADE, primary_key=True, related_name="distance_entry")
+    vehicle = models.ForeignKey("fleet.Vehicle", on_delete=models.CASCADE, related_name="trip_distances")
+    year = models.IntegerField()
+    month = models.IntegerField()
+    kilometers = models.PositiveIntegerField()
+    updated_at = models.DateTimeField(auto_now=True)
+
+
+class OdometerRebuildWatermark(models.Model):
+    """Start time of the last successful rebuild_monthly_odometer run per municipality (--incremental)."""
+
+    municipality = models.OneToOneField(
+        "tenants.Municipality", on_delete=models.CASCADE, primary_key=True, related_name="odometer_watermark"
+    )
+    rebuilt_at = models.DateTimeField()
+
+
+class TripRecurrence(models.Model):
+    """Weekly schedule (RRULE FREQ=WEEKLY;INTERVAL;BYDAY;UNTIL) expanded into Trip rows on a rolling horizon."""
+
+    municipality = models.ForeignKey("tenants.Municipality", on_delete=models.CASCADE, related_name="trip_recurrences")
+    vehicle = models.ForeignKey("fleet.Vehicle", on_delete=models.PROTECT, related_name="trip_recurrences")
+    driver = models.ForeignKey("drivers.Driver", on_delete=models.PROTECT, related_name="trip_recurrences")
+    origin = models.CharField(max_length=255)
+    destination = models.CharField(max_length=255)
+    stops_description = models.TextField(blank=True)
+    passengers_count = models.PositiveIntegerField(default=0)
+    passengers_details = models.JSONField(default=list, blank=True)
+    notes = models.TextField(blank=True)
+    # Python weekday numbers: 0 = segunda ... 6 = domingo.
+    weekdays = models.JSONField(default=list)
+    interval_weeks = models.PositiveSmallIntegerField(default=1)
+    departure_time = models.TimeField()
+    return_time = models.TimeField()
+    start_date = models.DateField()
+    end_date = models.DateField(null=True, blank=True)
+    is_active = models.BooleanField(default=True)
+    materialized_until = models.DateField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ["origin", "departure_time"]
+
+    def __str__(self):
+        return f"{self.origin} -> {self.destination} ({self.departure_time:%H:%M})"
@@ -0,0 +1,200 @@
+from datetime import date
+
+from django.db import IntegrityError, transaction
+from django.db.models import ExpressionWrapper, F, IntegerField, Min, OuterRef, Q, Subquery, Sum, Value
+from django.db.models.functions import ExtractMonth, ExtractYear, Greatest
+from django.utils import timezone
+
+from fleet.models import Vehicle
+from municipal_fleet.filters import local_day_start
+from trips.models import MonthlyOdometer, OdometerRebuildWatermark, Trip, TripDistance
+
+REBUILD_CHUNK_SIZE = 2000
+
+
+def trip_month(trip):
+    """(year, month) a trip counts towards, in its municipality's local time."""
+    local = trip.departure_datetime.astimezone(trip.municipality.tzinfo)
+    return local.year, local.month
+
+
+def trip_distance(trip):
+    """Kilometers a trip contributes to the monthly odometer, or None if it contributes nothing."""
+    if trip.status != Trip.Status.COMPLETED or trip.odometer_end is None:
+        return None
+    distance = trip.odometer_end - trip.odometer_start
+    return distance if distance >= 0 else None
+
+
+def add_monthly_kilometers(vehicle_id, year, month, delta):
+    """
+    `kilometers = kilometers + delta` in the database, creating the month row on first use.
+
+    Two workers creating the same month both fall through to INSERT; the loser hits the unique
+    constraint and retries the UPDATE, so no increment is lost.
+    """
+    if not delta:
+        return
+    rows = MonthlyOdometer.objects.filter(vehicle_id=vehicle_id, year=year, month=month)
+    if rows.update(kilometers=Greatest(F("kilometers") + delta, Value(0))) or delta < 0:
+        return
+    try:
+        with transaction.atomic():
+            MonthlyOdometer.objects.create(vehicle_id=vehicle_id, year=year, month=month, kilometers=delta)
+    except IntegrityError:
+        rows.update(kilometers=F("kilometers") + delta)
+
+
+@transaction.atomic
+def record_trip_distance(trip):
+    """
+    Bring the trip's ledger row in line with its current state and apply the difference.
+
+    Idempotent: saving a completed trip again with the same odometer is a no-op. The trip row was
+    just written in this transaction, so concurrent saves of the same trip are already serialized.
+    """
+    distance = trip_distance(trip)
+    wanted = (trip.vehicle_id, *trip_month(trip), distance) if distance is not None else None
+    entry = TripDistance.objects.select_for_update().filter(trip_id=trip.pk).first()
+    current = (entry.vehicle_id, entry.year, entry.month, entry.kilometers) if entry else None
+    if wanted == current:
+        return
+    if entry:
+        add_monthly_kilometers(entry.vehicle_id, entry.year, entry.month, -entry.kilometers)
+    if wanted is None:
+        entry.delete()
+        return
+    vehicle_id, year, month, kilometers = wanted
+    TripDistance.objects.update_or_create(
+        trip_id=trip.pk, defaults={"vehicle_id": vehicle_id, "year": year, "month": month, "kilometers": kilometers}
+    )
+    add_monthly_kilometers(vehicle_id, year, month, kilometers)
+    # The odometer only moves forward: completing an older trip late must not roll it back.
+    Vehicle.objects.filter(pk=vehicle_id, odometer_current__lt=trip.odometer_end).update(
+        odometer_current=trip.odometer_end
+    )
+    monthly_total = MonthlyOdometer.objects.filter(vehicle_id=OuterRef("pk"), year=year, month=month)
+    over_limit = (
+        Vehicle.objects.filter(
+            pk=vehicle_id,
+            odometer_monthly_limit__gt=0,
+            odometer_monthly_limit__lt=Subquery(monthly_total.values("kilometers")[:1]),
+        )
+        .exclude(status=Vehicle.Status.MAINTENANCE)
+        .only("id", "municipality_id", "status")
+        .first()
+    )
+    if over_limit:
+        # save() rather than update() so status listeners (dashboard rollups) see the change.
+        over_limit.status = Vehicle.Status.MAINTENANCE
+        over_limit.save(update_fields=["status", "updated_at"])
+
+
+@transaction.atomic
+def release_trip_distance(trip):
+    """Take a trip's kilometers back out of the monthly total (before deleting the trip)."""
+    entry = TripDistance.objects.select_for_update().filter(trip_id=trip.pk).first()
+    if entry:
+        add_monthly_kilometers(entry.vehicle_id, entry.year, entry.month, -entry.kilometers)
+        entry.delete()
+
+
+def _month_scope(since):
+    if since is None:
+        return Q()
+    return Q(year__gt=since.year) | Q(year=since.year, month__gte=since.month)
+
+
+def _incremental_scope(trips, municipality):
+    """
+    (since, vehicle ids) covering every trip written after the last rebuild. Without a previous
+    run that is (None, None), everything; when nothing changed the vehicle set is empty. Ledger rows
+    are included so a trip that moved month or vehicle also fixes its old month.
+    """
+    watermark = OdometerRebuildWatermark.objects.filter(municipality=municipality).values_list("rebuilt_at", flat=True)
+    watermark = watermark.first()
+    if watermark is None:
+        return None, None
+    changed = trips.filter(updated_at__gte=watermark)
+    first_departure = changed.aggregate(first=Min("departure_datetime"))["first"]
+    if first_departure is None:
+        return None, set()
+    entries = TripDistance.objects.filter(trip__in=changed)
+    months = [first_departure.astimezone(municipality.tzinfo).date().replace(day=1)]
+    first_entry = entries.order_by("year", "month").values_list("year", "month").first()
+    if first_entry:
+        months.append(date(*first_entry, 1))
+    vehicles = set(changed.values_list("vehicle_id", flat=True)) | set(entries.values_list("vehicle_id", flat=True))
+    return min(months), vehicles
+
+
+def _upsert_ledger(entries):
+    TripDistance.objects.bulk_create(
+        entries, update_conflicts=True, unique_fields=["trip"], update_fields=["vehicle", "year", "month", "kilometers"]
+    )
+
+
+def rebuild_monthly_odometer(municipality, since=None, incremental=False):
+    """
+    Recompute the ledger and the monthly totals of one municipality from its completed trips.
+
+    Aggregation runs in SQL (year/month extracted in the municipality timezone) and results are
+    bulk-upserted; only months from `since` on are touched. With `incremental`, the scope is narrowed
+    to the vehicles and months of trips written since the previous run. Returns the number of
+    monthly rows written.
+    """
+    started = timezone.now()
+    trips = Trip.objects.filter(municipality=municipality)
+    vehicles = None
+    if incremental:
+        since, vehicles = _incremental_scope(trips, municipality)
+        if vehicles is not None and not vehicles:
+            OdometerRebuildWatermark.objects.update_or_create(municipality=municipality, defaults={"rebuilt_at": started})
+            return 0
+    if since:
+        since = since.replace(day=1)
+        trips = trips.filter(departure_datetime__gte=local_day_start(since, municipality.tzinfo))
+    if vehicles is not None:
+        trips = trips.filter(vehicle_id__in=vehicles)
+
+    tz = municipality.tzinfo
+    completed = trips.filter(
+        status=Trip.Status.COMPLETED, odometer_end__isnull=False, odometer_end__gte=F("odometer_start")
+    ).annotate(
+        local_year=ExtractYear("departure_datetime", tzinfo=tz),
+        local_month=ExtractMonth("departure_datetime", tzinfo=tz),
+        distance=ExpressionWrapper(F("odometer_end") - F("odometer_start"), output_field=IntegerField()),
+    )
+    monthly = MonthlyOdometer.objects.filter(_month_scope(since), vehicle__municipality=municipality)
+    if vehicles is not None:
+        monthly = monthly.filter(vehicle_id__in=vehicles)
+
+    with transaction.atomic():
+        TripDistance.objects.filter(trip__in=trips).exclude(trip__in=completed.values("pk")).delete()
+        rows = completed.values_list("pk", "vehicle_id", "local_year", "local_month", "distance").order_by()
+        entries = []
+        for pk, vehicle_id, year, month, km in rows.iterator(chunk_size=REBUILD_CHUNK_SIZE):
+            entries.append(TripDistance(trip_id=pk, vehicle_id=vehicle_id, year=year, month=month, kilometers=km))
+            if len(entries) == REBUILD_CHUNK_SIZE:
+                _upsert_ledger(entries)
+                entries = []
+        _upsert_ledger(entries)
+
+        totals = (
+            completed.values("vehicle_id", "local_year", "local_month").annotate(km=Sum("distance")).order_by()
+        )
+        summaries = [
+            MonthlyOdometer(vehicle_id=row["vehicle_id"], year=row["local_year"], month=row["local_month"], kilometers=row["km"])
+            for row in totals
+        ]
+        # Months whose trips were all cancelled/removed keep no stale total.
+        monthly.exclude(kilometers=0).update(kilometers=0)
+        MonthlyOdometer.objects.bulk_create(
+            summaries,
+            batch_size=REBUILD_CHUNK_SIZE,
+            update_conflicts=True,
+            unique_fields=["vehicle", "year", "month"],
+            update_fields=["kilometers"],
+        )
+        OdometerRebuildWatermark.objects.update_or_create(municipality=municipality, defaults={"rebuilt_at": started})
+    return len(summaries)
@@ -0,0 +1,39 @@
+import re
+
+from django.dispatch import receiver
+
+from trips.models import TripPassenger
+from trips.signals import trips_bulk_created
+
+_NON_DIGITS = re.compile(r"\D")
+
+
+def normalize_cpf(value) -> str:
+    return _NON_DIGITS.sub("", str(value or ""))
+
+
+def passenger_entries(trip):
+    return [
+        TripPassenger(
+            trip_id=trip.pk,
+            municipality_id=trip.municipality_id,
+            cpf=normalize_cpf(passenger.get("cpf"))[:11],
+            name=passenger.get("name") or "",
+            departure_datetime=trip.departure_datetime,
+        )
+        for passenger in trip.passengers_details or []
+        if isinstance(passenger, dict) and normalize_cpf(passenger.get("cpf"))
+    ]
+
+
+def sync_passengers(trips):
+    """Replace the projected passenger rows of `trips` with their current passengers_details."""
+    trips = list(trips)
+    TripPassenger.objects.filter(trip_id__in=[trip.pk for trip in trips]).delete()
+    TripPassenger.objects.bulk_create([entry for trip in trips for entry in passenger_entries(trip)])
+
+
+@receiver(trips_bulk_created)
+def sync_bulk_created_passengers(sender, trips, **kwargs):
+    # Freshly created trips have no rows to replace.
+    TripPassenger.objects.bulk_create([entry for trip in trips for entry in passenger_entries(trip)])
@@ -0,0 +1,126 @@
+from datetime import datetime, timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from drivers.models import Driver
+from fleet.models import Vehicle
+from trips.events import record_deleted
+from trips.models import Trip, TripRecurrence
+from trips.scheduling import batch_conflicts, lock_rows
+from trips.signals import trips_bulk_created
+
+
+def horizon_date(days=None):
+    return timezone.localdate() + timedelta(days=days or settings.TRIP_RECURRENCE_HORIZON_DAYS)
+
+
+def occurrence_dates(recurrence: TripRecurrence, start, end):
+    """Dates in [start, end] (inclusive) matched by the recurrence rule."""
+    first = max(start, recurrence.start_date)
+    last = min(end, recurrence.end_date) if recurrence.end_date else end
+    weekdays = set(recurrence.weekdays)
+    interval = max(recurrence.interval_weeks, 1)
+    anchor_monday = recurrence.start_date - timedelta(days=recurrence.start_date.weekday())
+    day = first
+    while day <= last:
+        if day.weekday() in weekdays and ((day - anchor_monday).days // 7) % interval == 0:
+            yield day
+        day += timedelta(days=1)
+
+
+def occurrence_window(recurrence: TripRecurrence, day):
+    """Departure/return of the occurrence on `day`, in the municipality's local time."""
+    tz = recurrence.municipality.tzinfo
+    return_day = day if recurrence.return_time > recurrence.departure_time else day + timedelta(days=1)
+    return (
+        datetime.combine(day, recurrence.departure_time, tzinfo=tz),
+        datetime.combine(return_day, recurrence.return_time, tzinfo=tz),
+    )
+
+
+@transaction.atomic
+def materialize(recurrence: TripRecurrence, until):
+    """
+    Create the Trip rows of `recurrence` up to `until`, continuing from `materialized_until`.
+
+    Occurrences that would overlap another active trip of the vehicle or driver are skipped and
+    reported; the watermark still advances past them. Occurrences that already exist (kept when
+    the rule was edited) are left alone. Returns (created, skipped): the number of trips inserted
+    and a list of (date, message).
+    """
+    lock_rows(TripRecurrence, [recurrence.id])
+    recurrence.refresh_from_db()
+    start = recurrence.start_date
+    if recurrence.materialized_until:
+        start = max(start, recurrence.materialized_until + timedelta(days=1))
+    start = max(start, timezone.localdate(timezone=recurrence.municipality.tzinfo))
+    if not recurrence.is_active or start > until:
+        return 0, []
+
+    vehicle, driver = recurrence.vehicle, recurrence.driver
+    if vehicle.status in (Vehicle.Status.MAINTENANCE, Vehicle.Status.INACTIVE) or driver.status != Driver.Status.ACTIVE:
+        # Leave the watermark in place so these dates are retried once the vehicle/driver is back.
+        return 0, [(start, "Veículo ou motorista indisponível.")]
+
+    lock_rows(Vehicle, [vehicle.id])
+    lock_rows(Driver, [driver.id])
+    windows = {day: occurrence_window(recurrence, day) for day in occurrence_dates(recurrence, start, until)}
+    # Occurrences kept across an edit (started, cancelled or completed ones) already exist: they are
+    # neither re-inserted nor announced to the listeners again.
+    existing = set(
+        recurrence.trips.filter(departure_datetime__in=[window[0] for window in windows.values()]).values_list(
+            "departure_datetime", flat=True
+        )
+    )
+    days = [day for day, window in windows.items() if window[0] not in existing]
+    items = []
+    for day in days:
+        departure, return_expected = windows[day]
+        items.append(
+            {
+                "vehicle": vehicle,
+                "driver": driver,
+                "departure_datetime": departure,
+                "return_datetime_expected": return_expected,
+            }
+        )
+    conflicts = batch_conflicts(items)
+    trips = [
+        Trip(
+            **item,
+            municipality_id=recurrence.municipality_id,
+            recurrence=recurrence,
+            origin=recurrence.origin,
+            destination=recurrence.destination,
+            stops_description=recurrence.stops_description,
+            passengers_count=recurrence.passengers_count,
+            passengers_details=recurrence.passengers_details,
+            notes=recurrence.notes,
+            odometer_start=vehicle.odometer_current,
+        )
+        for idx, item in enumerate(items)
+        if idx not in conflicts
+    ]
+    created = []
+    if trips:
+        Trip.objects.bulk_create(trips, ignore_conflicts=True)
+        # ignore_conflicts leaves pks unset; read the rows back for the listeners. Existing departures
+        # were filtered out above, so these are exactly the rows inserted now.
+        created = list(recurrence.trips.filter(departure_datetime__in=[trip.departure_datetime for trip in trips]))
+        trips_bulk_created.send(sender=Trip, trips=created)
+    recurrence.materialized_until = until
+    recurrence.save(update_fields=["materialized_until", "updated_at"])
+    return len(created), [(days[idx], message) for idx, message in sorted(conflicts.items())]
+
+
+def discard_future_occurrences(recurrence: TripRecurrence):
+    """Drop not-yet-started planned occurrences so an edited or removed rule stops producing stale trips."""
+    now = timezone.now()
+    upcoming = recurrence.trips.filter(status=Trip.Status.PLANNED, departure_datetime__gte=now)
+    record_deleted(upcoming.only("id", "municipality_id", "status", "departure_datetime"))
+    deleted, _ = upcoming.delete()
+    today = timezone.localdate(now, timezone=recurrence.municipality.tzinfo)
+    TripRecurrence.objects.filter(pk=recurrence.pk).update(materialized_until=today - timedelta(days=1))
+    return deleted
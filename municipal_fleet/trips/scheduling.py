@@ -0,0 +1,133 @@
+import heapq
+from collections import defaultdict
+
+from django.db import IntegrityError, connection
+from django.db.models import F, Q
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from rest_framework import serializers
+
+from trips.models import Trip
+
+VEHICLE_CONFLICT_MESSAGE = "Conflito de agenda: veículo já está em outra viagem."
+DRIVER_CONFLICT_MESSAGE = "Conflito de agenda: motorista já está em outra viagem."
+# Created by migration 0004 on PostgreSQL only (EXCLUDE USING gist over tstzrange).
+VEHICLE_OVERLAP_CONSTRAINT = "trip_vehicle_no_overlap"
+
+
+def vehicle_conflicts(vehicle_id, start, end, exclude_trip_id=None):
+    """Active trips of the vehicle overlapping [start, end), served by trip_vehicle_schedule_idx."""
+    qs = Trip.objects.active().overlapping(start, end).filter(vehicle_id=vehicle_id)
+    if exclude_trip_id:
+        qs = qs.exclude(id=exclude_trip_id)
+    return qs
+
+
+def driver_conflicts(driver_id, start, end, exclude_trip_id=None):
+    """Active trips of the driver overlapping [start, end), served by trip_driver_schedule_idx."""
+    qs = Trip.objects.active().overlapping(start, end).filter(driver_id=driver_id)
+    if exclude_trip_id:
+        qs = qs.exclude(id=exclude_trip_id)
+    return qs
+
+
+def parse_window(params, start_param="start", end_param="end"):
+    """Read a required [start, end) datetime window from query params; naive values use the current timezone."""
+    window = []
+    for param in (start_param, end_param):
+        raw = params.get(param)
+        if not raw:
+            raise serializers.ValidationError({param: "Obrigatório."})
+        try:
+            value = parse_datetime(raw)
+        except ValueError:
+            value = None
+        if value is None:
+            raise serializers.ValidationError({param: "Data/hora inválida. Use o formato ISO 8601."})
+        if timezone.is_naive(value):
+            value = timezone.make_aware(value)
+        window.append(value)
+    start, end = window
+    if end <= start:
+        raise serializers.ValidationError({end_param: "Fim da janela deve ser após o início."})
+    return start, end
+
+
+def sweep_overlaps(intervals):
+    """
+    Yield every overlapping pair from `intervals`, an iterable of (start, end, key).
+
+    Sorted sweep keeping a min-heap of intervals still open at the current start, so the
+    cost is O(n log n + k) for k overlapping pairs instead of comparing every pair.
+    """
+    open_intervals = []
+    ordered = sorted(intervals, key=lambda interval: (interval[0], interval[1]))
+    for seq, (start, end, key) in enumerate(ordered):
+        while open_intervals and open_intervals[0][0] <= start:
+            heapq.heappop(open_intervals)
+        for _end, _seq, other in open_intervals:
+            yield other, key
+        heapq.heappush(open_intervals, (end, seq, key))
+
+
+def batch_conflicts(items):
+    """
+    Check a batch of new trips against each other and against active trips in the database.
+
+    `items` are dicts with vehicle, driver, departure_datetime and return_datetime_expected.
+    Existing trips are read with a single query over the batch's overall window. Returns
+    {item index: message} for every item that overlaps something.
+    """
+    if not items:
+        return {}
+    window_start = min(item["departure_datetime"] for item in items)
+    window_end = max(item["return_datetime_expected"] for item in items)
+    vehicle_ids = {item["vehicle"].id for item in items}
+    driver_ids = {item["driver"].id for item in items}
+    existing = list(
+        Trip.objects.active()
+        .overlapping(window_start, window_end)
+        .filter(Q(vehicle_id__in=vehicle_ids) | Q(driver_id__in=driver_ids))
+        .values_list("id", "vehicle_id", "driver_id", "departure_datetime", "return_datetime_expected")
+    )
+
+    errors = {}
+    for field, message in (("vehicle", VEHICLE_CONFLICT_MESSAGE), ("driver", DRIVER_CONFLICT_MESSAGE)):
+        by_resource = defaultdict(list)
+        for idx, item in enumerate(items):
+            by_resource[item[field].id].append((item["departure_datetime"], item["return_datetime_expected"], ("new", idx)))
+        column = 1 if field == "vehicle" else 2
+        for row in existing:
+            if row[column] in by_resource:
+                by_resource[row[column]].append((row[3], row[4], ("trip", row[0])))
+        for intervals in by_resource.values():
+            if len(intervals) < 2:
+                continue
+            for a, b in sweep_overlaps(intervals):
+                for (kind, ref), (other_kind, other_ref) in ((a, b), (b, a)):
+                    if kind != "new" or ref in errors:
+                        continue
+                    other = f"viagem #{other_ref}" if other_kind == "trip" else f"item {other_ref + 1} do lote"
+                    errors[ref] = f"{message} ({other})"
+    return errors
+
+
+def lock_rows(model, ids):
+    """
+    Serialize schedule writes on the given rows until the current transaction ends.
+
+    PostgreSQL takes row locks (in id order to avoid deadlocks between workers). SQLite has no
+    row locks, so a no-op UPDATE grabs the database write lock instead.
+    """
+    ids = sorted({pk for pk in ids if pk is not None})
+    if not ids:
+        return
+    if connection.features.has_select_for_update:
+        list(model.objects.select_for_update().filter(pk__in=ids).order_by("pk").values_list("pk", flat=True))
+    else:
+        pk_name = model._meta.pk.attname
+        model.objects.filter(pk__in=ids).update(**{pk_name: F(pk_name)})
+
+
+def is_overlap_violation(exc: IntegrityError) -> bool:
+    return VEHICLE_OVERLAP_CONSTRAINT in str(exc)
@@ -1,20 +1,91 @@
-from datetime import datetime
-from django.db import transaction
-from django.utils import timezone
+from functools import partial
+
+from django.db import IntegrityError, transaction
 from rest_framework import serializers
-from trips.models import Trip, MonthlyOdometer
-from fleet.models import Vehicle
-from drivers.models import Driver
+from rest_framework.settings import api_settings
 
+from drivers.models import Driver
+from fleet.models import Vehicle
+from municipal_fleet.fieldsets import SparseFieldsetMixin
+from trips.events import record_created, record_status_change
+from trips.models import Trip, TripRecurrence
+from trips.odometer import record_trip_distance
+from trips.passengers import sync_passengers
+from trips.scheduling import (
+    DRIVER_CONFLICT_MESSAGE,
+    VEHICLE_CONFLICT_MESSAGE,
+    batch_conflicts,
+    driver_conflicts,
+    is_overlap_violation,
+    lock_rows,
+    vehicle_conflicts,
+)
+from trips.signals import trips_bulk_created
 
 SPECIAL_NEED_CHOICES = {"NONE", "TEA", "ELDERLY", "PCD", "OTHER"}
+BULK_MAX_TRIPS = 500
+
+
+def clean_passengers_details(passengers_details):
+    if not isinstance(passengers_details, list):
+        raise serializers.ValidationError("passengers_details precisa ser uma lista.")
+    cleaned_passengers = []
+    for idx, item in enumerate(passengers_details):
+        if not isinstance(item, dict):
+            raise serializers.ValidationError(f"Passageiro #{idx + 1} inválido.")
+        name = item.get("name")
+        cpf = item.get("cpf")
+        age = item.get("age")
+        special_need = item.get("special_need") or "NONE"
+        observation = item.get("observation")
+        special_need_other = item.get("special_need_other")
+        if not name:
+            raise serializers.ValidationError(f"Nome do passageiro #{idx + 1} é obrigatório.")
+        if not cpf:
+            raise serializers.ValidationError(f"CPF do passageiro #{idx + 1} é obrigatório.")
+        if special_need not in SPECIAL_NEED_CHOICES:
+            raise serializers.ValidationError(f"Atendimento especial do passageiro #{idx + 1} é inválido.")
+        if special_need == "OTHER" and not special_need_other:
+            raise serializers.ValidationError(f"Descreva o atendimento especial do passageiro #{idx + 1}.")
+        if age is not None:
+            try:
+                age = int(age)
+            except (ValueError, TypeError):
+                raise serializers.ValidationError(f"Idade do passageiro #{idx + 1} é inválida.")
+        cleaned_passengers.append(
+            {
+                "name": name,
+                "cpf": cpf,
+                "age": age,
+                "special_need": special_need,
+                "special_need_other": special_need_other,
+                "observation": observation,
+            }
+        )
+    return cleaned_passengers
+
 
+class PrefetchedPrimaryKeyRelatedField(serializers.PrimaryKeyRelatedField):
+    """Resolve ids from `context["prefetched"][model]` when present instead of one query per item."""
 
-class TripSerializer(serializers.ModelSerializer):
+    def to_internal_value(self, data):
+        cache = self.context.get("prefetched", {}).get(self.get_queryset().model)
+        if cache is None:
+            return super().to_internal_value(data)
+        try:
+            obj = cache.get(int(data))
+        except (TypeError, ValueError):
+            self.fail("incorrect_type", data_type=type(data).__name__)
+        if obj is None:
+            self.fail("does_not_exist", pk_value=data)
+        return obj
+
+
+class TripSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     class Meta:
         model = Trip
         fields = "__all__"
-        read_only_fields = ["id", "created_at", "updated_at", "municipality"]
+        read_only_fields = ["id", "created_at", "updated_at", "municipality", "recurrence"]
 
     def validate(self, attrs):
         request = self.context.get("request")
@@ -35,41 +106,7 @@ class TripSerializer(serializers.ModelSerializer):
         cargo_purpose = attrs.get("cargo_purpose", getattr(self.instance, "cargo_purpose", ""))
 
         if passengers_details:
-            if not isinstance(passengers_details, list):
-                raise serializers.ValidationError("passengers_details precisa ser uma lista.")
-            cleaned_passengers = []
-            for idx, item in enumerate(passengers_details):
-                if not isinstance(item, dict):
-                    raise serializers.ValidationError(f"Passageiro #{idx + 1} inválido.")
-                name = item.get("name")
-                cpf = item.get("cpf")
-                age = item.get("age")
-                special_need = item.get("special_need") or "NONE"
-                observation = item.get("observation")
-                special_need_other = item.get("special_need_other")
-                if not name:
-                    raise serializers.ValidationError(f"Nome do passageiro #{idx + 1} é obrigatório.")
-                if not cpf:
-                    raise serializers.ValidationError(f"CPF do passageiro #{idx + 1} é obrigatório.")
-                if special_need not in SPECIAL_NEED_CHOICES:
-                    raise serializers.ValidationError(f"Atendimento especial do passageiro #{idx + 1} é inválido.")
-                if special_need == "OTHER" and not special_need_other:
-                    raise serializers.ValidationError(f"Descreva o atendimento especial do passageiro #{idx + 1}.")
-                if age is not None:
-                    try:
-                        age = int(age)
-                    except (ValueError, TypeError):
-                        raise serializers.ValidationError(f"Idade do passageiro #{idx + 1} é inválida.")
-                cleaned_passengers.append(
-                    {
-                        "name": name,
-                        "cpf": cpf,
-                        "age": age,
-                        "special_need": special_need,
-                        "special_need_other": special_need_other,
-                        "observation": observation,
-                    }
-                )
+            cleaned_passengers = clean_passengers_details(passengers_details)
             passengers = len(cleaned_passengers)
             attrs["passengers_details"] = cleaned_passengers
             attrs["passengers_count"] = passengers
@@ -102,6 +139,10 @@ class TripSerializer(serializers.ModelSerializer):
                 raise serializers.ValidationError("Veículo precisa pertencer à prefeitura do usuário.")
             if driver and driver.municipality_id != user.municipality_id:
                 raise serializers.ValidationError("Motorista precisa pertencer à prefeitura do usuário.")
+        if self.instance and not self.instance.can_transition(status):
+            raise serializers.ValidationError(
+                {"status": f"Transição de status inválida: {self.instance.get_status_display()} → {Trip.Status(status).label}."}
+            )
         if status == Trip.Status.COMPLETED:
             if odometer_end is None:
                 raise serializers.ValidationError("odometer_end é obrigatório para concluir a viagem.")
@@ -111,46 +152,172 @@ class TripSerializer(serializers.ModelSerializer):
         if departure and return_expected and return_expected <= departure:
             raise serializers.ValidationError("Data/horário de retorno deve ser após a saída.")
 
-        if vehicle and departure and return_expected and status in [Trip.Status.PLANNED, Trip.Status.IN_PROGRESS]:
-            qs = Trip.objects.filter(
-                vehicle=vehicle,
-                status__in=[Trip.Status.PLANNED, Trip.Status.IN_PROGRESS],
-                departure_datetime__lt=return_expected,
-                return_datetime_expected__gt=departure,
-            )
-            if self.instance:
-                qs = qs.exclude(id=self.instance.id)
-            if qs.exists():
-                raise serializers.ValidationError("Conflito de agenda: veículo já está em outra viagem.")
+        if not self.context.get("bulk"):
+            self._check_schedule(vehicle, driver, departure, return_expected, status)
         return attrs
 
+    def _check_schedule(self, vehicle, driver, departure, return_expected, status):
+        if not (departure and return_expected and status in Trip.ACTIVE_STATUSES):
+            return
+        trip_id = getattr(self.instance, "id", None)
+        if vehicle and vehicle_conflicts(vehicle.id, departure, return_expected, trip_id).exists():
+            raise serializers.ValidationError(VEHICLE_CONFLICT_MESSAGE)
+        if driver and driver_conflicts(driver.id, departure, return_expected, trip_id).exists():
+            raise serializers.ValidationError(DRIVER_CONFLICT_MESSAGE)
+
+    def _save_scheduled(self, validated_data, save):
+        """
+        Run `save` with the schedule re-checked under lock.
+
+        `validate` runs outside the transaction, so two workers can both pass it; locking the
+        vehicle and driver (always in that order) and re-checking here closes that window. On PostgreSQL the exclusion constraint
+        is the last line of defence and is reported as the same validation error.
+        """
+        vehicle = validated_data.get("vehicle", getattr(self.instance, "vehicle", None))
+        driver = validated_data.get("driver", getattr(self.instance, "driver", None))
+        lock_rows(Vehicle, [getattr(vehicle, "id", None)])
+        lock_rows(Driver, [getattr(driver, "id", None)])
+        try:
+            self._check_schedule(
+                vehicle,
+                driver,
+                validated_data.get("departure_datetime", getattr(self.instance, "departure_datetime", None)),
+                validated_data.get("return_datetime_expected", getattr(self.instance, "return_datetime_expected", None)),
+                validated_data.get("status", getattr(self.instance, "status", Trip.Status.PLANNED)),
+            )
+            return save()
+        except serializers.ValidationError as exc:
+            raise serializers.ValidationError({api_settings.NON_FIELD_ERRORS_KEY: exc.detail})
+        except IntegrityError as exc:
+            if is_overlap_violation(exc):
+                raise serializers.ValidationError({api_settings.NON_FIELD_ERRORS_KEY: [VEHICLE_CONFLICT_MESSAGE]})
+            raise
+
     @transaction.atomic
     def create(self, validated_data):
         user = self.context["request"].user
         validated_data["municipality"] = user.municipality if user.role != "SUPERADMIN" else validated_data.get("municipality")
-        trip = super().create(validated_data)
-        self._update_odometer(trip)
+        trip = self._save_scheduled(validated_data, partial(super().create, validated_data))
+        record_created([trip])
+        sync_passengers([trip])
+        record_trip_distance(trip)
         return trip
 
     @transaction.atomic
     def update(self, instance, validated_data):
-        trip = super().update(instance, validated_data)
-        self._update_odometer(trip)
+        previous_status = instance.status
+        trip = self._save_scheduled(validated_data, partial(super().update, instance, validated_data))
+        record_status_change(trip, previous_status)
+        if {"passengers_details", "departure_datetime", "category"} & validated_data.keys():
+            sync_passengers([trip])
+        record_trip_distance(trip)
         return trip
 
-    def _update_odometer(self, trip: Trip):
-        if trip.status != Trip.Status.COMPLETED or trip.odometer_end is None:
-            return
-        distance = trip.odometer_end - trip.odometer_start
-        if distance < 0:
-            return
-        vehicle = trip.vehicle
-        vehicle.odometer_current = trip.odometer_end
-        vehicle.save(update_fields=["odometer_current"])
-        now = timezone.localtime(trip.departure_datetime)
-        summary, _ = MonthlyOdometer.objects.get_or_create(vehicle=vehicle, year=now.year, month=now.month)
-        summary.add_distance(distance)
-        if vehicle.odometer_monthly_limit and summary.kilometers > vehicle.odometer_monthly_limit:
-            # Simplified flag via vehicle status hint
-            vehicle.status = Vehicle.Status.MAINTENANCE
-            vehicle.save(update_fields=["status"])
+
+class TripBulkListSerializer(serializers.ListSerializer):
+    def to_internal_value(self, data):
+        if isinstance(data, list):
+            ids = {"vehicle": set(), "driver": set()}
+            for item in data:
+                for field, values in ids.items():
+                    value = item.get(field) if isinstance(item, dict) else None
+                    if isinstance(value, int) or (isinstance(value, str) and value.isdigit()):
+                        values.add(int(value))
+            self._context["prefetched"] = {
+                Vehicle: Vehicle.objects.in_bulk(ids["vehicle"]),
+                Driver: Driver.objects.in_bulk(ids["driver"]),
+            }
+        return super().to_internal_value(data)
+
+    @transaction.atomic
+    def create(self, validated_data):
+        user = self.context["request"].user
+        lock_rows(Vehicle, [item["vehicle"].id for item in validated_data])
+        lock_rows(Driver, [item["driver"].id for item in validated_data])
+        conflicts = batch_conflicts(validated_data)
+        if conflicts:
+            raise serializers.ValidationError(
+                [
+                    {api_settings.NON_FIELD_ERRORS_KEY: [conflicts[idx]]} if idx in conflicts else {}
+                    for idx in range(len(validated_data))
+                ]
+            )
+        trips = [
+            Trip(
+                **item,
+                municipality=user.municipality if user.role != "SUPERADMIN" else item["vehicle"].municipality,
+            )
+            for item in validated_data
+        ]
+        trips = Trip.objects.bulk_create(trips)
+        trips_bulk_created.send(sender=Trip, trips=trips)
+        return trips
+
+
+class TripBulkItemSerializer(TripSerializer):
+    """
+    One item of POST /api/trips/bulk/. Related rows come from a single prefetch and the schedule is
+    checked for the whole batch at once, so per-item validation does no queries.
+    """
+
+    vehicle = PrefetchedPrimaryKeyRelatedField(queryset=Vehicle.objects.all())
+    driver = PrefetchedPrimaryKeyRelatedField(queryset=Driver.objects.all())
+
+    class Meta(TripSerializer.Meta):
+        list_serializer_class = TripBulkListSerializer
+
+    def validate_status(self, value):
+        if value != Trip.Status.PLANNED:
+            raise serializers.ValidationError("Cadastro em lote aceita apenas viagens planejadas.")
+        return value
+
+
+class TripRecurrenceSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = TripRecurrence
+        fields = "__all__"
+        read_only_fields = ["id", "created_at", "updated_at", "municipality", "materialized_until"]
+
+    def validate_weekdays(self, value):
+        if not isinstance(value, list) or not value:
+            raise serializers.ValidationError("Informe ao menos um dia da semana.")
+        if any(not isinstance(day, int) or isinstance(day, bool) or not 0 <= day <= 6 for day in value):
+            raise serializers.ValidationError("Dias da semana devem ser inteiros de 0 (segunda) a 6 (domingo).")
+        return sorted(set(value))
+
+    def validate_interval_weeks(self, value):
+        if value < 1:
+            raise serializers.ValidationError("Intervalo deve ser de pelo menos 1 semana.")
+        return value
+
+    def validate(self, attrs):
+        request = self.context.get("request")
+        user = getattr(request, "user", None)
+        vehicle = attrs.get("vehicle", getattr(self.instance, "vehicle", None))
+        driver = attrs.get("driver", getattr(self.instance, "driver", None))
+        passengers_details = attrs.get("passengers_details", getattr(self.instance, "passengers_details", []))
+        passengers = attrs.get("passengers_count", getattr(self.instance, "passengers_count", 0))
+        start_date = attrs.get("start_date", getattr(self.instance, "start_date", None))
+        end_date = attrs.get("end_date", getattr(self.instance, "end_date", None))
+        departure_time = attrs.get("departure_time", getattr(self.instance, "departure_time", None))
+        return_time = attrs.get("return_time", getattr(self.instance, "return_time", None))
+
+        if passengers_details:
+            cleaned_passengers = clean_passengers_details(passengers_details)
+            passengers = len(cleaned_passengers)
+            attrs["passengers_details"] = cleaned_passengers
+            attrs["passengers_count"] = passengers
+        if vehicle and passengers and passengers > vehicle.max_passengers:
+            raise serializers.ValidationError("Quantidade de passageiros excede a capacidade do veículo.")
+        if vehicle and driver and vehicle.municipality_id != driver.municipality_id:
+            raise serializers.ValidationError("Motorista e veículo precisam ser da mesma prefeitura.")
+        if user and user.role != "SUPERADMIN":
+            if vehicle and vehicle.municipality_id != user.municipality_id:
+                raise serializers.ValidationError("Veículo precisa pertencer à prefeitura do usuário.")
+            if driver and driver.municipality_id != user.municipality_id:
+                raise serializers.ValidationError("Motorista precisa pertencer à prefeitura do usuário.")
+        if start_date and end_date and end_date < start_date:
+            raise serializers.ValidationError("Data final da recorrência deve ser após a inicial.")
+        if departure_time and return_time and departure_time == return_time:
+            raise serializers.ValidationError("Horário de retorno deve ser diferente do horário de saída.")
+        return attrs
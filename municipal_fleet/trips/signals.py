@@ -0,0 +1,5 @@
+from django.dispatch import Signal
+
+# Sent after Trip rows are inserted with bulk_create (which skips post_save), with `trips`:
+# the created instances, primary keys set.
+trips_bulk_created = Signal()
@@ -1,7 +1,9 @@
 from rest_framework.routers import DefaultRouter
-from trips.views import TripViewSet
+
+from trips.views import TripRecurrenceViewSet, TripViewSet
 
 router = DefaultRouter()
+router.register(r"recurrences", TripRecurrenceViewSet, basename="trip-recurrence")
 router.register(r"", TripViewSet, basename="trip")
 
 urlpatterns = router.urls
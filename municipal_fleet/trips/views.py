@@ -1,17 +1,63 @@
-import urllib.parse
-from rest_framework import viewsets, permissions, response, decorators, filters
-from trips.models import Trip
-from trips.serializers import TripSerializer
-from tenants.mixins import MunicipalityQuerysetMixin
+import hashlib
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Count, Max
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+from rest_framework import decorators, filters, permissions, response, status, viewsets
+
 from accounts.permissions import IsMunicipalityAdminOrReadOnly
+from municipal_fleet.fieldsets import ValuesRepresentation, requested_fields
+from municipal_fleet.filters import (
+    DateRangeFilterBackend,
+    day_bounds,
+    filter_date_range,
+    parse_date_param,
+    request_timezone,
+)
+from municipal_fleet.pagination import KeysetOrPageNumberPagination
+from search.filters import IndexedSearchFilter
+from tenants.mixins import MunicipalityQuerysetMixin
+from trips.events import record_deleted, settled_events
+from trips.models import Trip, TripPassenger, TripRecurrence
+from trips.odometer import release_trip_distance
+from trips.passengers import normalize_cpf
+from trips.recurrence import discard_future_occurrences, horizon_date
+from trips.recurrence import materialize as materialize_recurrence
+from trips.serializers import BULK_MAX_TRIPS, TripBulkItemSerializer, TripRecurrenceSerializer, TripSerializer
+from trips.whatsapp import SHEET_FIELDS, driver_sheets, trip_message, wa_link
 
 
 class TripViewSet(MunicipalityQuerysetMixin, viewsets.ModelViewSet):
-    queryset = Trip.objects.select_related("vehicle", "driver", "municipality")
+    queryset = Trip.objects.select_related("vehicle", "driver", "municipality").order_by("-departure_datetime", "-id")
     serializer_class = TripSerializer
     permission_classes = [permissions.IsAuthenticated, IsMunicipalityAdminOrReadOnly]
-    filter_backends = [filters.SearchFilter]
+    pagination_class = KeysetOrPageNumberPagination
+    keyset_ordering = ("-departure_datetime", "-id")
+    filter_backends = [IndexedSearchFilter, DateRangeFilterBackend]
     search_fields = ["origin", "destination", "vehicle__license_plate", "driver__name"]
+    date_range_field = "departure_datetime"
+    # Default list columns (what the trips table shows); `?fields=` may ask for any other column and
+    # the detail endpoint still returns the full trip.
+    list_fields = (
+        "id",
+        "municipality",
+        "vehicle",
+        "driver",
+        "origin",
+        "destination",
+        "category",
+        "departure_datetime",
+        "return_datetime_expected",
+        "return_datetime_actual",
+        "passengers_count",
+        "odometer_start",
+        "odometer_end",
+        "status",
+    )
 
     def get_queryset(self):
         qs = super().get_queryset()
@@ -19,8 +65,6 @@ class TripViewSet(MunicipalityQuerysetMixin, viewsets.ModelViewSet):
         driver_id = self.request.query_params.get("driver_id")
         status_param = self.request.query_params.get("status")
         category = self.request.query_params.get("category")
-        start_date = self.request.query_params.get("start_date")
-        end_date = self.request.query_params.get("end_date")
         if vehicle_id:
             qs = qs.filter(vehicle_id=vehicle_id)
         if driver_id:
@@ -29,25 +73,170 @@ class TripViewSet(MunicipalityQuerysetMixin, viewsets.ModelViewSet):
             qs = qs.filter(status=status_param)
         if category:
             qs = qs.filter(category=category)
-        if start_date:
-            qs = qs.filter(departure_datetime__date__gte=start_date)
-        if end_date:
-            qs = qs.filter(departure_datetime__date__lte=end_date)
         return qs
 
+    def list(self, request, *args, **kwargs):
+        """List pages straight from `.values()`: no model instances, no per-row serializer."""
+        fields = requested_fields(request, self.list_fields, [field.name for field in Trip._meta.concrete_fields])
+        # The keyset cursor is built from the ordering columns, so they are always fetched.
+        columns = dict.fromkeys([*fields, *(name.lstrip("-") for name in self.keyset_ordering)])
+        qs = self.filter_queryset(self.get_queryset()).values(*columns)
+        page = self.paginate_queryset(qs)
+        rows = ValuesRepresentation(Trip, fields).render(qs if page is None else page)
+        if page is not None:
+            return self.get_paginated_response(rows)
+        return response.Response(rows)
+
+    @transaction.atomic
+    def perform_destroy(self, instance):
+        record_deleted([instance])
+        release_trip_distance(instance)
+        instance.delete()
+
+    @decorators.action(detail=False, methods=["post"])
+    def bulk(self, request):
+        items = request.data.get("trips") if isinstance(request.data, dict) else None
+        if not isinstance(items, list) or not items:
+            return response.Response({"trips": "Envie uma lista de viagens."}, status=status.HTTP_400_BAD_REQUEST)
+        if len(items) > BULK_MAX_TRIPS:
+            return response.Response(
+                {"trips": f"Máximo de {BULK_MAX_TRIPS} viagens por lote."}, status=status.HTTP_400_BAD_REQUEST
+            )
+        serializer = TripBulkItemSerializer(data=items, many=True, context={**self.get_serializer_context(), "bulk": True})
+        serializer.is_valid(raise_exception=True)
+        trips = serializer.save()
+        return response.Response({"created": len(trips), "trips": TripSerializer(trips, many=True).data}, status=status.HTTP_201_CREATED)
+
+    @decorators.action(detail=False, methods=["get"])
+    def passengers(self, request):
+        """Trip history of one passenger (`?cpf=`, punctuation optional), newest first."""
+        cpf = normalize_cpf(request.query_params.get("cpf"))
+        if len(cpf) != 11:
+            return response.Response({"cpf": "Informe um CPF válido (11 dígitos)."}, status=status.HTTP_400_BAD_REQUEST)
+        qs = TripPassenger.objects.filter(cpf=cpf)
+        if request.user.role != "SUPERADMIN":
+            qs = qs.filter(municipality=request.user.municipality)
+        qs = filter_date_range(qs, request, "departure_datetime")
+        status_param = request.query_params.get("status")
+        if status_param:
+            qs = qs.filter(trip__status=status_param)
+        # Same column names as keyset_ordering, so `?cursor=` works here too.
+        rows = qs.order_by("-departure_datetime", "-id").values(
+            "id",
+            "trip_id",
+            "name",
+            "departure_datetime",
+            "trip__origin",
+            "trip__destination",
+            "trip__status",
+            "trip__vehicle__license_plate",
+            "trip__driver__name",
+        )
+        page = self.paginate_queryset(rows)
+        if page is not None:
+            return self.get_paginated_response(page)
+        return response.Response(list(rows))
+
+    @decorators.action(detail=False, methods=["get"])
+    def events(self, request):
+        """Trip event log after `?after=<id>`, oldest first, for consumers that keep their own cursor."""
+        after = request.query_params.get("after", "0")
+        if not after.isdigit():
+            return response.Response({"after": "Informe o id do último evento processado."}, status=status.HTTP_400_BAD_REQUEST)
+        limit = KeysetOrPageNumberPagination().get_page_size(request)
+        qs = settled_events().filter(id__gt=int(after))
+        if request.user.role != "SUPERADMIN":
+            qs = qs.filter(municipality=request.user.municipality)
+        events = list(
+            qs.order_by("id").values(
+                "id", "trip_id", "municipality_id", "kind", "from_status", "to_status", "departure_datetime", "created_at"
+            )[:limit]
+        )
+        return response.Response({"results": events, "last_id": events[-1]["id"] if events else int(after)})
+
     @decorators.action(detail=True, methods=["get"], url_path="whatsapp_message")
     def whatsapp_message(self, request, pk=None):
         trip = self.get_object()
-        message_lines = [
-            f"Olá {trip.driver.name}, segue sua viagem:",
-            f"Data: {trip.departure_datetime.strftime('%d/%m/%Y')}",
-            f"Horário de saída: {trip.departure_datetime.strftime('%H:%M')}",
-            f"Origem: {trip.origin}",
-            f"Destino: {trip.destination}",
-            f"Pontos de parada: {trip.stops_description or '—'}",
-            f"Veículo: {trip.vehicle.brand} {trip.vehicle.model} ({trip.vehicle.license_plate})",
-        ]
-        message = "\n".join(message_lines)
-        phone_digits = "".join(filter(str.isdigit, trip.driver.phone))
-        wa_link = f"https://wa.me/{phone_digits}?text={urllib.parse.quote(message)}"
-        return response.Response({"message": message, "wa_link": wa_link})
+        message = trip_message(trip, trip.municipality.tzinfo)
+        return response.Response({"message": message, "wa_link": wa_link(trip.driver.phone, message)})
+
+    @decorators.action(detail=False, methods=["get"], url_path="whatsapp_batch")
+    def whatsapp_batch(self, request):
+        """
+        WhatsApp messages for all non-cancelled trips of `?date=` (default: today), one per driver.
+
+        Cached per municipality and day; the key includes the newest updated_at of the trips, drivers
+        and vehicles involved plus the trip count, so any edit, move or delete yields a fresh sheet.
+        """
+        tz = request_timezone(request)
+        day = parse_date_param(request.query_params, "date") or timezone.localdate(timezone=tz)
+        start, end = day_bounds(day, day, tz)
+        qs = (
+            self.get_queryset()
+            .filter(departure_datetime__gte=start, departure_datetime__lt=end)
+            .exclude(status=Trip.Status.CANCELLED)
+        )
+        version = qs.aggregate(
+            total=Count("id"),
+            trips=Max("updated_at"),
+            drivers=Max("driver__updated_at"),
+            vehicles=Max("vehicle__updated_at"),
+        )
+        municipality_id = getattr(request.user, "municipality_id", None) or "all"
+        filters_key = sorted(request.query_params.items())
+        stamp = "|".join(str(value) for value in [*version.values(), filters_key])
+        cache_key = f"trips:whatsapp_batch:{municipality_id}:{day.isoformat()}:{hashlib.sha1(stamp.encode()).hexdigest()}"
+        data = cache.get(cache_key)
+        if data is None:
+            rows = qs.order_by("driver__name", "driver_id", "departure_datetime").values(*SHEET_FIELDS)
+            data = {"date": day.isoformat(), "drivers": driver_sheets(rows, day, tz)}
+            cache.set(cache_key, data, settings.WHATSAPP_BATCH_CACHE_SECONDS)
+        return response.Response(data)
+
+
+class TripRecurrenceViewSet(MunicipalityQuerysetMixin, viewsets.ModelViewSet):
+    queryset = TripRecurrence.objects.select_related("vehicle", "driver", "municipality")
+    serializer_class = TripRecurrenceSerializer
+    permission_classes = [permissions.IsAuthenticated, IsMunicipalityAdminOrReadOnly]
+    filter_backends = [filters.SearchFilter]
+    search_fields = ["origin", "destination", "vehicle__license_plate", "driver__name"]
+
+    @transaction.atomic
+    def perform_create(self, serializer):
+        user = self.request.user
+        recurrence = serializer.save(
+            municipality=user.municipality if user.role != "SUPERADMIN" else serializer.validated_data["vehicle"].municipality
+        )
+        materialize_recurrence(recurrence, horizon_date())
+
+    @transaction.atomic
+    def perform_update(self, serializer):
+        recurrence = serializer.save()
+        discard_future_occurrences(recurrence)
+        materialize_recurrence(recurrence, horizon_date())
+
+    @transaction.atomic
+    def perform_destroy(self, instance):
+        discard_future_occurrences(instance)
+        instance.delete()
+
+    @decorators.action(detail=True, methods=["post"])
+    def materialize(self, request, pk=None):
+        recurrence = self.get_object()
+        until = horizon_date()
+        if request.data.get("until"):
+            until = parse_date(str(request.data["until"]))
+            max_until = timezone.localdate() + timedelta(days=settings.TRIP_RECURRENCE_MAX_DAYS)
+            if until is None or until > max_until:
+                return response.Response(
+                    {"until": f"Informe uma data (AAAA-MM-DD) até {max_until:%d/%m/%Y}."},
+                    status=status.HTTP_400_BAD_REQUEST,
+                )
+        created, skipped = materialize_recurrence(recurrence, until)
+        return response.Response(
+            {
+                "created": created,
+                "skipped": [{"date": day, "detail": message} for day, message in skipped],
+                "materialized_until": TripRecurrence.objects.values_list("materialized_until", flat=True).get(pk=recurrence.pk),
+            }
+        )
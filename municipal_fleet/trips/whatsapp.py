@@ -0,0 +1,82 @@
+import urllib.parse
+from itertools import groupby
+
+# Compiled once at import; rendering a day's sheet is then plain str.format calls.
+TRIP_TEMPLATE = (
+    "Data: {date}\n"
+    "Horário de saída: {time}\n"
+    "Origem: {origin}\n"
+    "Destino: {destination}\n"
+    "Pontos de parada: {stops}\n"
+    "Veículo: {brand} {model} ({license_plate})"
+).format
+SINGLE_GREETING = "Olá {name}, segue sua viagem:".format
+BATCH_GREETING = "Olá {name}, seguem suas viagens de {date}:".format
+
+# Columns read by the daily sheet; keys match the `.values()` rows passed to driver_sheets.
+SHEET_FIELDS = (
+    "id",
+    "driver_id",
+    "driver__name",
+    "driver__phone",
+    "origin",
+    "destination",
+    "stops_description",
+    "departure_datetime",
+    "vehicle__brand",
+    "vehicle__model",
+    "vehicle__license_plate",
+)
+
+
+def wa_link(phone, message):
+    digits = "".join(filter(str.isdigit, phone or ""))
+    return f"https://wa.me/{digits}?text={urllib.parse.quote(message)}"
+
+
+def _trip_block(row, tz):
+    departure = row["departure_datetime"].astimezone(tz)
+    return TRIP_TEMPLATE(
+        date=departure.strftime("%d/%m/%Y"),
+        time=departure.strftime("%H:%M"),
+        origin=row["origin"],
+        destination=row["destination"],
+        stops=row["stops_description"] or "—",
+        brand=row["vehicle__brand"],
+        model=row["vehicle__model"],
+        license_plate=row["vehicle__license_plate"],
+    )
+
+
+def trip_message(trip, tz):
+    row = {
+        "origin": trip.origin,
+        "destination": trip.destination,
+        "stops_description": trip.stops_description,
+        "departure_datetime": trip.departure_datetime,
+        "vehicle__brand": trip.vehicle.brand,
+        "vehicle__model": trip.vehicle.model,
+        "vehicle__license_plate": trip.vehicle.license_plate,
+    }
+    return f"{SINGLE_GREETING(name=trip.driver.name)}\n{_trip_block(row, tz)}"
+
+
+def driver_sheets(rows, day, tz):
+    """One message per driver listing all of their trips of `day`; `rows` ordered by driver, then departure."""
+    sheets = []
+    for _, trips in groupby(rows, key=lambda row: row["driver_id"]):
+        trips = list(trips)
+        first = trips[0]
+        blocks = [f"{pos}) {_trip_block(row, tz)}" for pos, row in enumerate(trips, start=1)]
+        message = "\n\n".join([BATCH_GREETING(name=first["driver__name"], date=day.strftime("%d/%m/%Y")), *blocks])
+        sheets.append(
+            {
+                "driver_id": first["driver_id"],
+                "driver_name": first["driver__name"],
+                "phone": first["driver__phone"],
+                "trip_ids": [row["id"] for row in trips],
+                "message": message,
+                "wa_link": wa_link(first["driver__phone"], message),
+            }
+        )
+    return sheets